@@ -0,0 +1,316 @@
+# agendador.py
+
+import heapq
+import unicodedata
+from datetime import datetime, date, timedelta
+
+import pandas as pd
+import pytz
+import streamlit as st
+from database import get_connection, release_connection
+
+MS_TZ = pytz.timezone('America/Campo_Grande')
+
+DURACAO_PADRAO_MIN = 45.0      # serviço sem histórico suficiente
+DURACAO_MAXIMA_MIN = 12 * 60   # execuções mais longas que isso são box "esquecido", não entram na estatística
+MINIMO_AMOSTRAS = 3
+
+QUERY_DURACOES = """
+    WITH exec AS (
+        SELECT id, box_id, funcionario_id,
+               EXTRACT(EPOCH FROM (fim_execucao - inicio_execucao)) / 60 AS duracao_minutos
+        FROM execucao_servico
+        WHERE status = 'finalizado'
+          AND fim_execucao > inicio_execucao
+          AND fim_execucao >= NOW() - INTERVAL '365 days'
+    ), serv AS (
+        SELECT execucao_id, tipo FROM servicos_solicitados_borracharia WHERE status = 'finalizado' UNION ALL
+        SELECT execucao_id, tipo FROM servicos_solicitados_alinhamento WHERE status = 'finalizado' UNION ALL
+        SELECT execucao_id, tipo FROM servicos_solicitados_manutencao WHERE status = 'finalizado'
+    )
+    SELECT s.tipo, e.id AS execucao_id, e.box_id, e.funcionario_id, e.duracao_minutos,
+           COUNT(*) OVER (PARTITION BY e.id) AS tipos_na_execucao
+    FROM exec e
+    JOIN serv s ON s.execucao_id = e.id;
+"""
+
+
+def normalizar_area(area):
+    """'Manutenção Mecânica', 'mecanica', 'MANUTENCAO' -> 'manutencao'. Vazio/geral -> None (qualquer área)."""
+    if area is None or (isinstance(area, float) and pd.isna(area)):
+        return None
+    texto = unicodedata.normalize('NFKD', str(area)).encode('ascii', 'ignore').decode().lower().strip()
+    if not texto or texto in ('geral', 'todas', 'todos', 'qualquer'):
+        return None
+    if 'mecan' in texto or 'manut' in texto:
+        return 'manutencao'
+    if 'alinh' in texto:
+        return 'alinhamento'
+    if 'borrach' in texto or 'pneu' in texto:
+        return 'borracharia'
+    return texto
+
+
+def historico_execucoes(conn):
+    """
+    Execuções finalizadas do último ano, uma linha por tipo de serviço feito
+    nela, sem as mais longas que DURACAO_MAXIMA_MIN. É a base das durações
+    do agendador e do modelo de ETA (previsao_eta.py).
+    """
+    df = pd.read_sql(QUERY_DURACOES, conn)
+    df = df[df['duracao_minutos'] <= DURACAO_MAXIMA_MIN].copy()
+    df['duracao_minutos'] = df['duracao_minutos'].astype(float)
+    return df
+
+
+def mediana_por_tipo(historico):
+    """
+    Duração típica (minutos) de cada tipo em historico_execucoes: a duração
+    da execução dividida entre os tipos feitos nela, mediana dos tipos com
+    pelo menos MINIMO_AMOSTRAS execuções.
+    """
+    if historico.empty:
+        return {}
+    minutos_por_tipo = historico['duracao_minutos'] / historico['tipos_na_execucao']
+    estatistica = minutos_por_tipo.groupby(historico['tipo']).agg(['median', 'count'])
+    estatistica = estatistica[estatistica['count'] >= MINIMO_AMOSTRAS]
+    return estatistica['median'].round(1).to_dict()
+
+
+def duracoes_historicas(conn):
+    """Duração típica (minutos) de cada tipo de serviço, pelo histórico do último ano."""
+    return mediana_por_tipo(historico_execucoes(conn))
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_duracoes_historicas():
+    """duracoes_historicas com cache de 1h, compartilhado entre as sessões."""
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("Falha ao conectar ao banco de dados.")
+    try:
+        return duracoes_historicas(conn)
+    finally:
+        release_connection(conn)
+
+
+def _minutos(ts, referencia):
+    """Minutos entre referencia e ts, aceitando timestamps com ou sem fuso."""
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(MS_TZ).tz_localize(None)
+    return (ts - referencia).total_seconds() / 60
+
+
+def montar_trabalhos(servicos_pendentes, duracoes, referencia):
+    """
+    Agrupa serviços pendentes em trabalhos (veículo + área), a mesma unidade
+    usada na tela de alocação. Retorna DataFrame com chegada em minutos
+    relativos à referência e a duração prevista.
+    """
+    if servicos_pendentes.empty:
+        return pd.DataFrame(columns=['veiculo_id', 'placa', 'area', 'chegada', 'duracao_prevista'])
+    df = servicos_pendentes.copy()
+    df['area'] = df['area'].map(normalizar_area)
+    df['minutos'] = df['tipo'].map(duracoes).fillna(DURACAO_PADRAO_MIN).astype(float)
+    agrupado = df.groupby(['veiculo_id', 'area'], as_index=False).agg(
+        placa=('placa', 'first'),
+        data_solicitacao=('data_solicitacao', 'min'),
+        duracao_prevista=('minutos', 'sum'),
+    )
+    agrupado['chegada'] = [_minutos(t, referencia) for t in agrupado['data_solicitacao']]
+    return agrupado.drop(columns='data_solicitacao')
+
+
+def propor_alocacao(trabalhos, boxes, funcionarios, criterio='spt', veiculos_ocupados=None):
+    """
+    Agenda os trabalhos nos boxes e mecânicos minimizando a espera total.
+
+    trabalhos: veiculo_id, area, chegada, duracao_prevista (e opcional duracao_real)
+    boxes: lista de dicts {id, area, livre_em}
+    funcionarios: lista de dicts {id, livre_em}
+    veiculos_ocupados: {veiculo_id: livre_em} dos veículos que já estão em um box
+
+    Simulação por eventos: sempre que houver box e mecânico livres, entre os
+    trabalhos já chegados cujo veículo não está em outro box, escolhe o de
+    menor duração prevista (criterio='spt', que minimiza a espera total) ou o
+    que chegou primeiro (criterio='fifo', o comportamento manual de hoje).
+    O box escolhido é o livre mais cedo, preferindo o da própria área a um box geral.
+    Quando o trabalho tem duracao_real (replay de um dia passado), é ela que
+    ocupa o box; a decisão continua usando só a duração prevista.
+    """
+    if trabalhos.empty or not boxes or not funcionarios:
+        return pd.DataFrame(columns=['veiculo_id', 'placa', 'area', 'box_id', 'funcionario_id',
+                                     'inicio', 'fim', 'espera'])
+
+    pendentes = trabalhos.to_dict('records')
+    box_livre = {b['id']: b['livre_em'] for b in boxes}
+    box_area = {b['id']: normalizar_area(b.get('area')) for b in boxes}
+    mecanicos = [(f['livre_em'], f['id']) for f in funcionarios]
+    heapq.heapify(mecanicos)
+    veiculo_livre = dict(veiculos_ocupados or {})
+
+    chave = (lambda t: (t['duracao_prevista'], t['chegada'])) if criterio == 'spt' else (lambda t: (t['chegada'], t['duracao_prevista']))
+    agenda = []
+    agora = min(min(t['chegada'] for t in pendentes), min(box_livre.values()))
+
+    while pendentes:
+        agora = max(agora, mecanicos[0][0])
+        livres = [b for b, t in box_livre.items() if t <= agora]
+        candidatos = [
+            t for t in pendentes
+            if t['chegada'] <= agora
+            and veiculo_livre.get(t['veiculo_id'], agora) <= agora
+            and any(box_area[b] in (None, t['area']) for b in livres)
+        ]
+        if not candidatos:
+            proximos = [t['chegada'] for t in pendentes if t['chegada'] > agora]
+            proximos += [t for t in box_livre.values() if t > agora]
+            proximos += [t for t in veiculo_livre.values() if t > agora]
+            if not proximos:
+                # Sobrou trabalho sem nenhum box compatível: não há como agendar
+                break
+            agora = min(proximos)
+            continue
+
+        trabalho = min(candidatos, key=chave)
+        compativeis = [b for b in livres if box_area[b] in (None, trabalho['area'])]
+        box_id = min(compativeis, key=lambda b: (box_area[b] is None, box_livre[b], b))
+        _, funcionario_id = heapq.heappop(mecanicos)
+
+        duracao = trabalho.get('duracao_real')
+        if duracao is None or pd.isna(duracao):
+            duracao = trabalho['duracao_prevista']
+        fim = agora + duracao
+        box_livre[box_id] = fim
+        veiculo_livre[trabalho['veiculo_id']] = fim
+        heapq.heappush(mecanicos, (fim, funcionario_id))
+        pendentes.remove(trabalho)
+        agenda.append({
+            'veiculo_id': trabalho['veiculo_id'], 'placa': trabalho.get('placa'), 'area': trabalho['area'],
+            'box_id': box_id, 'funcionario_id': funcionario_id,
+            'inicio': agora, 'fim': fim, 'espera': agora - trabalho['chegada'],
+        })
+
+    return pd.DataFrame(agenda)
+
+
+def sugestoes_para_patio(snapshot, duracoes, agora=None):
+    """
+    Proposta de alocação para o estado atual do pátio (snapshot de estado_patio).
+    Boxes e mecânicos ocupados ficam livres quando a execução atual deve terminar.
+    Retorna a agenda com inicio/fim como datetimes.
+    """
+    agora = agora or datetime.now(MS_TZ).replace(tzinfo=None)
+    servicos = snapshot["servicos"]
+    trabalhos = montar_trabalhos(servicos[servicos['status'] == 'pendente'], duracoes, agora)
+    # Quem já está esperando chega "agora"; a simulação só olha daqui para frente
+    trabalhos['chegada'] = trabalhos['chegada'].clip(lower=0)
+
+    em_andamento = servicos[servicos['status'] == 'em_andamento']
+    restante_por_execucao = em_andamento['tipo'].map(duracoes).fillna(DURACAO_PADRAO_MIN).groupby(em_andamento['execucao_id']).sum()
+
+    boxes, ocupacao_mecanico, veiculos_ocupados = [], {}, {}
+    for box_id, box in snapshot["boxes"].iterrows():
+        livre_em = 0.0
+        if pd.notna(box['execucao_id']):
+            decorrido = -_minutos(box['inicio_execucao'], agora) if pd.notna(box['inicio_execucao']) else 0.0
+            livre_em = max(0.0, restante_por_execucao.get(box['execucao_id'], DURACAO_PADRAO_MIN) - decorrido)
+            if pd.notna(box['funcionario_id']):
+                ocupacao_mecanico[int(box['funcionario_id'])] = livre_em
+            veiculos_ocupados[int(box['veiculo_id'])] = livre_em
+        boxes.append({'id': int(box_id), 'area': box['box_area'], 'livre_em': livre_em})
+    funcionarios = [{'id': int(f), 'livre_em': ocupacao_mecanico.get(int(f), 0.0)} for f in snapshot["funcionarios"]['id']]
+
+    agenda = propor_alocacao(trabalhos, boxes, funcionarios, veiculos_ocupados=veiculos_ocupados)
+    if not agenda.empty:
+        for coluna in ('inicio', 'fim'):
+            agenda[coluna] = [agora + timedelta(minutes=m) for m in agenda[coluna]]
+    return agenda
+
+
+QUERY_DIA = """
+    SELECT s.veiculo_id, v.placa, s.area, s.tipo, s.data_solicitacao, s.execucao_id,
+           es.inicio_execucao, es.fim_execucao, es.box_id, es.funcionario_id
+    FROM (
+        SELECT veiculo_id, 'borracharia' AS area, tipo, data_solicitacao, execucao_id FROM servicos_solicitados_borracharia UNION ALL
+        SELECT veiculo_id, 'alinhamento' AS area, tipo, data_solicitacao, execucao_id FROM servicos_solicitados_alinhamento UNION ALL
+        SELECT veiculo_id, 'manutencao' AS area, tipo, data_solicitacao, execucao_id FROM servicos_solicitados_manutencao
+    ) s
+    JOIN veiculos v ON v.id = s.veiculo_id
+    JOIN execucao_servico es ON es.id = s.execucao_id
+    WHERE es.status = 'finalizado'
+      AND es.inicio_execucao >= %s AND es.inicio_execucao < %s;
+"""
+
+
+def simular_dia(conn, dia: date, duracoes):
+    """
+    Reexecuta um dia passado: pega os trabalhos iniciados no dia, com seus
+    horários reais de chegada e duração real, e compara a espera que de fato
+    ocorreu com a que o agendador (SPT) e a ordem de chegada (FIFO) teriam dado
+    com os mesmos boxes e mecânicos.
+    """
+    inicio_dia = datetime.combine(dia, datetime.min.time())
+    df = pd.read_sql(QUERY_DIA, conn, params=(inicio_dia, inicio_dia + timedelta(days=1)))
+    if df.empty:
+        return None
+
+    trabalhos = montar_trabalhos(df, duracoes, inicio_dia)
+    reais = df.groupby(['veiculo_id', 'area']).agg(inicio_real=('inicio_execucao', 'min'), fim_real=('fim_execucao', 'max')).reset_index()
+    reais['area'] = reais['area'].map(normalizar_area)
+    trabalhos = trabalhos.merge(reais, on=['veiculo_id', 'area'])
+    # Pedidos feitos em dias anteriores entram na fila na abertura do dia
+    trabalhos['chegada'] = trabalhos['chegada'].clip(lower=0)
+    trabalhos['duracao_real'] = [_minutos(f, inicio_dia) - _minutos(i, inicio_dia) for i, f in zip(trabalhos['inicio_real'], trabalhos['fim_real'])]
+    trabalhos['espera_real'] = [_minutos(i, inicio_dia) for i in trabalhos['inicio_real']] - trabalhos['chegada']
+
+    boxes_df = pd.read_sql("SELECT id, area FROM boxes WHERE id > 0", conn)
+    boxes = [{'id': int(r.id), 'area': r.area, 'livre_em': 0.0} for r in boxes_df.itertuples()]
+    funcionarios = [{'id': int(f), 'livre_em': 0.0} for f in df['funcionario_id'].dropna().unique()]
+
+    entrada = trabalhos[['veiculo_id', 'placa', 'area', 'chegada', 'duracao_prevista', 'duracao_real']]
+    agenda_spt = propor_alocacao(entrada, boxes, funcionarios, criterio='spt')
+    agenda_fifo = propor_alocacao(entrada, boxes, funcionarios, criterio='fifo')
+
+    def _resumo(esperas, fins):
+        return {
+            'espera_total_min': round(float(esperas.clip(lower=0).sum()), 1),
+            'espera_media_min': round(float(esperas.clip(lower=0).mean()), 1) if len(esperas) else 0.0,
+            'ultimo_fim_min': round(float(fins.max()), 1) if len(fins) else 0.0,
+        }
+
+    fins_reais = pd.Series([_minutos(f, inicio_dia) for f in trabalhos['fim_real']])
+    return {
+        'trabalhos': len(trabalhos),
+        'boxes': len(boxes),
+        'mecanicos': len(funcionarios),
+        'real': _resumo(trabalhos['espera_real'], fins_reais),
+        'agendador': _resumo(agenda_spt['espera'], agenda_spt['fim']) if not agenda_spt.empty else None,
+        'fifo': _resumo(agenda_fifo['espera'], agenda_fifo['fim']) if not agenda_fifo.empty else None,
+        'agenda': agenda_spt,
+    }
+
+
+if __name__ == "__main__":
+    from database import get_script_connection
+
+    dia_texto = input("Dia a simular (AAAA-MM-DD): ")
+    try:
+        dia_simulado = datetime.strptime(dia_texto.strip(), "%Y-%m-%d").date()
+    except ValueError:
+        print("Data inválida.")
+        raise SystemExit(1)
+
+    conexao = get_script_connection()
+    if conexao:
+        try:
+            resultado = simular_dia(conexao, dia_simulado, duracoes_historicas(conexao))
+            if not resultado:
+                print("Nenhum trabalho finalizado iniciado nesse dia.")
+            else:
+                print(f"\n{resultado['trabalhos']} trabalhos, {resultado['boxes']} boxes, {resultado['mecanicos']} mecânicos")
+                for nome in ('real', 'fifo', 'agendador'):
+                    print(f"  {nome:>10}: {resultado[nome]}")
+        finally:
+            conexao.close()
@@ -0,0 +1,284 @@
+# arquivar_historico.py
+#
+# Move as visitas encerradas (finalizadas ou canceladas) há mais de --anos
+# anos, com os seus serviços, de execucao_servico e servicos_solicitados_*
+# para execucao_servico_arquivo (migração 0002): uma linha por visita, com os
+# serviços numa coluna JSONB. As tabelas do pátio ficam só com o histórico
+# recente, e a alocação, a fila e a finalização não pagam pelos anos antigos.
+#
+# Para cada veículo com visitas arquivadas, execucao_servico_arquivo_resumo
+# guarda a primeira e a última visita válidas para a média de KM/dia (a média
+# calculada por core_utils continua a mesma) e a última visita finalizada
+# (revisão proativa). O histórico do veículo mostra as visitas arquivadas
+# quando pedido.
+#
+# Roda em lotes de veículos, cada lote numa transação (visitas copiadas,
+# apagadas do pátio e resumo atualizado juntos); interrompido, basta rodar de
+# novo.
+#
+# Os relatórios, os serviços concluídos e o feedback só leem as tabelas do
+# pátio: os seus filtros de data começam em historico.inicio_historico_patio (o dia
+# seguinte à visita arquivada mais recente) e avisam que o período anterior
+# está no arquivo. A previsão de ETA e o agendador usam o último ano, por isso
+# o mínimo é ANOS_MINIMOS.
+#
+# Uso: python arquivar_historico.py [--anos 3] [--lote 500] [--simular]
+#      python arquivar_historico.py --status
+
+import argparse
+import time
+
+import pandas as pd
+import psycopg2.extras
+
+from controle_versao import CHAVE_ARQUIVO, incrementar_versao
+from core_utils import visitas_validas_km
+from database import get_script_connection
+from historico import ENCERRAMENTO, TABELA_ARQUIVO, TABELA_RESUMO_ARQUIVO
+from operacoes_patio import TABELAS_SERVICO
+
+ANOS_PADRAO = 3
+ANOS_MINIMOS = 1
+STATUS_ARQUIVAVEIS = ("finalizado", "cancelado")
+
+QUERY_VEICULOS_ARQUIVAVEIS = f"""
+    SELECT DISTINCT veiculo_id FROM execucao_servico
+    WHERE status IN %s AND {ENCERRAMENTO.format("")} < %s
+    ORDER BY veiculo_id
+"""
+
+QUERY_SIMULACAO = f"""
+    SELECT EXTRACT(YEAR FROM {ENCERRAMENTO.format("es.")})::int AS ano, COUNT(*) AS visitas,
+           SUM((SELECT COUNT(*) FROM servicos_solicitados_borracharia s WHERE s.execucao_id = es.id)
+             + (SELECT COUNT(*) FROM servicos_solicitados_alinhamento s WHERE s.execucao_id = es.id)
+             + (SELECT COUNT(*) FROM servicos_solicitados_manutencao s WHERE s.execucao_id = es.id))::int AS servicos
+    FROM execucao_servico es
+    WHERE es.status IN %s AND {ENCERRAMENTO.format("es.")} < %s
+    GROUP BY 1 ORDER BY 1
+"""
+
+# Serviços de cada visita como JSONB: todas as colunas da linha original mais a área
+_SERVICOS_JSON = " UNION ALL ".join(
+    f"SELECT jsonb_build_object('area', '{area}') || to_jsonb(s) AS servico, s.id "
+    f"FROM {tabela} s WHERE s.execucao_id = es.id"
+    for area, tabela in TABELAS_SERVICO.items()
+)
+
+QUERY_VISITAS_ARQUIVADAS = f"""
+    SELECT veiculo_id, id, fim_execucao, quilometragem, status,
+           (SELECT STRING_AGG(s->>'tipo', '; ') FROM jsonb_array_elements(servicos) s) AS servicos
+    FROM {TABELA_ARQUIVO}
+    WHERE veiculo_id = ANY(%s)
+    ORDER BY veiculo_id, fim_execucao, id
+"""
+
+COLUNAS_RESUMO = [
+    "veiculo_id", "visitas", "primeira_visita", "ultima_visita",
+    "data_km_inicial", "km_inicial", "data_km_final", "km_final",
+    "data_ultima_finalizada", "km_ultima_finalizada", "servicos_ultima_finalizada",
+]
+
+def _colunas_execucao(cursor):
+    """Colunas de execucao_servico (as mesmas no arquivo), na ordem da tabela."""
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'execucao_servico'
+        ORDER BY ordinal_position
+    """)
+    return [r[0] for r in cursor.fetchall()]
+
+
+def resumir(visitas):
+    """
+    Resumo por veículo das visitas arquivadas (DataFrame de QUERY_VISITAS_ARQUIVADAS,
+    ordenado por veículo e data). Retorna um DataFrame com COLUNAS_RESUMO.
+    """
+    if visitas.empty:
+        return pd.DataFrame(columns=COLUNAS_RESUMO)
+    visitas = visitas.assign(fim_execucao=pd.to_datetime(visitas['fim_execucao'], utc=True))
+    grupos = visitas.groupby('veiculo_id')
+    resumo = pd.DataFrame({
+        'visitas': grupos.size(),
+        'primeira_visita': grupos['fim_execucao'].min(),
+        'ultima_visita': grupos['fim_execucao'].max(),
+    })
+
+    # Mesmo filtro de core_utils.QUERY_HISTORICO_KM
+    com_km = visitas[(visitas['status'] == 'finalizado') & (visitas['quilometragem'] > 0)]
+    validas = visitas_validas_km(com_km).groupby('veiculo_id')
+    resumo = resumo.join(pd.DataFrame({
+        'data_km_inicial': validas['fim_execucao'].first(), 'km_inicial': validas['quilometragem'].first(),
+        'data_km_final': validas['fim_execucao'].last(), 'km_final': validas['quilometragem'].last(),
+    }))
+
+    # Mesmo filtro da revisão proativa (pages/revisao_proativa.py)
+    finalizadas = visitas[(visitas['status'] == 'finalizado') & visitas['quilometragem'].notna()]
+    ultima = finalizadas.groupby('veiculo_id').tail(1).set_index('veiculo_id')
+    resumo = resumo.join(ultima[['fim_execucao', 'quilometragem', 'servicos']].set_axis(
+        ['data_ultima_finalizada', 'km_ultima_finalizada', 'servicos_ultima_finalizada'], axis=1))
+    return resumo.reset_index()[COLUNAS_RESUMO]
+
+
+def _valor(valor):
+    """Valor do DataFrame em tipo que o psycopg2 adapta (NaN/NaT viram NULL)."""
+    if pd.isna(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    return valor.item() if hasattr(valor, "item") else valor
+
+
+def atualizar_resumos(cursor, veiculo_ids):
+    """
+    Recalcula, a partir do arquivo, o resumo dos veículos informados (apaga o
+    de quem não tem mais visitas arquivadas). Não faz commit.
+    """
+    veiculo_ids = sorted({int(v) for v in veiculo_ids})
+    if not veiculo_ids:
+        return
+    cursor.execute(QUERY_VISITAS_ARQUIVADAS, (veiculo_ids,))
+    visitas = pd.DataFrame(cursor.fetchall(),
+                           columns=['veiculo_id', 'id', 'fim_execucao', 'quilometragem', 'status', 'servicos'])
+    resumo = resumir(visitas)
+    cursor.execute(f"DELETE FROM {TABELA_RESUMO_ARQUIVO} WHERE veiculo_id = ANY(%s)", (veiculo_ids,))
+    if resumo.empty:
+        return
+    linhas = [tuple(_valor(v) for v in linha) for linha in resumo.itertuples(index=False)]
+    psycopg2.extras.execute_values(
+        cursor, f"INSERT INTO {TABELA_RESUMO_ARQUIVO} ({', '.join(COLUNAS_RESUMO)}) VALUES %s",
+        linhas, page_size=1000)
+
+
+def arquivar_lote(conn, veiculo_ids, corte, colunas):
+    """
+    Arquiva as visitas antigas dos veículos do lote, numa transação.
+    Retorna (visitas, serviços) arquivados.
+    """
+    lista = ", ".join(colunas)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM execucao_servico WHERE veiculo_id = ANY(%s) AND status IN %s "
+                f"AND {ENCERRAMENTO.format('')} < %s FOR UPDATE", (veiculo_ids, STATUS_ARQUIVAVEIS, corte))
+            ids = [r[0] for r in cursor.fetchall()]
+            if not ids:
+                conn.rollback()
+                return 0, 0
+            cursor.execute(f"""
+                INSERT INTO {TABELA_ARQUIVO} ({lista}, servicos)
+                SELECT {", ".join(f"es.{c}" for c in colunas)},
+                       COALESCE((SELECT jsonb_agg(sv.servico ORDER BY sv.id) FROM ({_SERVICOS_JSON}) sv), '[]')
+                FROM execucao_servico es
+                WHERE es.id = ANY(%s)
+                ON CONFLICT (id) DO NOTHING
+            """, (ids,))
+            servicos = 0
+            for tabela in TABELAS_SERVICO.values():
+                cursor.execute(f"DELETE FROM {tabela} WHERE execucao_id = ANY(%s)", (ids,))
+                servicos += cursor.rowcount
+            cursor.execute("DELETE FROM execucao_servico WHERE id = ANY(%s)", (ids,))
+            atualizar_resumos(cursor, veiculo_ids)
+            incrementar_versao(cursor, CHAVE_ARQUIVO)     # as páginas relêem o início do histórico
+        conn.commit()
+        return len(ids), servicos
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def arquivar(conn, anos=ANOS_PADRAO, tamanho_lote=500, simular=False, verbose=True):
+    """Arquiva as visitas encerradas há mais de 'anos' anos. Retorna (visitas, serviços) arquivados."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (TABELA_ARQUIVO,))
+        if not cursor.fetchone()[0]:
+            raise SystemExit("Tabelas do arquivo não encontradas. Rode antes: python migrar_banco.py")
+        cursor.execute("SELECT NOW() - make_interval(years => %s)", (anos,))
+        corte = cursor.fetchone()[0]
+        colunas = _colunas_execucao(cursor)
+    conn.rollback()
+    if verbose:
+        print(f"Arquivando visitas encerradas antes de {corte:%d/%m/%Y}.")
+
+    if simular:
+        simulacao = pd.read_sql(QUERY_SIMULACAO, conn, params=(STATUS_ARQUIVAVEIS, corte))
+        conn.rollback()
+        if simulacao.empty:
+            print("Nada a arquivar.")
+        else:
+            print(simulacao.to_string(index=False))
+            print(f"Total: {simulacao['visitas'].sum()} visitas, {simulacao['servicos'].sum()} serviços (nada foi alterado).")
+        return 0, 0
+
+    with conn.cursor() as cursor:
+        cursor.execute(QUERY_VEICULOS_ARQUIVAVEIS, (STATUS_ARQUIVAVEIS, corte))
+        veiculo_ids = [r[0] for r in cursor.fetchall()]
+    conn.rollback()
+
+    inicio = time.perf_counter()
+    total_visitas = total_servicos = 0
+    for i in range(0, len(veiculo_ids), tamanho_lote):
+        visitas, servicos = arquivar_lote(conn, veiculo_ids[i:i + tamanho_lote], corte, colunas)
+        total_visitas += visitas
+        total_servicos += servicos
+        if verbose:
+            print(f"  {min(i + tamanho_lote, len(veiculo_ids))}/{len(veiculo_ids)} veículos: "
+                  f"{total_visitas} visitas e {total_servicos} serviços arquivados")
+    if verbose:
+        print(f"Concluído em {time.perf_counter() - inicio:.1f}s.")
+    # Espaço das linhas apagadas volta a ser usado pelas tabelas do pátio
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            for tabela in ["execucao_servico", *TABELAS_SERVICO.values(), TABELA_ARQUIVO]:
+                cursor.execute(f"VACUUM ANALYZE {tabela}")
+    finally:
+        conn.autocommit = False
+    return total_visitas, total_servicos
+
+
+def mostrar_status(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (TABELA_ARQUIVO,))
+        if not cursor.fetchone()[0]:
+            print("Arquivo não criado (migração 0002 pendente).")
+            conn.rollback()
+            return
+        cursor.execute(f"""
+            SELECT COUNT(*), MIN(fim_execucao), MAX(fim_execucao),
+                   pg_size_pretty(pg_total_relation_size('{TABELA_ARQUIVO}'))
+            FROM {TABELA_ARQUIVO}
+        """)
+        visitas, primeira, ultima, tamanho = cursor.fetchone()
+        cursor.execute(f"SELECT COUNT(*) FROM {TABELA_RESUMO_ARQUIVO}")
+        veiculos = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*), MIN(fim_execucao) FROM execucao_servico")
+        visitas_patio, mais_antiga = cursor.fetchone()
+    conn.rollback()
+    if visitas:
+        print(f"Arquivo: {visitas} visitas de {veiculos} veículos, de {primeira:%d/%m/%Y} a {ultima:%d/%m/%Y} ({tamanho}).")
+    else:
+        print("Arquivo vazio.")
+    if mais_antiga:
+        print(f"Pátio: {visitas_patio} visitas, a mais antiga de {mais_antiga:%d/%m/%Y}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arquiva as visitas encerradas há mais de N anos.")
+    parser.add_argument("--anos", type=int, default=ANOS_PADRAO, help="arquiva o que foi encerrado antes disso")
+    parser.add_argument("--lote", type=int, default=500, help="veículos por transação")
+    parser.add_argument("--simular", action="store_true", help="só mostra quanto seria arquivado, por ano")
+    parser.add_argument("--status", action="store_true", help="mostra o tamanho do arquivo e do histórico do pátio")
+    args = parser.parse_args()
+    if args.anos < ANOS_MINIMOS:
+        parser.error(f"--anos deve ser pelo menos {ANOS_MINIMOS} (a previsão de ETA e o agendador usam o último ano).")
+
+    conn = get_script_connection()
+    if not conn:
+        raise SystemExit(1)
+    try:
+        if args.status:
+            mostrar_status(conn)
+        else:
+            arquivar(conn, args.anos, args.lote, args.simular)
+    finally:
+        conn.close()
@@ -1,35 +1,149 @@
 # auth_utils.py
 
+from dataclasses import dataclass
 import streamlit as st
 import streamlit_authenticator as stauth
 from database import get_connection, release_connection
-import pandas as pd
+from controle_versao import CHAVE_USUARIOS, get_versao, incrementar_versao, versao_alterada
+from credenciais import gastar_verificacao, gerar_hash, precisa_rehash, verificar_senha
 
-def fetch_users_from_db():
-    # ... (esta função permanece igual)
+QUERY_USUARIOS = "SELECT id, nome, username, password_hash, role FROM usuarios"
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _carregar_credenciais(versao):
+    """
+    Credenciais de todos os usuários, no formato do streamlit_authenticator.
+    O cache é por versão de CHAVE_USUARIOS: a consulta só se repete depois de
+    uma alteração no cadastro de usuários, não a cada rerun.
+    """
     conn = get_connection()
     if not conn:
-        st.error("Falha ao conectar ao banco de dados para autenticação.")
-        return None
+        raise ConnectionError("Falha ao conectar ao banco de dados para autenticação.")
     try:
-        query = "SELECT nome, username, password_hash, role FROM usuarios"
-        # A warning do pandas pode ser ignorada, não é a causa do erro.
-        df_users = pd.read_sql(query, conn)
-        
-        credentials = {"usernames": {}}
-        for index, row in df_users.iterrows():
-            credentials["usernames"][row['username']] = {
-                "name": row['nome'],
-                "password": row['password_hash'],
-                "role": row['role']
-            }
-        return credentials
+        with conn.cursor() as cursor:
+            cursor.execute(QUERY_USUARIOS)
+            usuarios = cursor.fetchall()
+        return {"usernames": {
+            username: {"id": id_usuario, "name": nome, "password": password_hash, "role": role}
+            for id_usuario, nome, username, password_hash, role in usuarios
+        }}
+    finally:
+        release_connection(conn)
+
+def fetch_users_from_db():
+    try:
+        return _carregar_credenciais(get_versao(CHAVE_USUARIOS))
     except Exception as e:
         st.error(f"Erro ao buscar usuários: {e}")
         return None
+
+@dataclass(frozen=True)
+class ContextoUsuario:
+    """Usuário logado: montado uma vez no login e guardado na sessão, sem alteração depois."""
+    id: int
+    nome: str
+    username: str
+    role: str
+
+    @property
+    def admin(self):
+        return self.role == 'admin'
+
+def carregar_contexto_usuario(authenticator, username):
+    """
+    Guarda na sessão o contexto do usuário que fez login, a partir das
+    credenciais que o autenticador já tem (sem nova consulta ao banco).
+    Só monta o contexto quando o usuário da sessão muda. Também preenche
+    user_id, user_role e user_name, que as páginas e as gravações de
+    auditoria (alocação, finalização) leem. Retorna o contexto ou None.
+    """
+    atual = st.session_state.get('usuario')
+    if atual is not None and atual.username == username:
+        return atual
+
+    dados = authenticator.credentials['usernames'].get(username)
+    if dados is None:
+        return None
+    contexto = ContextoUsuario(id=int(dados['id']), nome=dados['name'], username=username,
+                               role=dados['role'] or 'funcionario')
+    st.session_state['usuario'] = contexto
+    st.session_state['user_id'] = contexto.id
+    st.session_state['user_role'] = contexto.role
+    st.session_state['user_name'] = contexto.nome
+    return contexto
+
+def limpar_contexto_usuario():
+    for chave in ('usuario', 'user_id', 'user_role', 'user_name'):
+        st.session_state.pop(chave, None)
+
+def usuario_atual():
+    """ContextoUsuario do usuário logado nesta sessão, ou None."""
+    return st.session_state.get('usuario')
+
+def exigir_login(admin=False):
+    """
+    Para as páginas abertas direto pela URL (links da barra do celular), que
+    não passam pelo login do main.py: interrompe a execução se a sessão não
+    tem usuário logado ou, com admin=True, se o usuário não é administrador.
+    """
+    usuario = usuario_atual()
+    if not st.session_state.get('authentication_status') or usuario is None:
+        st.warning('Faça login pela página inicial para acessar esta tela.')
+        st.stop()
+    if admin and not usuario.admin:
+        st.error('Acesso restrito a administradores.')
+        st.stop()
+    return usuario
+
+def _atualizar_hash(username, hash_antigo, hash_novo):
+    """Grava o hash novo se o salvo ainda for o antigo. Falhas não impedem o login."""
+    conn = get_connection()
+    if not conn:
+        return False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE usuarios SET password_hash = %s WHERE lower(username) = %s AND password_hash = %s",
+                (hash_novo, username, hash_antigo)
+            )
+            if cursor.rowcount:
+                incrementar_versao(cursor, CHAVE_USUARIOS)
+        conn.commit()
+        versao_alterada()
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"Não foi possível atualizar o hash da senha de '{username}': {e}")
+        return False
     finally:
         release_connection(conn)
 
+class Autenticador(stauth.Authenticate):
+    """
+    Authenticate com a verificação de senha de credenciais.py: aceita também os
+    hashes SHA-256 antigos e, quando a senha confere, troca o hash salvo por um
+    bcrypt com o custo atual. Usuário inexistente gasta o mesmo tempo de um
+    existente.
+
+    Sobrescreve métodos internos do streamlit-authenticator 0.2.x; por isso a
+    versão está fixada em requirements.txt. Ao atualizar, conferir se
+    _check_credentials e _check_pw ainda existem com a mesma assinatura.
+    """
+    def _check_credentials(self, inplace=True):
+        if self.username not in self.credentials['usernames']:
+            gastar_verificacao()
+        return super()._check_credentials(inplace)
+
+    def _check_pw(self):
+        hash_salvo = self.credentials['usernames'][self.username]['password']
+        if not verificar_senha(self.password, hash_salvo):
+            return False
+        if precisa_rehash(hash_salvo):
+            hash_novo = gerar_hash(self.password)
+            if _atualizar_hash(self.username, hash_salvo, hash_novo):
+                self.credentials['usernames'][self.username]['password'] = hash_novo
+        return True
+
 def initialize_authenticator():
     """
     Inicializa o objeto de autenticação com os dados do banco.
@@ -40,7 +154,7 @@ def initialize_authenticator():
     if credentials and credentials.get("usernames"):
         # --- CORREÇÃO APLICADA AQUI ---
         # Os parâmetros do cookie agora são passados pelos seus nomes corretos.
-        authenticator = stauth.Authenticate(
+        authenticator = Autenticador(
             credentials=credentials,
             cookie_name=cookie_config.get('name', 'some_cookie_name'),
             key=cookie_config.get('key', 'some_signature_key'),
@@ -51,5 +165,4 @@ def initialize_authenticator():
     return None
 
 def hash_new_password(password):
-    # ... (esta função permanece igual)
-    return stauth.Hasher([password]).generate()[0]
\ No newline at end of file
+    return gerar_hash(password)
\ No newline at end of file
@@ -0,0 +1,180 @@
+# benchmark_consultas.py
+#
+# Mede as consultas e funções centrais do app contra o banco sintético de
+# gerar_dados_sinteticos.py, em uma ou mais escalas. Cada caso roda uma vez
+# para aquecer e depois --repeticoes vezes; o resultado (p50, p95, mínimo e
+# linhas) pode ser salvo em JSON e comparado com uma rodada anterior:
+#
+#   python benchmark_consultas.py --escalas pequena media --saida antes.json
+#   ... mudança ...
+#   python benchmark_consultas.py --escalas pequena media --saida depois.json --comparar antes.json
+#
+# Sem --sem-gerar, cada escala é gerada de novo (--recriar) antes de medir,
+# sempre com a mesma semente e com as migrações aplicadas; --sem-migracoes
+# mede o banco sem os índices, para comparar, e --arquivar N mede com as
+# visitas de mais de N anos no arquivo (arquivar_historico.py).
+# ATENÇÃO: só roda contra um Postgres local (DB_URL).
+
+import argparse
+import json
+import statistics
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from core_utils import recalcular_media_veiculo
+from estado_patio import ler_estado_patio
+from gerar_dados_sinteticos import ESCALAS, conexao_local, gerar
+from motor_relatorios import dados_relatorio_postgres
+from operacoes_patio import QUERY_PENDENTES_VEICULO
+from pages.dados_clientes import buscar_clientes
+from pages.exportar_contatos import consultar_contatos
+from pages.feedback_servicos import QUERY_FEEDBACK_PENDENTE
+from pages.revisao_proativa import QUERY_CANDIDATOS_REVISAO
+from pages.servicos_concluidos import QUERY_SERVICOS_CONCLUIDOS
+from utils import QUERY_CLIENTES_SIMILARES
+
+
+class Amostra:
+    """Parâmetros sorteados para os casos (veículos, termos de busca, datas), com semente fixa."""
+
+    def __init__(self, conn, semente):
+        self.rng = np.random.default_rng(semente)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM veiculos")
+            self.veiculo_ids = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT nome_empresa FROM clientes WHERE nome_empresa IS NOT NULL")
+            self.empresas = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT MAX(fim_execucao)::date FROM execucao_servico")
+            self.hoje = cursor.fetchone()[0]
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+            self.tem_trgm = cursor.fetchone()[0]
+        conn.rollback()
+
+    def veiculo(self):
+        return int(self.rng.choice(self.veiculo_ids))
+
+    def termo(self):
+        """Trecho de 3 a 6 letras de um nome de empresa, como o digitado na busca."""
+        nome = str(self.rng.choice(self.empresas))
+        tamanho = int(self.rng.integers(3, 7))
+        inicio = int(self.rng.integers(0, max(1, len(nome) - tamanho)))
+        return nome[inicio:inicio + tamanho]
+
+
+def _relatorio(dias):
+    return lambda conn, amostra: dados_relatorio_postgres(conn, amostra.hoje - timedelta(days=dias), amostra.hoje)
+
+
+# Nome -> função(conn, amostra); o retorno é usado só para contar as linhas
+CASOS = {
+    "estado_patio (get_estado_atual_boxes)": lambda conn, amostra: ler_estado_patio(conn)["boxes"],
+    "revisao_proativa": lambda conn, amostra: pd.read_sql(QUERY_CANDIDATOS_REVISAO, conn),
+    "recalcular_media_veiculo": lambda conn, amostra: recalcular_media_veiculo(conn, amostra.veiculo()),
+    "relatorio 30 dias": _relatorio(30),
+    "relatorio 365 dias": _relatorio(365),
+    "servicos concluidos 7 dias": lambda conn, amostra: pd.read_sql(
+        QUERY_SERVICOS_CONCLUIDOS, conn,
+        params={"inicio": amostra.hoje - timedelta(days=6), "fim": amostra.hoje + timedelta(days=1)}),
+    "feedback pendente 30 dias": lambda conn, amostra: pd.read_sql(
+        QUERY_FEEDBACK_PENDENTE, conn, params=(amostra.hoje - timedelta(days=35),)),
+    "pendentes do veiculo": lambda conn, amostra: pd.read_sql(
+        QUERY_PENDENTES_VEICULO, conn, params={"veiculo_id": amostra.veiculo()}),
+    "busca de clientes": lambda conn, amostra: buscar_clientes(conn, amostra.termo()),
+    "busca de clientes (similaridade)": lambda conn, amostra: pd.read_sql(
+        QUERY_CLIENTES_SIMILARES, conn, params={"termo": amostra.termo()}),
+    "exportacao de contatos (novos)": lambda conn, amostra: consultar_contatos(conn, False)[1],
+    "exportacao de contatos (todos)": lambda conn, amostra: consultar_contatos(conn, True)[1],
+}
+
+
+def _linhas(resultado):
+    return len(resultado) if hasattr(resultado, "__len__") else None
+
+
+def medir_caso(conn, funcao, amostra, repeticoes):
+    funcao(conn, amostra)          # aquecimento: cache do Postgres e planos
+    conn.rollback()
+    tempos, linhas = [], None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(conn, amostra)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        conn.rollback()            # não deixa transação aberta entre as medições
+        linhas = _linhas(resultado)
+    tempos.sort()
+    return {
+        "p50_ms": statistics.median(tempos),
+        "p95_ms": tempos[max(0, int(round(len(tempos) * 0.95)) - 1)],
+        "min_ms": tempos[0],
+        "linhas": linhas,
+    }
+
+
+def medir_escala(conn, repeticoes, semente, filtro=None):
+    amostra = Amostra(conn, semente)
+    resultados = {}
+    for nome, funcao in CASOS.items():
+        if filtro and not any(f in nome for f in filtro):
+            continue
+        if "similaridade" in nome and not amostra.tem_trgm:
+            print(f"  {nome:<40} (pulado: extensão pg_trgm ausente)")
+            continue
+        resultados[nome] = medir_caso(conn, funcao, amostra, repeticoes)
+        r = resultados[nome]
+        print(f"  {nome:<40} p50 {r['p50_ms']:>8.1f}ms  p95 {r['p95_ms']:>8.1f}ms  "
+              f"mín {r['min_ms']:>8.1f}ms  {r['linhas'] if r['linhas'] is not None else '-':>7} linhas")
+    return resultados
+
+
+def comparar(atual, anterior):
+    print("\n--- Comparação com a rodada anterior (p50) ---")
+    for escala, casos in atual.items():
+        for nome, r in casos.items():
+            base = anterior.get(escala, {}).get(nome)
+            if not base:
+                continue
+            variacao = (r["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100 if base["p50_ms"] else 0
+            print(f"  [{escala}] {nome:<40} {base['p50_ms']:>8.1f}ms -> {r['p50_ms']:>8.1f}ms  ({variacao:+.0f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das consultas centrais sobre dados sintéticos.")
+    parser.add_argument("--escalas", nargs="+", choices=ESCALAS, default=["pequena", "media"])
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--sem-gerar", action="store_true", help="mede o banco como está (uma escala só)")
+    parser.add_argument("--sem-migracoes", action="store_true", help="gera as escalas sem aplicar as migrações")
+    parser.add_argument("--arquivar", type=int, metavar="ANOS", help="gera as escalas com o histórico antigo arquivado")
+    parser.add_argument("--casos", nargs="+", help="mede só os casos cujo nome contém algum destes trechos")
+    parser.add_argument("--saida", help="grava os resultados neste arquivo JSON")
+    parser.add_argument("--comparar", help="JSON de uma rodada anterior para comparar")
+    args = parser.parse_args()
+
+    conn = conexao_local()
+    if not conn:
+        raise SystemExit(1)
+    todos = {}
+    try:
+        for escala in (["atual"] if args.sem_gerar else args.escalas):
+            if not args.sem_gerar:
+                inicio = time.perf_counter()
+                contagem = gerar(conn, escala, args.semente, recriar=True, migracoes=not args.sem_migracoes,
+                                 arquivar_anos=args.arquivar)
+                print(f"\nEscala '{escala}': {contagem['veiculos']} veículos, {contagem['execucao_servico']} execuções "
+                      f"(gerada em {time.perf_counter() - inicio:.1f}s)")
+            else:
+                print("\nBanco atual:")
+            todos[escala] = medir_escala(conn, args.repeticoes, args.semente, args.casos)
+    finally:
+        conn.close()
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(todos, arquivo, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.saida}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            comparar(todos, json.load(arquivo))
@@ -0,0 +1,66 @@
+# benchmark_credenciais.py
+#
+# Ajuda a escolher CUSTO_BCRYPT para o servidor em que o app roda: para cada
+# custo mede uma verificação isolada e uma rajada de logins simultâneos (a
+# troca de turno), e indica o maior custo cujo p95 da rajada fica dentro do alvo.
+# O custo escolhido vai na variável de ambiente CUSTO_BCRYPT; os hashes salvos
+# são atualizados aos poucos, no próximo login de cada usuário.
+#
+# Uso: python benchmark_credenciais.py [--custos 10 11 12 13] [--simultaneos 15] [--alvo-ms 500]
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from credenciais import CUSTO_BCRYPT, gerar_hash, verificar_senha
+
+SENHA = "senha-de-teste-123"
+
+
+def _cronometrar(hash_salvo):
+    inicio = time.perf_counter()
+    verificar_senha(SENHA, hash_salvo)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def _login_na_rajada(hash_salvo, inicio):
+    verificar_senha(SENHA, hash_salvo)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def medir(custo, simultaneos, amostras):
+    hash_salvo = gerar_hash(SENHA, custo)
+    isolada = statistics.median(_cronometrar(hash_salvo) for _ in range(amostras))
+
+    # Rajada: todos os logins chegam juntos; a latência de cada um inclui a espera pelos outros
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=simultaneos) as executor:
+        tempos = list(executor.map(lambda _: _login_na_rajada(hash_salvo, inicio), range(simultaneos)))
+    fim_rajada = (time.perf_counter() - inicio) * 1000
+    return isolada, tempos, fim_rajada
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o custo do bcrypt no servidor atual.")
+    parser.add_argument("--custos", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--simultaneos", type=int, default=15, help="logins ao mesmo tempo na rajada")
+    parser.add_argument("--amostras", type=int, default=5)
+    parser.add_argument("--alvo-ms", type=float, default=500, help="p95 máximo aceitável do login na rajada")
+    args = parser.parse_args()
+
+    print(f"Custo atual (CUSTO_BCRYPT): {CUSTO_BCRYPT}\n")
+    print(f"{'custo':>5}  {'isolada':>9}  {'rajada p50':>10}  {'rajada p95':>10}  {'rajada total':>12}")
+    recomendado = None
+    for custo in sorted(args.custos):
+        isolada, tempos, total = medir(custo, args.simultaneos, args.amostras)
+        p50 = statistics.median(tempos)
+        p95 = statistics.quantiles(tempos, n=20)[-1] if len(tempos) > 1 else tempos[0]
+        print(f"{custo:>5}  {isolada:>7.0f}ms  {p50:>8.0f}ms  {p95:>8.0f}ms  {total:>10.0f}ms")
+        if p95 <= args.alvo_ms:
+            recomendado = custo
+
+    if recomendado is None:
+        print(f"\nNenhum custo testado fica abaixo de {args.alvo_ms:.0f}ms na rajada; teste custos menores.")
+    else:
+        print(f"\nMaior custo com p95 da rajada até {args.alvo_ms:.0f}ms: {recomendado} (CUSTO_BCRYPT={recomendado})")
@@ -0,0 +1,100 @@
+# benchmark_inicializacao.py
+#
+# Mede a partida a frio do app, cada medição num processo Python novo (sem
+# módulos em cache, como o container depois de ficar ocioso):
+#   1. tempo até o formulário de login: import do Streamlit + primeira execução
+#      do main.py (autenticador incluído), via streamlit.testing.AppTest
+#   2. custo de importar cada página, que o main.py só paga quando a página é aberta
+#
+# Precisa de DB_URL (variável de ambiente ou .env): o login lê os usuários do banco.
+#
+# Uso: python benchmark_inicializacao.py [--repeticoes 5] [--sem-paginas]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from registro_paginas import PAGINAS
+
+PASTA_APP = os.path.dirname(os.path.abspath(__file__))
+
+CODIGO_LOGIN = """
+import time
+inicio = time.perf_counter()
+import os
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("main.py", default_timeout=120)
+if os.getenv("DB_URL"):
+    app.secrets["DB_URL"] = os.environ["DB_URL"]
+app.run()
+erros = [e.value for e in app.exception] + [e.value for e in app.error]
+print(__import__("json").dumps({"segundos": time.perf_counter() - inicio, "erros": erros}))
+"""
+
+# Roda dentro do AppTest, que fornece os secrets que algumas páginas leem ao serem importadas
+SCRIPT_IMPORT_PAGINA = """
+import importlib, time
+import pandas, streamlit as st
+inicio = time.perf_counter()
+importlib.import_module("pages.{modulo}")
+st.session_state["segundos"] = time.perf_counter() - inicio
+"""
+
+CODIGO_PAGINA = """
+import json, sys
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_string(sys.argv[1], default_timeout=120)
+app.secrets["DB_URL"] = ""
+app.run()
+if app.exception:
+    raise SystemExit(app.exception[0].value)
+print(json.dumps({"segundos": app.session_state["segundos"]}))
+"""
+
+
+def _rodar(codigo, *args):
+    """Executa o código num processo novo e devolve o JSON da última linha impressa."""
+    processo = subprocess.run(
+        [sys.executable, "-c", codigo, *args], cwd=PASTA_APP,
+        capture_output=True, text=True, timeout=300,
+    )
+    linhas = processo.stdout.strip().splitlines()
+    if processo.returncode != 0 or not linhas:
+        return {"erro": (processo.stderr.strip().splitlines() or ["sem saída"])[-1]}
+    return json.loads(linhas[-1])
+
+
+def medir_login(repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        resultado = _rodar(CODIGO_LOGIN)
+        if "erro" in resultado or resultado["erros"]:
+            print(f"  Falha ao abrir o login: {resultado.get('erro') or resultado['erros']}")
+            return
+        tempos.append(resultado["segundos"])
+    print(f"Tempo até o formulário de login ({repeticoes} partidas a frio):")
+    print(f"  mediana {statistics.median(tempos):.2f}s   mín {min(tempos):.2f}s   máx {max(tempos):.2f}s")
+
+
+def medir_paginas():
+    print("\nImport de cada página (pago na primeira vez que é aberta):")
+    for nome, (modulo, _) in sorted(PAGINAS.items()):
+        resultado = _rodar(CODIGO_PAGINA, SCRIPT_IMPORT_PAGINA.format(modulo=modulo))
+        tempo = f"{resultado['segundos']:.2f}s" if "segundos" in resultado else f"erro: {resultado['erro']}"
+        print(f"  {nome:<24} {tempo}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede a partida a frio do app.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--sem-paginas", action="store_true", help="mede só o tempo até o login")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    medir_login(args.repeticoes)
+    if not args.sem_paginas:
+        medir_paginas()
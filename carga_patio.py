@@ -0,0 +1,491 @@
+# carga_patio.py
+#
+# Teste de carga do pátio: N operadores e M TVs do painel de filas ao mesmo
+# tempo, no mesmo processo, como seria num único servidor do app.
+#
+#   operadores  cada um em sua thread, repete: lê o snapshot do pátio (como a
+#               página ao rodar) e faz uma ação — cadastro de serviços,
+#               alocação, serviço extra no box, finalização (com o recálculo da
+#               média) ou retirada do box — com uma pausa aleatória entre ações.
+#   paineis     a cada --intervalo-painel segundos leem a versão do pátio e,
+#               se mudou, o snapshot, como pages/filas_servico.py.
+#
+# As funções chamadas são as mesmas do app (operacoes_patio, estado_patio,
+# core_utils). As conexões vêm de um pool do mesmo tamanho do app
+# (database.py, --pool); a versão e o snapshot usam um cache de processo com
+# as mesmas regras do st.cache_data (versão compartilhada por
+# INTERVALO_VERSAO_S, snapshot pela versão).
+#
+# Relata, por ação: vazão, erros e latência (p50/p95/p99); espera por conexão
+# no pool (e quantas vezes o pool esgotou — no app, SimpleConnectionPool daria
+# PoolError); conflitos de lock (recusas por lock, sessões esperando lock no
+# pg_stat_activity, deadlocks); e, no fim, as verificações de consistência de
+# stress_alocacao.py. Com várias quantidades em --operadores/--paineis, roda
+# uma rodada por combinação e fecha com uma tabela comparativa.
+#
+# ATENÇÃO: grava no banco e não desfaz. Só roda contra um Postgres local;
+# prepare os dados com gerar_dados_sinteticos.py, por exemplo:
+#
+#   python gerar_dados_sinteticos.py --escala pequena --recriar
+#   python carga_patio.py --operadores 4 8 16 --paineis 4 16 --boxes 20 --duracao 60
+
+import argparse
+import os
+import random
+import threading
+import time
+import warnings
+from collections import defaultdict
+from itertools import product
+
+import numpy as np
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+from psycopg2 import pool
+
+from controle_versao import CHAVE_PATIO, INTERVALO_VERSAO_S
+from core_utils import recalcular_media_veiculo
+from estado_patio import boxes_livres, ler_estado_patio, servicos_do_veiculo, veiculos_aguardando_alocacao
+from gerar_dados_sinteticos import conexao_local
+from operacoes_patio import (TABELAS_SERVICO, adicionar_servico, alocar_servico, concluir_execucao,
+                             desalocar_execucao, registrar_servicos)
+from stress_alocacao import VERIFICACOES
+
+# pandas avisa a cada read_sql com conexão psycopg2 pura; o app faz o mesmo
+warnings.filterwarnings("ignore", message=".*pandas only supports SQLAlchemy.*")
+
+TAMANHO_POOL_APP = 10         # database.init_connection_pool: SimpleConnectionPool(1, 10)
+INTERVALO_PAINEL_S = 5        # pages/filas_servico.py
+ESPERA_MAXIMA_POOL_S = 30
+
+# Peso de cada ação do operador; sem o que fazer, a ação cai na seguinte da lista
+PESOS_ACOES = {"cadastro": 0.25, "alocacao": 0.30, "servico_extra": 0.15, "finalizacao": 0.25, "retirada": 0.05}
+
+# Trechos das mensagens de recusa que indicam disputa de lock...
+_MARCAS_CONFLITO = ("Outro operador", "lock timeout", "could not obtain lock", "deadlock", "bloqueio")
+# ... e os que indicam que outro operador chegou antes (a tela estava desatualizada)
+_MARCAS_DISPUTA = ("acabou de ser ocupado", "por outro operador")
+
+
+def _percentil(valores, p):
+    return float(np.percentile(valores, p)) if valores else 0.0
+
+
+class Metricas:
+    """Latências, erros e esperas de pool, somados entre as threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.motivos = defaultdict(int)
+        self.conflitos = 0
+        self.disputas = 0
+        self.esperas_pool = []
+        self.pool_esgotado = 0
+
+    def registrar(self, acao, segundos, sucesso=True, motivo=None):
+        with self._lock:
+            self.latencias[acao].append(segundos * 1000)
+            if not sucesso:
+                self.erros[acao] += 1
+                motivo = str(motivo).splitlines()[0][:90]
+                self.motivos[f"{acao}: {motivo}"] += 1
+                if any(marca in motivo for marca in _MARCAS_CONFLITO):
+                    self.conflitos += 1
+                elif any(marca in motivo for marca in _MARCAS_DISPUTA):
+                    self.disputas += 1
+
+    def registrar_espera(self, segundos, esgotado):
+        with self._lock:
+            self.esperas_pool.append(segundos * 1000)
+            self.pool_esgotado += esgotado
+
+
+class PoolMedido:
+    """
+    Pool com o tamanho máximo do app que mede quanto cada thread esperou por
+    uma conexão. O SimpleConnectionPool do app não espera (levanta PoolError
+    quando esgota); aqui a thread espera e o esgotamento é contado.
+    """
+
+    def __init__(self, dsn, tamanho, metricas):
+        self._pool = pool.ThreadedConnectionPool(1, tamanho, dsn=dsn)
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._metricas = metricas
+
+    def getconn(self):
+        inicio = time.perf_counter()
+        esgotado = not self._vagas.acquire(blocking=False)
+        if esgotado and not self._vagas.acquire(timeout=ESPERA_MAXIMA_POOL_S):
+            raise pool.PoolError("pool esgotado: nenhuma conexão liberada a tempo")
+        self._metricas.registrar_espera(time.perf_counter() - inicio, esgotado)
+        try:
+            return self._pool.getconn()
+        except Exception:
+            # Sem conexão (banco fora, max_connections): a vaga volta para o pool
+            self._vagas.release()
+            raise
+
+    def putconn(self, conn):
+        descartar = False
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            descartar = True    # conexão quebrada: fecha em vez de devolver ao pool
+        try:
+            self._pool.putconn(conn, close=descartar)
+        finally:
+            self._vagas.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+class CacheProcesso:
+    """
+    O get_versao (TTL de INTERVALO_VERSAO_S) e o _carregar_snapshot (chave =
+    versão) do app, compartilhados por todas as threads como o st.cache_data
+    é compartilhado por todas as sessões. Como no st.cache_data, duas threads
+    que perdem o cache ao mesmo tempo consultam as duas.
+    """
+
+    def __init__(self, pool_conexoes, metricas):
+        self._pool = pool_conexoes
+        self._metricas = metricas
+        self._lock = threading.Lock()
+        self._versao = (None, 0.0)
+        self._snapshot = None
+        self.leituras_snapshot = 0
+
+    def _com_conexao(self, funcao):
+        conn = self._pool.getconn()
+        try:
+            return funcao(conn)
+        finally:
+            self._pool.putconn(conn)
+
+    def versao(self):
+        with self._lock:
+            versao, lida_em = self._versao
+        if versao is not None and time.monotonic() - lida_em < INTERVALO_VERSAO_S:
+            return versao
+
+        def ler(conn):
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT versao FROM versoes_cache WHERE chave = %s", (CHAVE_PATIO,))
+                linha = cursor.fetchone()
+            conn.rollback()
+            return linha[0] if linha else 0
+
+        inicio = time.perf_counter()
+        versao = self._com_conexao(ler)
+        self._metricas.registrar("leitura da versao", time.perf_counter() - inicio)
+        with self._lock:
+            self._versao = (versao, time.monotonic())
+        return versao
+
+    def versao_alterada(self):
+        with self._lock:
+            self._versao = (None, 0.0)
+
+    def snapshot(self):
+        versao = self.versao()
+        with self._lock:
+            if self._snapshot is not None and self._snapshot["versao"] == versao:
+                return self._snapshot
+        inicio = time.perf_counter()
+        snapshot = {"versao": versao, **self._com_conexao(ler_estado_patio)}
+        self._metricas.registrar("leitura do snapshot", time.perf_counter() - inicio)
+        with self._lock:
+            self.leituras_snapshot += 1
+            if self._snapshot is None or self._snapshot["versao"] <= versao:
+                self._snapshot = snapshot
+        return snapshot
+
+
+class Dados:
+    """O que os operadores sorteiam: veículos, funcionários e o catálogo de serviços."""
+
+    def __init__(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM veiculos")
+            self.veiculos = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT id FROM funcionarios WHERE id > 0")
+            self.funcionarios = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT id FROM usuarios")
+            self.usuarios = [r[0] for r in cursor.fetchall()] or [None]
+            self.catalogo = {}
+            for area in TABELAS_SERVICO:
+                cursor.execute(f"SELECT nome FROM servicos_{area} ORDER BY nome")
+                self.catalogo[area] = [r[0] for r in cursor.fetchall()]
+        conn.rollback()
+
+
+def garantir_boxes(conn, quantidade):
+    """Cria boxes até o pátio ter pelo menos 'quantidade' (para simular um pátio maior)."""
+    areas = list(TABELAS_SERVICO)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FILTER (WHERE id > 0) FROM boxes")
+        maior_id, existentes = cursor.fetchone()
+        novos = [(maior_id + i + 1, areas[(maior_id + i) % len(areas)]) for i in range(max(0, quantidade - existentes))]
+        if novos:
+            psycopg2.extras.execute_values(cursor, "INSERT INTO boxes (id, area) VALUES %s", novos)
+    conn.commit()
+    return len(novos)
+
+
+class Operador:
+    """Uma sessão de operador: sorteia ações e as executa como as páginas do app."""
+
+    def __init__(self, pool_conexoes, cache, dados, metricas, pausa, semente):
+        self.pool = pool_conexoes
+        self.cache = cache
+        self.dados = dados
+        self.metricas = metricas
+        self.pausa = pausa
+        self.rng = random.Random(semente)
+
+    def _usuario(self):
+        return self.rng.choice(self.dados.usuarios)
+
+    def cadastro(self, conn, snapshot):
+        itens = []
+        for _ in range(self.rng.randint(1, 3)):
+            area = self.rng.choice([a for a, tipos in self.dados.catalogo.items() if tipos])
+            itens.append({"area": area, "tipo": self.rng.choice(self.dados.catalogo[area]), "qtd": self.rng.randint(1, 4)})
+        return registrar_servicos(conn, self.rng.choice(self.dados.veiculos), itens,
+                                  self.rng.randint(50_000, 900_000), "carga_patio", self.dados.catalogo)
+
+    def alocacao(self, conn, snapshot):
+        aguardando = veiculos_aguardando_alocacao(snapshot)
+        livres = boxes_livres(snapshot)
+        if aguardando.empty or not livres:
+            return None
+        veiculo_id = int(self.rng.choice(aguardando['id'].tolist()))
+        pendentes = servicos_do_veiculo(snapshot, veiculo_id, 'pendente')
+        area = self.rng.choice(pendentes['area'].unique().tolist())
+        quilometragem = int(pendentes['quilometragem'].max()) if pendentes['quilometragem'].notna().any() else 0
+        box_id = int(self.rng.choice(livres)) if self.rng.random() < 0.5 else None
+        return alocar_servico(conn, veiculo_id, area, self.rng.choice(self.dados.funcionarios), quilometragem,
+                              box_id=box_id, usuario_id=self._usuario())
+
+    def _box_ocupado(self, snapshot):
+        ocupados = snapshot["boxes"][snapshot["boxes"]['execucao_id'].notna()]
+        if ocupados.empty:
+            return None
+        box_id = self.rng.choice(ocupados.index.tolist())
+        return int(box_id), int(ocupados.at[box_id, 'execucao_id']), int(ocupados.at[box_id, 'veiculo_id'])
+
+    def servico_extra(self, conn, snapshot):
+        ocupado = self._box_ocupado(snapshot)
+        if not ocupado:
+            return None
+        box_id, execucao_id, _ = ocupado
+        area = self.rng.choice([a for a, tipos in self.dados.catalogo.items() if tipos])
+        return adicionar_servico(conn, box_id, execucao_id, area, self.rng.choice(self.dados.catalogo[area]), 1)
+
+    def finalizacao(self, conn, snapshot):
+        ocupado = self._box_ocupado(snapshot)
+        if not ocupado:
+            return None
+        box_id, execucao_id, veiculo_id = ocupado
+        servicos = snapshot["servicos"]
+        servicos = servicos[(servicos['execucao_id'] == execucao_id) & (servicos['status'] == 'em_andamento')]
+        itens = [{"area": s.area, "db_id": int(s.id), "qtd_executada": int(s.quantidade or 1)}
+                 for s in servicos.itertuples()]
+        resultado = concluir_execucao(conn, box_id, execucao_id, itens, "", self._usuario())
+        if resultado[0]:
+            recalcular_media_veiculo(conn, veiculo_id)
+        return resultado
+
+    def retirada(self, conn, snapshot):
+        ocupado = self._box_ocupado(snapshot)
+        if not ocupado:
+            return None
+        return desalocar_execucao(conn, ocupado[0], ocupado[1])
+
+    def executar(self, acao):
+        """Executa a ação; se não houver o que fazer (sem box livre, nada na fila), tenta a próxima."""
+        acoes = list(PESOS_ACOES)
+        for tentativa in acoes[acoes.index(acao):] + acoes[:acoes.index(acao)]:
+            snapshot = self.cache.snapshot()
+            inicio = time.perf_counter()
+            conn = self.pool.getconn()
+            try:
+                resultado = getattr(self, tentativa)(conn, snapshot)
+            except Exception as e:
+                conn.rollback()
+                resultado = (False, e)
+            finally:
+                self.pool.putconn(conn)
+            if resultado is None:
+                continue
+            sucesso, detalhe = resultado
+            self.metricas.registrar(tentativa, time.perf_counter() - inicio, sucesso, None if sucesso else detalhe)
+            if sucesso:
+                self.cache.versao_alterada()
+            return
+
+    def rodar(self, parar):
+        while not parar.is_set():
+            acao = self.rng.choices(list(PESOS_ACOES), weights=list(PESOS_ACOES.values()))[0]
+            try:
+                self.executar(acao)
+            except pool.PoolError as e:
+                self.metricas.registrar(acao, ESPERA_MAXIMA_POOL_S, False, e)
+            parar.wait(self.rng.expovariate(1 / self.pausa) if self.pausa > 0 else 0)
+
+
+def painel(cache, metricas, intervalo, parar, atraso):
+    """Uma TV do painel de filas: atualiza a cada 'intervalo' segundos."""
+    parar.wait(atraso)
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        try:
+            cache.snapshot()
+            metricas.registrar("painel", time.perf_counter() - inicio)
+        except Exception as e:
+            metricas.registrar("painel", time.perf_counter() - inicio, False, e)
+        parar.wait(intervalo)
+
+
+def monitorar_locks(conn, parar, amostras):
+    """Conta, a cada 200 ms, as sessões deste banco esperando lock."""
+    while not parar.is_set():
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*) FROM pg_stat_activity
+                 WHERE datname = current_database() AND wait_event_type = 'Lock'
+            """)
+            amostras.append(cursor.fetchone()[0])
+        conn.rollback()
+        parar.wait(0.2)
+
+
+def _deadlocks(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+        total = cursor.fetchone()[0]
+    conn.rollback()
+    return total
+
+
+def rodada(dsn, conn_controle, dados, operadores, paineis, args):
+    metricas = Metricas()
+    pool_conexoes = PoolMedido(dsn, args.pool, metricas)
+    cache = CacheProcesso(pool_conexoes, metricas)
+    parar = threading.Event()
+    amostras_lock = []
+    deadlocks_antes = _deadlocks(conn_controle)
+
+    threads = [threading.Thread(target=monitorar_locks, args=(conn_controle, parar, amostras_lock))]
+    threads += [threading.Thread(target=Operador(pool_conexoes, cache, dados, metricas, args.pausa_operador,
+                                                 args.semente + i).rodar, args=(parar,))
+                for i in range(operadores)]
+    threads += [threading.Thread(target=painel, args=(cache, metricas, args.intervalo_painel, parar,
+                                                      args.intervalo_painel * i / max(paineis, 1)))
+                for i in range(paineis)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    parar.wait(args.duracao)
+    parar.set()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    pool_conexoes.closeall()
+
+    print(f"\n=== {operadores} operadores, {paineis} painéis, pool de {args.pool}: {duracao:.1f}s ===")
+    print(f"  {'ação':<22}{'qtd':>7}{'erros':>7}{'ops/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}")
+    escritas = 0
+    for acao in list(PESOS_ACOES) + ["painel", "leitura da versao", "leitura do snapshot"]:
+        tempos = metricas.latencias.get(acao)
+        if not tempos:
+            continue
+        if acao in PESOS_ACOES:
+            escritas += len(tempos) - metricas.erros[acao]
+        print(f"  {acao:<22}{len(tempos):>7}{metricas.erros[acao]:>7}{len(tempos) / duracao:>8.2f}"
+              f"{_percentil(tempos, 50):>9.1f}{_percentil(tempos, 95):>9.1f}{_percentil(tempos, 99):>9.1f}{max(tempos):>9.1f}")
+
+    esperas = metricas.esperas_pool
+    print(f"\n  Pool: {len(esperas)} conexões pedidas, {metricas.pool_esgotado} com o pool esgotado "
+          f"(PoolError no app); espera p95 {_percentil(esperas, 95):.1f} ms, máx {max(esperas, default=0):.1f} ms")
+    com_espera = [a for a in amostras_lock if a]
+    deadlocks = _deadlocks(conn_controle) - deadlocks_antes
+    print(f"  Locks: {metricas.conflitos} recusas por lock, {metricas.disputas} por tela desatualizada; sessões esperando lock em "
+          f"{len(com_espera) / max(len(amostras_lock), 1):.0%} das amostras (máx {max(amostras_lock, default=0)}); "
+          f"{deadlocks} deadlocks")
+    print(f"  Snapshot relido {cache.leituras_snapshot}x; {escritas / duracao:.2f} escritas/s concluídas")
+    for motivo, qtd in sorted(metricas.motivos.items(), key=lambda item: -item[1])[:8]:
+        print(f"    - {qtd}x {motivo}")
+
+    return {
+        "operadores": operadores, "paineis": paineis, "escritas_s": escritas / duracao,
+        "p95_escrita_ms": _percentil([t for acao in PESOS_ACOES for t in metricas.latencias.get(acao, [])], 95),
+        "p95_painel_ms": _percentil(metricas.latencias.get("painel", []), 95),
+        "pool_esgotado": metricas.pool_esgotado, "conflitos": metricas.conflitos, "disputas": metricas.disputas,
+        "deadlocks": deadlocks,
+    }
+
+
+def verificar_consistencia(conn):
+    print("\n--- VERIFICAÇÕES DE CONSISTÊNCIA ---")
+    ok = True
+    with conn.cursor() as cursor:
+        for nome, query in VERIFICACOES.items():
+            cursor.execute(query)
+            problemas = cursor.fetchall()
+            ok &= not problemas
+            print(f"  {'OK   ' if not problemas else 'FALHA'} {nome}" + (f": {problemas[:10]}" if problemas else ""))
+    conn.rollback()
+    return ok
+
+
+def run_carga(args):
+    conn = conexao_local()
+    if not conn:
+        return
+    load_dotenv()
+    dsn = os.getenv("DB_URL")
+    try:
+        if args.boxes:
+            criados = garantir_boxes(conn, args.boxes)
+            if criados:
+                print(f"{criados} boxes criados para chegar a {args.boxes}.")
+        dados = Dados(conn)
+        if not (dados.veiculos and dados.funcionarios and any(dados.catalogo.values())):
+            print("É preciso ter veículos, funcionários e o catálogo de serviços no banco local "
+                  "(gerar_dados_sinteticos.py).")
+            return
+
+        resultados = [rodada(dsn, conn, dados, operadores, paineis, args)
+                      for operadores, paineis in product(args.operadores, args.paineis)]
+
+        if len(resultados) > 1:
+            print("\n--- RESUMO DAS RODADAS ---")
+            print(f"  {'operadores':>10}{'painéis':>9}{'escritas/s':>12}{'p95 escrita':>13}{'p95 painel':>12}"
+                  f"{'pool esgot.':>12}{'rec. lock':>11}{'rec. tela':>11}{'deadlocks':>11}")
+            for r in resultados:
+                print(f"  {r['operadores']:>10}{r['paineis']:>9}{r['escritas_s']:>12.2f}{r['p95_escrita_ms']:>13.1f}"
+                      f"{r['p95_painel_ms']:>12.1f}{r['pool_esgotado']:>12}{r['conflitos']:>11}{r['disputas']:>11}{r['deadlocks']:>11}")
+
+        ok = verificar_consistencia(conn)
+        print("\nRESULTADO:", "pátio consistente após a carga." if ok else "INCONSISTÊNCIAS ENCONTRADAS.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga do pátio (operadores e painéis) contra um Postgres local.")
+    parser.add_argument("--operadores", type=int, nargs="+", default=[4], help="operadores simultâneos (uma rodada por valor)")
+    parser.add_argument("--paineis", type=int, nargs="+", default=[4], help="TVs do painel de filas (uma rodada por valor)")
+    parser.add_argument("--duracao", type=float, default=30, help="segundos por rodada")
+    parser.add_argument("--pool", type=int, default=TAMANHO_POOL_APP, help="conexões no pool (o app usa 10)")
+    parser.add_argument("--pausa-operador", type=float, default=2.0, help="pausa média entre ações de um operador (s)")
+    parser.add_argument("--intervalo-painel", type=float, default=INTERVALO_PAINEL_S)
+    parser.add_argument("--boxes", type=int, help="cria boxes até o pátio ter esta quantidade")
+    parser.add_argument("--semente", type=int, default=42)
+    run_carga(parser.parse_args())
@@ -0,0 +1,186 @@
+# consultor_indices.py
+#
+# Roda EXPLAIN nas consultas conhecidas do app (as mesmas constantes que as
+# páginas usam) com parâmetros de exemplo tirados do próprio banco e aponta as
+# varreduras sequenciais (Seq Scan) em tabelas grandes — sinal de filtro sem
+# índice ou de predicado que impede o uso do índice (cast na coluna, função,
+# OR com outra coluna). Também mostra os índices que cada consulta usa, avisa
+# se há migrações de migrar_banco.py pendentes e lista índices inválidos.
+#
+# Só lê: com --analyze as consultas são executadas de verdade (são todas
+# SELECT) e o tempo real aparece ao lado do plano.
+#
+# Uso: python consultor_indices.py [--analyze] [--min-linhas 1000] [--consultas relatorio historico]
+
+import argparse
+import json
+from datetime import timedelta
+
+from agendador import QUERY_DURACOES
+from database import get_script_connection
+from estado_patio import QUERY_BOXES, QUERY_SERVICOS_ABERTOS
+from migrar_banco import SQL_INDICES_INVALIDOS, listar_migracoes, migracoes_aplicadas
+from motor_relatorios import QUERY_RELATORIO_POSTGRES
+from operacoes_patio import QUERY_PENDENTES_VEICULO
+from pages.exportar_contatos import queries_contatos
+from pages.feedback_servicos import QUERY_FEEDBACK_PENDENTE
+from pages.historico_veiculo import QUERY_HISTORICO_ARQUIVADO, QUERY_HISTORICO_VEICULO
+from pages.revisao_proativa import QUERY_CANDIDATOS_REVISAO
+from pages.servicos_concluidos import QUERY_SERVICOS_CONCLUIDOS
+from snapshot_analitico import QUERY_EXECUCOES as QUERY_SNAPSHOT_EXECUCOES
+from utils import QUERY_VEICULO_POR_PLACA
+
+MIN_LINHAS = 1000      # abaixo disso, varrer a tabela inteira é tão rápido quanto usar índice
+
+
+class Exemplo:
+    """Parâmetros de exemplo: um veículo com histórico e a data da última finalização."""
+
+    def __init__(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT v.id, v.placa_normalizada, MAX(es.fim_execucao)::date
+                FROM execucao_servico es JOIN veiculos v ON v.id = es.veiculo_id
+                WHERE es.status = 'finalizado'
+                GROUP BY v.id, v.placa_normalizada
+                ORDER BY MAX(es.fim_execucao) DESC NULLS LAST
+                LIMIT 1
+            """)
+            self.veiculo_id, self.placa, self.hoje = cursor.fetchone() or (0, "", None)
+        conn.rollback()
+
+    def periodo(self, dias):
+        return self.hoje - timedelta(days=dias), self.hoje + timedelta(days=1)
+
+    def periodo_nomeado(self, dias):
+        inicio, fim = self.periodo(dias)
+        return {"inicio": inicio, "fim": fim}
+
+
+# Nome -> (SQL, função(exemplo) que devolve os parâmetros ou None)
+CONSULTAS = {
+    "estado do pátio: boxes": (QUERY_BOXES, None),
+    "estado do pátio: serviços abertos": (QUERY_SERVICOS_ABERTOS, None),
+    "finalização: pendentes do veículo": (QUERY_PENDENTES_VEICULO, lambda ex: {"veiculo_id": ex.veiculo_id}),
+    "busca de veículo por placa": (QUERY_VEICULO_POR_PLACA, lambda ex: (ex.placa,)),
+    "histórico do veículo": (QUERY_HISTORICO_VEICULO, lambda ex: (ex.placa,)),
+    "histórico arquivado do veículo": (QUERY_HISTORICO_ARQUIVADO, lambda ex: (ex.placa,)),
+    "serviços concluídos (30 dias)": (QUERY_SERVICOS_CONCLUIDOS, lambda ex: ex.periodo_nomeado(30)),
+    "feedback pendente (30 dias)": (QUERY_FEEDBACK_PENDENTE, lambda ex: (ex.periodo(30)[0],)),
+    "relatório (30 dias)": (QUERY_RELATORIO_POSTGRES, lambda ex: ex.periodo_nomeado(30)),
+    "relatório (365 dias)": (QUERY_RELATORIO_POSTGRES, lambda ex: ex.periodo_nomeado(365)),
+    "revisão proativa": (QUERY_CANDIDATOS_REVISAO, None),
+    "durações (agendador e previsão de ETA)": (QUERY_DURACOES, None),
+    "snapshot analítico: execuções (7 dias)": (QUERY_SNAPSHOT_EXECUCOES, lambda ex: (ex.periodo(7)[0],)),
+    "exportação de contatos: responsáveis": (queries_contatos()[0], None),
+    "exportação de contatos: motoristas": (queries_contatos()[1], None),
+}
+
+
+def _nos(plano):
+    yield plano
+    for filho in plano.get("Plans", []):
+        yield from _nos(filho)
+
+
+def _linhas_por_tabela(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT relname, GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relkind IN ('r', 'p')")
+        linhas = dict(cursor.fetchall())
+    conn.rollback()
+    return linhas
+
+
+def explicar(conn, sql, parametros, analyze=False):
+    """Plano (dict do EXPLAIN FORMAT JSON) da consulta. A transação é sempre desfeita."""
+    opcoes = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"EXPLAIN ({opcoes}) {sql}", parametros)
+            resultado = cursor.fetchone()[0]
+    finally:
+        conn.rollback()
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    return resultado[0]
+
+
+def analisar(conn, sql, parametros, linhas_tabela, analyze=False, min_linhas=MIN_LINHAS):
+    """Retorna {'custo', 'tempo_ms', 'seq_scans': [...], 'indices': {...}} da consulta."""
+    explicacao = explicar(conn, sql, parametros, analyze)
+    plano = explicacao["Plan"]
+    seq_scans, indices = [], set()
+    for no in _nos(plano):
+        if "Index Name" in no:
+            indices.add(no["Index Name"])
+        if no["Node Type"] != "Seq Scan":
+            continue
+        tabela = no["Relation Name"]
+        if linhas_tabela.get(tabela, 0) < min_linhas:
+            continue
+        seq_scans.append({
+            "tabela": tabela, "linhas_tabela": linhas_tabela.get(tabela, 0),
+            "filtro": no.get("Filter"), "linhas_estimadas": no.get("Plan Rows"),
+            "linhas_reais": no.get("Actual Rows"), "removidas": no.get("Rows Removed by Filter"),
+        })
+    return {
+        "custo": plano["Total Cost"], "tempo_ms": explicacao.get("Execution Time"),
+        "seq_scans": seq_scans, "indices": sorted(indices),
+    }
+
+
+def verificar_migracoes(conn):
+    aplicadas = migracoes_aplicadas(conn, somente_leitura=True)
+    pendentes = [m for m in listar_migracoes() if m.versao not in aplicadas]
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_INDICES_INVALIDOS)
+        invalidos = [r[0] for r in cursor.fetchall()]
+    conn.rollback()
+    if pendentes:
+        print(f"ATENÇÃO: migrações pendentes ({', '.join(map(str, pendentes))}). Rode: python migrar_banco.py\n")
+    if invalidos:
+        print(f"ATENÇÃO: índices inválidos (criação interrompida): {', '.join(invalidos)}. "
+              "Rode migrar_banco.py de novo.\n")
+
+
+def consultar(analyze=False, min_linhas=MIN_LINHAS, filtro=None):
+    conn = get_script_connection()
+    if not conn:
+        return
+    try:
+        verificar_migracoes(conn)
+        exemplo = Exemplo(conn)
+        linhas_tabela = _linhas_por_tabela(conn)
+        total_alertas = 0
+        for nome, (sql, parametros) in CONSULTAS.items():
+            if filtro and not any(f.lower() in nome.lower() for f in filtro):
+                continue
+            try:
+                r = analisar(conn, sql, parametros(exemplo) if parametros else None,
+                             linhas_tabela, analyze, min_linhas)
+            except Exception as e:
+                print(f"[ERRO] {nome}: {str(e).strip().splitlines()[0]}")
+                continue
+            tempo = f", {r['tempo_ms']:.1f} ms" if r["tempo_ms"] is not None else ""
+            situacao = "SEQ" if r["seq_scans"] else "ok"
+            print(f"[{situacao:<4}] {nome} (custo {r['custo']:.0f}{tempo})")
+            if r["indices"]:
+                print(f"       índices: {', '.join(r['indices'])}")
+            for scan in r["seq_scans"]:
+                total_alertas += 1
+                reais = f", {scan['linhas_reais']} lidas e {scan['removidas'] or 0} descartadas" \
+                    if scan["linhas_reais"] is not None else ""
+                print(f"       Seq Scan em {scan['tabela']} (~{scan['linhas_tabela']} linhas{reais})"
+                      + (f"\n         filtro: {scan['filtro']}" if scan["filtro"] else ""))
+        print(f"\n{total_alertas} varredura(s) sequencial(is) em tabelas com {min_linhas}+ linhas.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN das consultas do app, apontando Seq Scans em tabelas grandes.")
+    parser.add_argument("--analyze", action="store_true", help="executa as consultas (EXPLAIN ANALYZE) para ver o tempo real")
+    parser.add_argument("--min-linhas", type=int, default=MIN_LINHAS, help="ignora tabelas menores que isso")
+    parser.add_argument("--consultas", nargs="+", help="só as consultas cujo nome contém algum destes trechos")
+    args = parser.parse_args()
+    consultar(args.analyze, args.min_linhas, args.consultas)
@@ -0,0 +1,52 @@
+# controle_versao.py
+
+import streamlit as st
+from database import get_connection, release_connection
+
+# Contadores de versão guardados no banco. Toda escrita que altera um conjunto
+# de dados incrementa a versão da sua chave na MESMA transação; quem lê compara
+# a versão atual com a do último snapshot e só refaz as consultas se mudou.
+# Funciona entre sessões e entre processos (várias instâncias do app).
+# A tabela versoes_cache vem da migração 0003 (migrar_banco.py).
+
+CHAVE_PATIO = "patio"          # boxes, execuções em andamento e fila de espera
+CHAVE_USUARIOS = "usuarios"    # cadastro de usuários (credenciais do login)
+CHAVE_ARQUIVO = "arquivo"      # visitas movidas para o arquivo (arquivar_historico.py)
+
+INTERVALO_VERSAO_S = 3         # por quanto tempo uma leitura de versão é compartilhada
+
+
+def incrementar_versao(cursor, chave):
+    """
+    Incrementa a versão de uma chave usando o cursor da transação de escrita.
+    O commit fica por conta de quem chamou, junto com o resto da alteração.
+    Não depende do Streamlit, então também serve para scripts.
+    """
+    cursor.execute(
+        """
+        INSERT INTO versoes_cache (chave, versao, atualizado_em) VALUES (%s, 1, NOW())
+        ON CONFLICT (chave) DO UPDATE
+           SET versao = versoes_cache.versao + 1, atualizado_em = NOW();
+        """,
+        (chave,)
+    )
+
+
+@st.cache_data(ttl=INTERVALO_VERSAO_S, show_spinner=False)
+def get_versao(chave):
+    """Versão atual da chave. A leitura é compartilhada por todas as sessões do processo."""
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("Falha ao conectar ao banco de dados.")
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT versao FROM versoes_cache WHERE chave = %s", (chave,))
+            row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        release_connection(conn)
+
+
+def versao_alterada():
+    """Chamar após o commit: faz este processo enxergar a nova versão imediatamente."""
+    get_versao.clear()
@@ -1,12 +1,13 @@
 import re
 import pandas as pd
-import hashlib
+import psycopg2.extras
+from credenciais import gerar_hash
 
 # FUNÇÕES PURAS QUE NÃO DEPENDEM DO STREAMLIT
 
 def hash_password(password):
     """Gera o hash de uma senha para armazenamento seguro."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    return gerar_hash(password)
 
 def formatar_telefone(numero: str) -> str:
     """Formata um número de telefone no padrão (XX)XXXXX-XXXX."""
@@ -30,59 +31,90 @@ def formatar_placa(placa: str) -> str:
     else:
         return placa_limpa
 
-def recalcular_media_veiculo(conn, veiculo_id):
-    """
-    Busca todo o histórico de um veículo, recalcula sua média de KM/dia
-    e a salva na tabela 'veiculos'.
-    """
-    query = """
-        SELECT fim_execucao, quilometragem
+# As visitas arquivadas (arquivar_historico.py) entram pela primeira e pela
+# última válidas, guardadas no resumo: é só o que a média usa delas.
+QUERY_HISTORICO_KM = """
+    SELECT veiculo_id, fim_execucao, quilometragem FROM (
+        SELECT veiculo_id, fim_execucao, quilometragem, id
         FROM execucao_servico
-        WHERE veiculo_id = %s AND status = 'finalizado' 
+        WHERE veiculo_id = ANY(%(ids)s) AND status = 'finalizado'
               AND quilometragem IS NOT NULL AND quilometragem > 0
-        ORDER BY fim_execucao;
-    """
-    df_veiculo = pd.read_sql(query, conn, params=(veiculo_id,))
+        UNION ALL
+        SELECT r.veiculo_id, k.fim_execucao, k.quilometragem, 0 AS id
+        FROM execucao_servico_arquivo_resumo r
+        CROSS JOIN LATERAL (VALUES (r.data_km_inicial, r.km_inicial),
+                                   (r.data_km_final, r.km_final)) AS k (fim_execucao, quilometragem)
+        WHERE r.veiculo_id = ANY(%(ids)s) AND k.quilometragem IS NOT NULL
+    ) historico
+    ORDER BY veiculo_id, fim_execucao, id;
+"""
 
-    df_veiculo = df_veiculo.drop_duplicates(subset=['quilometragem'], keep='last')
-    
-    last_valid_km = -1
-    valid_indices = []
-    for index, row in df_veiculo.iterrows():
-        if row['quilometragem'] > last_valid_km:
-            valid_indices.append(index)
-            last_valid_km = row['quilometragem']
-    
-    valid_group = df_veiculo.loc[valid_indices]
+def visitas_validas_km(df):
+    """
+    Aplica a regra monotônica a um histórico (veiculo_id, fim_execucao,
+    quilometragem) ordenado por data: descarta KMs repetidas (fica a última)
+    e toda visita cuja KM não supera a maior KM anterior do mesmo veículo.
+    Retorna só as visitas válidas.
+    """
+    df = df.drop_duplicates(subset=['veiculo_id', 'quilometragem'], keep='last')
+    maior_anterior = df.groupby('veiculo_id')['quilometragem'].transform(lambda km: km.cummax().shift())
+    return df[maior_anterior.isna() | (df['quilometragem'] > maior_anterior)]
 
-    if len(valid_group) < 2:
-        media_km_diaria = None
-    else:
-        primeira_visita = valid_group.iloc[0]
-        ultima_visita = valid_group.iloc[-1]
-        
-        # --- MUDANÇA CRÍTICA: Garantir que os tipos são padrão do Python ---
-        # Converte os valores de quilometragem para int nativo do Python
-        delta_km = int(ultima_visita['quilometragem']) - int(primeira_visita['quilometragem'])
-        # A diferença de datas já retorna um int nativo
-        delta_dias = (ultima_visita['fim_execucao'] - primeira_visita['fim_execucao']).days
+def calcular_medias_km(df):
+    """
+    Média de KM/dia de cada veículo a partir do histórico (veiculo_id,
+    fim_execucao, quilometragem), tudo vetorizado. Usa a primeira e a última
+    visita válidas; sem duas visitas válidas em dias diferentes a média é None.
+    Retorna Series veiculo_id -> média.
+    """
+    if df.empty:
+        return pd.Series(dtype=object)
+    df = df.assign(fim_execucao=pd.to_datetime(df['fim_execucao']))
+    validas = visitas_validas_km(df.sort_values(['veiculo_id', 'fim_execucao'], kind='stable'))
+    extremos = validas.groupby('veiculo_id').agg(
+        km_inicial=('quilometragem', 'first'), km_final=('quilometragem', 'last'),
+        data_inicial=('fim_execucao', 'first'), data_final=('fim_execucao', 'last'),
+    )
+    delta_dias = (extremos['data_final'] - extremos['data_inicial']).dt.days
+    medias = (extremos['km_final'] - extremos['km_inicial']) / delta_dias.where(delta_dias > 0)
+    medias = medias.reindex(df['veiculo_id'].unique())
+    return medias.astype(object).where(medias.notna(), None)
 
-        if delta_dias > 0:
-            # O resultado da divisão de dois ints será um float padrão
-            media_km_diaria = delta_km / delta_dias
-        else:
-            media_km_diaria = None
+def recalcular_medias_veiculos(conn, veiculo_ids, commit=True):
+    """
+    Recalcula e grava a média de KM/dia de vários veículos com uma consulta
+    e um UPDATE. Com commit=False a gravação fica na transação de quem chamou.
+    Retorna a Series veiculo_id -> média gravada.
+    """
+    veiculo_ids = sorted({int(v) for v in veiculo_ids})
+    if not veiculo_ids:
+        return pd.Series(dtype=object)
+    with conn.cursor() as cursor:
+        cursor.execute(QUERY_HISTORICO_KM, {"ids": veiculo_ids})
+        historico = pd.DataFrame(cursor.fetchall(), columns=['veiculo_id', 'fim_execucao', 'quilometragem'])
+    medias = calcular_medias_km(historico).reindex(veiculo_ids)
+    medias = medias.astype(object).where(medias.notna(), None)
+    with conn.cursor() as cursor:
+        psycopg2.extras.execute_values(cursor, """
+            UPDATE veiculos v SET media_km_diaria = m.media::numeric
+            FROM (VALUES %s) AS m (id, media)
+            WHERE v.id = m.id
+        """, [(veiculo_id, None if media is None else float(media)) for veiculo_id, media in medias.items()],
+            template="(%s::int, %s::float8)", page_size=1000)
+    if commit:
+        conn.commit()
+    return medias
 
+def recalcular_media_veiculo(conn, veiculo_id):
+    """
+    Busca todo o histórico de um veículo, recalcula sua média de KM/dia
+    e a salva na tabela 'veiculos'.
+    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "UPDATE veiculos SET media_km_diaria = %s WHERE id = %s",
-                (media_km_diaria, veiculo_id)
-            )
-        conn.commit()
+        recalcular_medias_veiculos(conn, [veiculo_id])
         return True
     except Exception as e:
         conn.rollback()
         # Imprime o erro para o log, mas não quebra a execução para os outros veículos
         print(f"Erro ao atualizar a média para o veículo {veiculo_id}: {e}")
-        return False
\ No newline at end of file
+        return False
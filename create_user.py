@@ -1,11 +1,8 @@
 import psycopg2
 from dotenv import load_dotenv
 import os
-import hashlib
-
-# Função para criar o hash da senha
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+from controle_versao import CHAVE_USUARIOS, incrementar_versao
+from credenciais import gerar_hash
 
 # Carrega a URL do banco do arquivo .env
 load_dotenv()
@@ -18,7 +15,7 @@ password = input("Digite a senha: ")
 role = input("Digite a permissão (role) [admin/funcionario]: ")
 
 # Gera o hash da senha
-password_hash = hash_password(password)
+password_hash = gerar_hash(password)
 
 try:
     # Conecta e insere o novo usuário no banco de dados
@@ -28,6 +25,8 @@ try:
         "INSERT INTO usuarios (nome, username, password_hash, role) VALUES (%s, %s, %s, %s)",
         (nome, username, password_hash, role)
     )
+    # Os processos do app recarregam as credenciais ao ver a nova versão
+    incrementar_versao(cursor, CHAVE_USUARIOS)
     conn.commit()
     cursor.close()
     conn.close()
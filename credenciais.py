@@ -0,0 +1,80 @@
+# credenciais.py
+#
+# Hash e verificação de senhas, num lugar só (app, create_user.py e scripts).
+#
+# Senhas novas usam bcrypt com custo CUSTO_BCRYPT (variável de ambiente de mesmo
+# nome; benchmark_credenciais.py ajuda a escolher). Hashes antigos continuam
+# aceitos e são trocados no login (auth_utils.Autenticador):
+#   - SHA-256 sem sal (64 caracteres hexadecimais), gerado pelas versões antigas
+#     de hash_password e do create_user.py
+#   - bcrypt com custo diferente do atual
+# Não depende do Streamlit.
+
+import functools
+import hashlib
+import hmac
+import os
+import re
+
+import bcrypt
+
+CUSTO_BCRYPT = int(os.getenv("CUSTO_BCRYPT", 12))
+LIMITE_BYTES_BCRYPT = 72      # o bcrypt só considera os primeiros 72 bytes da senha
+
+_PADRAO_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_PADRAO_BCRYPT = re.compile(r"^\$2[aby]\$(\d{2})\$[./A-Za-z0-9]{53}$")
+
+
+def _bytes_senha(senha):
+    return senha.encode("utf-8")[:LIMITE_BYTES_BCRYPT]
+
+
+def gerar_hash(senha, custo=CUSTO_BCRYPT):
+    """Hash bcrypt da senha, pronto para gravar em usuarios.password_hash."""
+    return bcrypt.hashpw(_bytes_senha(senha), bcrypt.gensalt(rounds=custo)).decode("ascii")
+
+
+def eh_hash_legado(hash_salvo):
+    return bool(hash_salvo) and _PADRAO_SHA256.match(hash_salvo) is not None
+
+
+def custo_do_hash(hash_salvo):
+    """Custo de um hash bcrypt, ou None se o hash não for bcrypt."""
+    encontrado = _PADRAO_BCRYPT.match(hash_salvo or "")
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def verificar_senha(senha, hash_salvo):
+    """
+    Confere a senha com o hash salvo (bcrypt ou SHA-256 legado). As
+    comparações não param no primeiro caractere diferente. Hash em formato
+    desconhecido nunca confere.
+    """
+    if senha is None or not hash_salvo:
+        return False
+    if eh_hash_legado(hash_salvo):
+        calculado = hashlib.sha256(senha.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(calculado, hash_salvo)
+    if custo_do_hash(hash_salvo) is None:
+        return False
+    return bcrypt.checkpw(_bytes_senha(senha), hash_salvo.encode("ascii"))
+
+
+def precisa_rehash(hash_salvo, custo=CUSTO_BCRYPT):
+    """True para hashes legados ou bcrypt com custo diferente do atual."""
+    return custo_do_hash(hash_salvo) != custo
+
+
+@functools.lru_cache(maxsize=1)
+def _hash_ficticio():
+    # Gerado no primeiro uso, não no import, para não atrasar a abertura do app
+    return gerar_hash("usuario-inexistente").encode("ascii")
+
+
+def gastar_verificacao():
+    """
+    Verificação bcrypt descartável, com o custo atual. Usada para usuários
+    inexistentes: o login gasta o mesmo tempo de um usuário válido, sem
+    revelar quais nomes de login existem.
+    """
+    bcrypt.checkpw(b"senha-qualquer", _hash_ficticio())
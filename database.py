@@ -3,6 +3,8 @@ from psycopg2 import pool
 import psycopg2
 import os
 from dotenv import load_dotenv
+import instrumentacao
+from instrumentacao import ConexaoInstrumentada
 
 # --- FUNÇÕES PARA O APLICATIVO STREAMLIT (NÃO MUDAM) ---
 
@@ -18,7 +20,14 @@ def init_connection_pool():
     db_url = get_db_url()
     if not db_url:
         raise ValueError("URL do banco de dados não encontrada.")
-    return pool.SimpleConnectionPool(1, 10, dsn=db_url)
+    # Medição das consultas (página "Desempenho"), desligada por padrão: cada
+    # consulta paga a impressão digital do SQL e a busca da função de origem.
+    # INSTRUMENTAR_CONSULTAS = true guarda as estatísticas por consulta;
+    # PERFIL_RERUN = true só precisa do tempo de banco de cada rerun.
+    instrumentacao.registrar_estatisticas = bool(st.secrets.get("INSTRUMENTAR_CONSULTAS", False))
+    medir = instrumentacao.registrar_estatisticas or bool(st.secrets.get("PERFIL_RERUN", False))
+    fabrica = ConexaoInstrumentada if medir else None
+    return pool.SimpleConnectionPool(1, 10, dsn=db_url, connection_factory=fabrica)
 
 def get_connection():
     connection_pool = init_connection_pool()
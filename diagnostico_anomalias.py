@@ -0,0 +1,159 @@
+# diagnostico_anomalias.py
+#
+# Varredura de todas as leituras de KM, em uma consulta e um passe vetorizado,
+# à procura das leituras que corrompem media_km_diaria (e, com ela, a lista da
+# Revisão Proativa). Complementa o diagnostico_media.py, que explica o cálculo
+# de um veículo só.
+#
+# Uso: python diagnostico_anomalias.py [--formato csv|parquet] [--saida pasta] [--km-dia-max 1500]
+
+import importlib.util
+import os
+from datetime import datetime
+
+import pandas as pd
+from core_utils import calcular_medias_km, visitas_validas_km
+
+KM_DIA_MAXIMO = 1500   # acima disso entre duas visitas, a leitura de KM é suspeita
+
+# Peso de cada tipo de anomalia na pontuação do veículo
+PESOS = {
+    'km_decrescente': 3,
+    'km_dia_implausivel': 3,
+    'descartada_pela_regra': 2,
+    'intervalo_zero_dias': 1,
+    'km_duplicada': 1,
+}
+
+QUERY_VISITAS = """
+    SELECT es.id AS execucao_id, es.veiculo_id, v.placa, v.empresa, v.media_km_diaria,
+           es.fim_execucao, es.quilometragem
+    FROM execucao_servico es
+    JOIN veiculos v ON v.id = es.veiculo_id
+    WHERE es.status = 'finalizado' AND es.quilometragem IS NOT NULL AND es.quilometragem > 0
+    ORDER BY es.veiculo_id, es.fim_execucao, es.id;
+"""
+
+
+def detectar_anomalias(visitas, km_dia_max=KM_DIA_MAXIMO):
+    """
+    Marca as visitas suspeitas, comparando cada uma com a anterior do mesmo
+    veículo. 'visitas' precisa de execucao_id, veiculo_id, fim_execucao e
+    quilometragem, ordenado por veículo e data.
+    Retorna uma linha por (visita, tipo de anomalia), com um detalhe legível.
+    """
+    df = visitas.copy()
+    df['fim_execucao'] = pd.to_datetime(df['fim_execucao'])
+    por_veiculo = df.groupby('veiculo_id')
+    df['km_anterior'] = por_veiculo['quilometragem'].shift()
+    df['data_anterior'] = por_veiculo['fim_execucao'].shift()
+    delta_km = df['quilometragem'] - df['km_anterior']
+    delta_dias = (df['fim_execucao'] - df['data_anterior']).dt.days
+    df['km_dia'] = delta_km / delta_dias.where(delta_dias > 0)
+
+    validas = visitas_validas_km(df)
+    marcas = {
+        'km_decrescente': delta_km < 0,
+        'km_duplicada': df.duplicated(subset=['veiculo_id', 'quilometragem'], keep='last'),
+        'intervalo_zero_dias': (delta_dias == 0) & (delta_km != 0),
+        'km_dia_implausivel': df['km_dia'] > km_dia_max,
+        'descartada_pela_regra': ~pd.Series(df.index.isin(validas.index), index=df.index),
+    }
+    detalhes = {
+        'km_decrescente': lambda a: 'KM ' + a['quilometragem'].astype(str) + ' menor que a anterior (' + a['km_anterior'].astype('Int64').astype(str) + ')',
+        'km_duplicada': lambda a: 'KM ' + a['quilometragem'].astype(str) + ' repetida em visita posterior',
+        'intervalo_zero_dias': lambda a: 'KM mudou de ' + a['km_anterior'].astype('Int64').astype(str) + ' para ' + a['quilometragem'].astype(str) + ' no mesmo dia',
+        'km_dia_implausivel': lambda a: a['km_dia'].round(0).astype('Int64').astype(str) + f' km/dia desde a visita anterior (limite {km_dia_max})',
+        'descartada_pela_regra': lambda _: 'ignorada no cálculo da média (KM não supera a maior anterior)',
+    }
+
+    partes = []
+    for tipo, mascara in marcas.items():
+        afetadas = df[mascara.fillna(False).astype(bool)]
+        if not afetadas.empty:
+            partes.append(afetadas.assign(tipo=tipo, peso=PESOS[tipo], detalhe=detalhes[tipo](afetadas)))
+    colunas = ['execucao_id', 'veiculo_id', 'placa', 'empresa', 'fim_execucao', 'quilometragem',
+               'data_anterior', 'km_anterior', 'km_dia', 'tipo', 'peso', 'detalhe']
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+    anomalias = pd.concat(partes, ignore_index=True)
+    return anomalias.reindex(columns=colunas).sort_values(['veiculo_id', 'fim_execucao', 'peso'], ascending=[True, True, False])
+
+
+def ranquear_veiculos(visitas, anomalias):
+    """
+    Uma linha por veículo com anomalias, do mais grave para o menos grave:
+    pontuação (soma dos pesos), contagem por tipo, a média que a regra calcula
+    hoje e a mediana dos km/dia entre visitas válidas, que é pouco afetada por
+    uma leitura errada. Uma diferença grande entre as duas indica que a média
+    armazenada está distorcida.
+    """
+    if anomalias.empty:
+        return pd.DataFrame()
+    contagem = pd.crosstab(anomalias['veiculo_id'], anomalias['tipo']).reindex(columns=list(PESOS), fill_value=0)
+    ranking = contagem.assign(pontuacao=anomalias.groupby('veiculo_id')['peso'].sum())
+
+    visitas = visitas.assign(fim_execucao=pd.to_datetime(visitas['fim_execucao']))
+    validas = visitas_validas_km(visitas)
+    por_veiculo = validas.groupby('veiculo_id')
+    dias = por_veiculo['fim_execucao'].diff().dt.days
+    km_dia = por_veiculo['quilometragem'].diff() / dias.where(dias > 0)
+
+    ranking['media_calculada'] = calcular_medias_km(visitas).reindex(ranking.index).astype(float)
+    ranking['mediana_km_dia'] = km_dia.groupby(validas['veiculo_id']).median().reindex(ranking.index)
+    ranking['distorcao_media'] = ((ranking['media_calculada'] - ranking['mediana_km_dia']).abs()
+                                  / ranking['mediana_km_dia'].where(ranking['mediana_km_dia'] > 0)).round(2)
+
+    info = visitas.drop_duplicates('veiculo_id').set_index('veiculo_id')[['placa', 'empresa', 'media_km_diaria']]
+    ranking = info.join(ranking, how='inner')
+    return (ranking.sort_values(['pontuacao', 'distorcao_media'], ascending=False, na_position='last')
+                   .reset_index().rename(columns={'index': 'veiculo_id'}))
+
+
+def varrer(conn, km_dia_max=KM_DIA_MAXIMO):
+    """Lê todas as visitas de uma vez e devolve (anomalias, ranking)."""
+    visitas = pd.read_sql(QUERY_VISITAS, conn)
+    anomalias = detectar_anomalias(visitas, km_dia_max)
+    return anomalias, ranquear_veiculos(visitas, anomalias)
+
+
+def salvar_relatorio(anomalias, ranking, pasta, formato='csv'):
+    """Grava ranking e anomalias em CSV ou Parquet. Retorna os caminhos gravados."""
+    os.makedirs(pasta, exist_ok=True)
+    carimbo = datetime.now().strftime('%Y%m%d_%H%M')
+    caminhos = []
+    for nome, df in (('ranking', ranking), ('anomalias', anomalias)):
+        caminho = os.path.join(pasta, f"anomalias_km_{nome}_{carimbo}.{formato}")
+        if formato == 'parquet':
+            df.to_parquet(caminho, index=False)
+        else:
+            df.to_csv(caminho, index=False, sep=';', decimal=',', encoding='utf-8-sig')
+        caminhos.append(caminho)
+    return caminhos
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import get_script_connection
+
+    parser = argparse.ArgumentParser(description="Varre todas as leituras de KM e gera um relatório de anomalias.")
+    parser.add_argument("--formato", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--saida", default="relatorios_anomalias")
+    parser.add_argument("--km-dia-max", type=float, default=KM_DIA_MAXIMO)
+    args = parser.parse_args()
+    if args.formato == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        print("pyarrow não está instalado; o relatório será gravado em CSV.")
+        args.formato = "csv"
+
+    conexao = get_script_connection()
+    if conexao:
+        try:
+            df_anomalias, df_ranking = varrer(conexao, args.km_dia_max)
+            print(f"{len(df_anomalias)} anomalias em {len(df_ranking)} veículos.")
+            if not df_ranking.empty:
+                print("\nVeículos mais afetados:")
+                print(df_ranking.head(15)[['placa', 'empresa', 'pontuacao', 'media_km_diaria', 'mediana_km_dia', 'distorcao_media']].to_string(index=False))
+                for caminho in salvar_relatorio(df_anomalias, df_ranking, args.saida, args.formato):
+                    print(f"Gravado: {caminho}")
+        finally:
+            conexao.close()
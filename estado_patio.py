@@ -0,0 +1,133 @@
+# estado_patio.py
+
+import streamlit as st
+import pandas as pd
+from database import get_connection, release_connection
+from controle_versao import CHAVE_PATIO, get_versao, versao_alterada
+
+# Snapshot do pátio (boxes, ocupantes, serviços pendentes e em andamento)
+# compartilhado por todas as sessões do processo. A chave do cache é a versão
+# do pátio (controle_versao), então qualquer escrita que incremente a versão
+# — alocação, finalização, retirada do box, serviço extra, cadastro — invalida
+# o snapshot para todo mundo. O TTL é só uma rede de segurança para alterações
+# feitas fora do app.
+TTL_SNAPSHOT_S = 60
+
+QUERY_BOXES = """
+    SELECT
+        b.id,
+        b.area as box_area,
+        b.ocupado,
+        es.id as execucao_id,
+        v.placa,
+        v.empresa,
+        v.nome_motorista,
+        v.contato_motorista,
+        v.modelo,
+        f.nome as funcionario_nome,
+        es.veiculo_id,
+        es.funcionario_id,
+        es.quilometragem,
+        es.inicio_execucao
+    FROM boxes b
+    LEFT JOIN execucao_servico es
+           ON b.id = es.box_id AND es.status = 'em_andamento'
+    LEFT JOIN veiculos v
+           ON es.veiculo_id = v.id
+    LEFT JOIN funcionarios f
+           ON es.funcionario_id = f.id
+    WHERE b.id > 0
+    ORDER BY b.id;
+"""
+
+QUERY_SERVICOS_ABERTOS = """
+    SELECT s.area, s.id, s.veiculo_id, s.execucao_id, s.box_id, s.funcionario_id,
+           s.tipo, s.quantidade, s.status, s.quilometragem, s.data_solicitacao,
+           s.observacao AS observacao_cadastro, s.observacao_execucao,
+           v.placa, v.empresa
+    FROM (
+        SELECT 'borracharia' AS area, id, veiculo_id, execucao_id, box_id, funcionario_id, tipo, quantidade, status,
+               quilometragem, data_solicitacao, observacao, observacao_execucao
+          FROM servicos_solicitados_borracharia WHERE status IN ('pendente', 'em_andamento')
+        UNION ALL
+        SELECT 'alinhamento' AS area, id, veiculo_id, execucao_id, box_id, funcionario_id, tipo, quantidade, status,
+               quilometragem, data_solicitacao, observacao, observacao_execucao
+          FROM servicos_solicitados_alinhamento WHERE status IN ('pendente', 'em_andamento')
+        UNION ALL
+        SELECT 'manutencao' AS area, id, veiculo_id, execucao_id, box_id, funcionario_id, tipo, quantidade, status,
+               quilometragem, data_solicitacao, observacao, observacao_execucao
+          FROM servicos_solicitados_manutencao WHERE status IN ('pendente', 'em_andamento')
+    ) s
+    JOIN veiculos v ON s.veiculo_id = v.id
+    ORDER BY s.data_solicitacao, s.id;
+"""
+
+
+def ler_estado_patio(conn):
+    """As três consultas do snapshot, sem cache (também usada por benchmark_consultas.py)."""
+    return {
+        "boxes": pd.read_sql(QUERY_BOXES, conn, index_col='id'),
+        "servicos": pd.read_sql(QUERY_SERVICOS_ABERTOS, conn),
+        "funcionarios": pd.read_sql("SELECT id, nome FROM funcionarios WHERE id > 0 ORDER BY nome", conn),
+    }
+
+
+@st.cache_data(ttl=TTL_SNAPSHOT_S, max_entries=4, show_spinner=False)
+def _carregar_snapshot(versao):
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("Falha ao conectar ao banco de dados.")
+    try:
+        return {"versao": versao, **ler_estado_patio(conn)}
+    finally:
+        release_connection(conn)
+
+
+def get_snapshot_patio(versao=None):
+    """
+    Retorna {'versao', 'boxes', 'servicos', 'funcionarios'} do pátio atual.
+    'boxes' é indexado pelo id do box; 'servicos' traz os serviços pendentes e
+    em andamento das três áreas, já com placa e empresa do veículo.
+    """
+    if versao is None:
+        versao = get_versao(CHAVE_PATIO)
+    return _carregar_snapshot(versao)
+
+
+def sincronizar_patio():
+    """
+    Descarta a versão lida e o snapshot em cache deste processo: a próxima
+    leitura vai ao banco mesmo que a escrita não tenha mudado a versão
+    (ex.: dados do veículo editados em dados_clientes).
+    """
+    versao_alterada()
+    _carregar_snapshot.clear()
+
+
+def veiculos_aguardando_alocacao(snapshot):
+    """Veículos com serviço pendente e nenhum serviço em andamento, por placa."""
+    servicos = snapshot["servicos"]
+    if servicos.empty:
+        return pd.DataFrame(columns=['id', 'placa', 'empresa'])
+    contagem = pd.crosstab(servicos['veiculo_id'], servicos['status']).reindex(
+        columns=['pendente', 'em_andamento'], fill_value=0
+    )
+    aguardando = contagem.index[(contagem['pendente'] > 0) & (contagem['em_andamento'] == 0)]
+    veiculos = servicos.loc[servicos['veiculo_id'].isin(aguardando), ['veiculo_id', 'placa', 'empresa']]
+    return (veiculos.drop_duplicates('veiculo_id')
+                    .rename(columns={'veiculo_id': 'id'})
+                    .sort_values('placa')
+                    .reset_index(drop=True))
+
+
+def boxes_livres(snapshot):
+    boxes = snapshot["boxes"]
+    return boxes.index[~boxes['ocupado'].fillna(False).astype(bool)].tolist()
+
+
+def servicos_do_veiculo(snapshot, veiculo_id, status, box_id=None):
+    servicos = snapshot["servicos"]
+    filtro = (servicos['veiculo_id'] == veiculo_id) & (servicos['status'] == status)
+    if box_id is not None:
+        filtro &= servicos['box_id'] == box_id
+    return servicos[filtro]
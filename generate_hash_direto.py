@@ -1,23 +1,19 @@
 # generate_hash_direto.py
-import bcrypt
 import sys
+from credenciais import CUSTO_BCRYPT, gerar_hash
 
 # Pede a senha
 password = input("Digite a senha para gerar o hash: ")
 
 try:
-    # Codifica a senha para bytes
-    password_bytes = password.encode('utf-8')
+    # Gera o hash bcrypt com o custo configurado (CUSTO_BCRYPT)
+    hashed_string = gerar_hash(password)
 
-    # Gera o hash
-    hashed_bytes = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
-
-    # Decodifica o hash de volta para uma string para salvar no banco
-    hashed_string = hashed_bytes.decode('utf-8')
-
-    print("\n--- HASH GERADO COM SUCESSO ---")
+    print(f"\n--- HASH GERADO COM SUCESSO (bcrypt, custo {CUSTO_BCRYPT}) ---")
     print("Copie este valor e cole no campo 'password_hash' do seu banco de dados:")
     print(hashed_string)
+    print("\nDepois de alterar a tabela usuarios, rode também o comando abaixo para que o app recarregue as credenciais:")
+    print("UPDATE versoes_cache SET versao = versao + 1, atualizado_em = NOW() WHERE chave = 'usuarios';")
 
 except Exception as e:
     print(f"\nOcorreu um erro: {e}")
@@ -0,0 +1,447 @@
+# gerar_dados_sinteticos.py
+#
+# Cria o esquema do pátio num Postgres LOCAL e o preenche com dados
+# sintéticos em volumes realistas: clientes, veículos, usuários, funcionários,
+# boxes e anos de histórico (execucao_servico e serviços das três áreas), mais
+# o pátio "de agora" (boxes ocupados e fila de espera). Com a mesma semente o
+# resultado é sempre o mesmo, então medições antes/depois de uma mudança são
+# comparáveis (benchmark_consultas.py).
+#
+# O esquema foi reconstruído a partir das consultas do app (o repositório não
+# tem DDL). O resto (versoes_cache, placa_normalizada, arquivo, índices) vem
+# das migrações (migrar_banco.py), aplicadas depois da carga; com
+# --sem-migracoes só as migrações sem índices são aplicadas. Com --arquivar N
+# as visitas de mais de N anos vão para o arquivo (arquivar_historico.py).
+#
+# O histórico segue o comportamento do pátio: cada veículo tem o seu intervalo
+# médio entre visitas e a sua rodagem diária, com ~1% de leituras de KM
+# digitadas errado (como as que o diagnostico_anomalias.py encontra).
+#
+# ATENÇÃO: apaga e recria as tabelas com --recriar. Só roda contra localhost.
+#
+# Uso: python gerar_dados_sinteticos.py --escala media [--semente 42] [--recriar] [--sem-migracoes] [--arquivar 1]
+
+import argparse
+import io
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from core_utils import calcular_medias_km
+from credenciais import gerar_hash
+from database import get_script_connection
+from arquivar_historico import arquivar
+from migrar_banco import migrar
+
+ESCALAS = {
+    "pequena": {"clientes": 150, "veiculos": 1_000, "anos": 1, "boxes": 8, "funcionarios": 8},
+    "media": {"clientes": 800, "veiculos": 6_000, "anos": 3, "boxes": 12, "funcionarios": 14},
+    "grande": {"clientes": 3_000, "veiculos": 25_000, "anos": 5, "boxes": 20, "funcionarios": 24},
+}
+
+FUSO = "America/Campo_Grande"
+SENHA_PADRAO = "senha123"
+HOSTS_LOCAIS = ("localhost", "127.0.0.1", "::1", "/tmp", "/var/run/postgresql")
+
+AREAS = ("borracharia", "alinhamento", "manutencao")
+PROPORCAO_AREAS = (0.6, 0.25, 0.15)
+CATALOGO = {
+    "borracharia": ["Troca de pneu", "Rodízio", "Conserto de pneu", "Recapagem", "Calibragem", "Troca de válvula"],
+    "alinhamento": ["Alinhamento", "Balanceamento", "Alinhamento 3 eixos", "Cambagem"],
+    "manutencao": ["Freio", "Suspensão", "Troca de óleo", "Embreagem", "Elétrica", "Molas"],
+}
+
+# Tabelas na ordem de criação (DROP na ordem inversa)
+TABELAS = [
+    "clientes", "veiculos", "usuarios", "funcionarios", "boxes", "execucao_servico",
+    "servicos_borracharia", "servicos_alinhamento", "servicos_manutencao",
+    "servicos_solicitados_borracharia", "servicos_solicitados_alinhamento", "servicos_solicitados_manutencao",
+    "versoes_cache", "schema_migrations", "execucao_servico_arquivo", "execucao_servico_arquivo_resumo",
+]
+
+_COLUNAS_SERVICO_SOLICITADO = """
+    id SERIAL PRIMARY KEY,
+    veiculo_id INT REFERENCES veiculos(id),
+    execucao_id INT REFERENCES execucao_servico(id),
+    box_id INT,
+    funcionario_id INT,
+    tipo TEXT,
+    quantidade INT DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pendente',
+    quilometragem INT,
+    data_solicitacao TIMESTAMPTZ,
+    data_atualizacao TIMESTAMPTZ,
+    observacao TEXT,
+    observacao_execucao TEXT
+"""
+
+ESQUEMA = f"""
+    CREATE TABLE clientes (
+        id SERIAL PRIMARY KEY,
+        nome_empresa TEXT, nome_fantasia TEXT, nome_responsavel TEXT, contato_responsavel TEXT,
+        data_atualizacao_contato TIMESTAMPTZ, data_ultima_exportacao TIMESTAMPTZ,
+        codigo_antigo INT, cidade TEXT, uf TEXT
+    );
+    CREATE TABLE veiculos (
+        id SERIAL PRIMARY KEY,
+        placa TEXT NOT NULL, empresa TEXT, modelo TEXT, ano_modelo INT, quilometragem INT,
+        nome_motorista TEXT, contato_motorista TEXT, cliente_id INT REFERENCES clientes(id),
+        data_entrada TIMESTAMPTZ, data_atualizacao_contato TIMESTAMPTZ, data_ultima_exportacao TIMESTAMPTZ,
+        data_revisao_proativa DATE, media_km_diaria NUMERIC
+    );
+    CREATE TABLE usuarios (
+        id SERIAL PRIMARY KEY,
+        nome TEXT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, role TEXT DEFAULT 'funcionario'
+    );
+    CREATE TABLE funcionarios (id SERIAL PRIMARY KEY, nome TEXT NOT NULL);
+    CREATE TABLE boxes (id INT PRIMARY KEY, area TEXT, ocupado BOOLEAN NOT NULL DEFAULT FALSE);
+    CREATE TABLE execucao_servico (
+        id SERIAL PRIMARY KEY,
+        veiculo_id INT REFERENCES veiculos(id), box_id INT REFERENCES boxes(id),
+        funcionario_id INT REFERENCES funcionarios(id), quilometragem INT, status TEXT NOT NULL,
+        inicio_execucao TIMESTAMPTZ, fim_execucao TIMESTAMPTZ,
+        usuario_alocacao_id INT, usuario_finalizacao_id INT,
+        nome_motorista TEXT, contato_motorista TEXT, data_feedback TIMESTAMPTZ
+    );
+    CREATE TABLE servicos_borracharia (id SERIAL PRIMARY KEY, nome TEXT NOT NULL);
+    CREATE TABLE servicos_alinhamento (id SERIAL PRIMARY KEY, nome TEXT NOT NULL);
+    CREATE TABLE servicos_manutencao (id SERIAL PRIMARY KEY, nome TEXT NOT NULL);
+    CREATE TABLE servicos_solicitados_borracharia ({_COLUNAS_SERVICO_SOLICITADO});
+    CREATE TABLE servicos_solicitados_alinhamento ({_COLUNAS_SERVICO_SOLICITADO});
+    CREATE TABLE servicos_solicitados_manutencao ({_COLUNAS_SERVICO_SOLICITADO});
+"""
+
+_EMPRESAS_RAIZ = ["Transportes", "Logística", "Rodoviário", "Expresso", "Cargas", "Transportadora", "Agro", "Frota"]
+_EMPRESAS_NOME = ["Pantanal", "Serra", "Campo Grande", "Aquidauana", "Guaicurus", "Maracaju", "Ipê", "Bonito",
+                  "Paraná", "Horizonte", "Boi Gordo", "Cerrado", "Rio Negro", "Dourados", "Três Lagoas", "Pioneira"]
+_NOMES = ["João", "Maria", "José", "Ana", "Carlos", "Paulo", "Fernanda", "Lucas", "Marcos", "Juliana", "Pedro",
+          "Rafael", "Bruno", "Patrícia", "Antônio", "Luiz", "Sebastião", "Cláudio", "Aline", "Rodrigo"]
+_SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Rodrigues",
+               "Almeida", "Nascimento", "Carvalho", "Gomes", "Martins", "Araújo", "Ribeiro"]
+_MODELOS = ["Scania R450", "Volvo FH 540", "Mercedes Actros 2651", "DAF XF 530", "Iveco S-Way 480",
+            "VW Constellation 24.280", "Mercedes Atego 2430", "Volvo VM 270", "Scania P320", "VW Delivery 11.180"]
+_CIDADES = [("Campo Grande", "MS"), ("Dourados", "MS"), ("Três Lagoas", "MS"), ("Corumbá", "MS"),
+            ("Cuiabá", "MT"), ("Rondonópolis", "MT"), ("Maringá", "PR"), ("São Paulo", "SP")]
+
+
+def conexao_local():
+    """Conexão do DB_URL, recusada se o banco não estiver nesta máquina."""
+    conn = get_script_connection()
+    if conn and conn.info.host not in HOSTS_LOCAIS:
+        conn.close()
+        raise SystemExit(f"Recusado: o banco em '{conn.info.host}' não é local. Aponte DB_URL para um Postgres local.")
+    return conn
+
+
+def _nomes(rng, n):
+    return (pd.Series(rng.choice(_NOMES, n)) + " " + pd.Series(rng.choice(_SOBRENOMES, n))).to_numpy()
+
+
+def _telefones(rng, n):
+    return np.char.add("679", rng.integers(10_000_000, 99_999_999, n).astype(str))
+
+
+def _datas_aleatorias(rng, n, inicio, fim):
+    segundos = rng.uniform(0, (fim - inicio).total_seconds(), n)
+    return inicio + pd.to_timedelta(segundos, unit="s")
+
+
+def _talvez(rng, valores, proporcao):
+    """Mantém cada valor com a probabilidade dada; o resto vira nulo."""
+    serie = pd.Series(valores)
+    return serie.where(rng.random(len(serie)) < proporcao)
+
+
+def gerar_clientes(rng, n, agora):
+    raiz = rng.choice(_EMPRESAS_RAIZ, n)
+    nome = rng.choice(_EMPRESAS_NOME, n)
+    nome_empresa = [f"{r} {m} {i}" for i, (r, m) in enumerate(zip(raiz, nome), start=1)]
+    cidades = [_CIDADES[i] for i in rng.integers(0, len(_CIDADES), n)]
+    atualizacao = _datas_aleatorias(rng, n, agora - timedelta(days=720), agora)
+    exportacao = atualizacao + pd.to_timedelta(rng.uniform(-200, 200, n), unit="D")
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "nome_empresa": nome_empresa,
+        "nome_fantasia": _talvez(rng, [f"{m} {r}" for r, m in zip(raiz, nome)], 0.6),
+        "nome_responsavel": _talvez(rng, _nomes(rng, n), 0.8),
+        "contato_responsavel": _talvez(rng, _telefones(rng, n), 0.75),
+        "data_atualizacao_contato": atualizacao,
+        "data_ultima_exportacao": _talvez(rng, exportacao.where(exportacao < agora, agora), 0.5),
+        "codigo_antigo": _talvez(rng, rng.permutation(n) + 1000, 0.4).astype("Int64"),
+        "cidade": [c for c, _ in cidades],
+        "uf": [uf for _, uf in cidades],
+    })
+
+
+def _placas(rng, n):
+    """Placas únicas, metade no padrão antigo (ABC1234), metade Mercosul (ABC1D23)."""
+    letras = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    placas = set()
+    while len(placas) < n:
+        faltam = n - len(placas)
+        prefixo = ["".join(t) for t in rng.choice(letras, (faltam, 3))]
+        numeros = rng.integers(0, 10, (faltam, 4))
+        for p, d, mercosul, letra in zip(prefixo, numeros, rng.random(faltam) < 0.5, rng.choice(letras, faltam)):
+            placas.add(f"{p}{d[0]}{letra if mercosul else d[1]}{d[2]}{d[3]}")
+    return rng.permutation(sorted(placas))
+
+
+def gerar_veiculos(rng, n, clientes, inicio, agora):
+    cliente_idx = rng.integers(0, len(clientes), n)
+    entrada = _datas_aleatorias(rng, n, inicio - timedelta(days=365), agora - timedelta(days=7))
+    atualizacao = _datas_aleatorias(rng, n, inicio, agora)
+    # Placas gravadas como o pessoal digita: parte com hífen ou em minúsculas
+    placas = pd.Series(_placas(rng, n))
+    com_hifen = rng.random(n) < 0.15
+    placas[com_hifen] = placas[com_hifen].str[:3] + "-" + placas[com_hifen].str[3:]
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "placa": placas.to_numpy(),
+        "empresa": clientes["nome_empresa"].to_numpy()[cliente_idx],
+        "modelo": rng.choice(_MODELOS, n),
+        "ano_modelo": rng.integers(2005, agora.year + 1, n),
+        "nome_motorista": _talvez(rng, _nomes(rng, n), 0.85),
+        "contato_motorista": _talvez(rng, _telefones(rng, n), 0.7),
+        "cliente_id": clientes["id"].to_numpy()[cliente_idx],
+        "data_entrada": entrada,
+        "data_atualizacao_contato": atualizacao,
+        "data_ultima_exportacao": _talvez(rng, atualizacao + pd.to_timedelta(rng.uniform(-90, 90, n), unit="D"), 0.4),
+        "data_revisao_proativa": _talvez(rng, (agora - pd.to_timedelta(rng.uniform(0, 60, n), unit="D")).date, 0.05),
+        # Características de uso (não vão para o banco)
+        "_intervalo_dias": rng.uniform(15, 150, n),
+        "_km_dia": np.clip(rng.lognormal(np.log(250), 0.6, n), 20, 1200),
+        "_km_inicial": rng.integers(5_000, 600_000, n),
+    })
+
+
+def gerar_historico(rng, veiculos, inicio, agora, n_boxes, n_funcionarios, n_usuarios):
+    """Execuções finalizadas/canceladas do período e os serviços de cada uma."""
+    inicio_veiculo = veiculos["data_entrada"].where(veiculos["data_entrada"] > inicio, inicio)
+    dias_disponiveis = (agora - timedelta(days=1) - inicio_veiculo).dt.total_seconds() / 86400
+    visitas = rng.poisson(np.maximum(dias_disponiveis / veiculos["_intervalo_dias"], 0.3))
+    idx = np.repeat(np.arange(len(veiculos)), visitas)
+    n = len(idx)
+
+    base = pd.DatetimeIndex(inicio_veiculo)[idx]
+    dias = rng.uniform(0, 1, n) * dias_disponiveis.to_numpy()[idx]
+    # Horário comercial no fuso do pátio
+    dia_local = (base + pd.to_timedelta(dias, unit="D")).tz_convert(FUSO).normalize()
+    inicio_exec = dia_local + pd.to_timedelta(rng.uniform(7, 17.5, n), unit="h")
+    fim_exec = inicio_exec + pd.to_timedelta(np.clip(rng.lognormal(np.log(70), 0.6, n), 15, 480), unit="min")
+    execucoes = pd.DataFrame({
+        "veiculo_id": veiculos["id"].to_numpy()[idx],
+        "inicio_execucao": inicio_exec.tz_convert("UTC"),
+        "fim_execucao": fim_exec.tz_convert("UTC"),
+        "_km_dia": veiculos["_km_dia"].to_numpy()[idx],
+        "_km_inicial": veiculos["_km_inicial"].to_numpy()[idx],
+        "_inicio_veiculo": base,
+    }).sort_values(["veiculo_id", "inicio_execucao"], kind="stable").reset_index(drop=True)
+
+    dias_rodados = (execucoes["inicio_execucao"] - execucoes["_inicio_veiculo"]).dt.total_seconds() / 86400
+    km = execucoes["_km_inicial"] + dias_rodados * execucoes["_km_dia"] * rng.uniform(0.85, 1.15, n)
+    km = km.round(-1).astype("int64")
+    erro = rng.random(n) < 0.01                      # dígito a menos ou a mais
+    km[erro] = np.where(rng.random(erro.sum()) < 0.5, km[erro] // 10, km[erro] * 10)
+    cancelada = rng.random(n) < 0.03
+
+    execucoes = execucoes.assign(
+        id=np.arange(1, n + 1),
+        box_id=rng.integers(1, n_boxes + 1, n),
+        funcionario_id=rng.integers(1, n_funcionarios + 1, n),
+        quilometragem=km,
+        status=np.where(cancelada, "cancelado", "finalizado"),
+        usuario_alocacao_id=rng.integers(1, n_usuarios + 1, n),
+        usuario_finalizacao_id=pd.Series(rng.integers(1, n_usuarios + 1, n)).where(~cancelada).astype("Int64"),
+    )
+    execucoes["fim_execucao"] = execucoes["fim_execucao"].where(~cancelada)
+    execucoes = execucoes.merge(
+        veiculos[["id", "nome_motorista", "contato_motorista"]].rename(columns={"id": "veiculo_id"}), on="veiculo_id"
+    )
+    execucoes["data_feedback"] = _talvez(
+        rng, execucoes["fim_execucao"] + pd.to_timedelta(rng.uniform(1, 6, n), unit="D"), 0.4
+    ).where(lambda d: d < agora)
+    servicos = _servicos_das_execucoes(rng, execucoes, execucoes["status"].to_numpy(), agora)
+    return execucoes, servicos
+
+
+def _servicos_das_execucoes(rng, execucoes, status, agora):
+    quantos = 1 + rng.poisson(1.2, len(execucoes))
+    idx = np.repeat(np.arange(len(execucoes)), quantos)
+    n = len(idx)
+    area = rng.choice(AREAS, n, p=PROPORCAO_AREAS)
+    tipo = np.empty(n, dtype=object)
+    for a in AREAS:
+        tipo[area == a] = rng.choice(CATALOGO[a], (area == a).sum())
+    inicio = pd.DatetimeIndex(execucoes["inicio_execucao"])[idx]
+    fim = pd.DatetimeIndex(execucoes["fim_execucao"])[idx]
+    solicitacao = inicio - pd.to_timedelta(rng.uniform(5, 180, n), unit="min")
+    com_box = status[idx] != "pendente"
+    return pd.DataFrame({
+        "area": area,
+        "veiculo_id": execucoes["veiculo_id"].to_numpy()[idx],
+        "execucao_id": pd.Series(execucoes["id"].to_numpy()[idx]).where(com_box).astype("Int64"),
+        "box_id": pd.Series(execucoes["box_id"].to_numpy()[idx]).where(com_box).astype("Int64"),
+        "funcionario_id": pd.Series(execucoes["funcionario_id"].to_numpy()[idx]).where(com_box).astype("Int64"),
+        "tipo": tipo,
+        "quantidade": np.where(area == "borracharia", rng.integers(1, 5, n), 1),
+        "status": status[idx],
+        "quilometragem": execucoes["quilometragem"].to_numpy()[idx],
+        "data_solicitacao": solicitacao,
+        "data_atualizacao": fim.fillna(agora),
+        "observacao": _talvez(rng, np.full(n, "Cliente pediu verificação"), 0.05),
+        "observacao_execucao": _talvez(rng, np.full(n, "Executado conforme solicitado"), 0.1),
+    })
+
+
+def gerar_patio_atual(rng, veiculos, agora, n_boxes, n_funcionarios, n_usuarios, proximo_id):
+    """Boxes ocupados agora (execuções em andamento) e a fila de serviços pendentes."""
+    ocupados = rng.choice(np.arange(1, n_boxes + 1), max(1, int(n_boxes * 0.6)), replace=False)
+    escolhidos = rng.choice(veiculos["id"].to_numpy(), len(ocupados) + n_boxes * 2, replace=False)
+    em_box, na_fila = escolhidos[:len(ocupados)], escolhidos[len(ocupados):]
+    por_id = veiculos.set_index("id")
+    km_agora = (por_id["_km_inicial"] + (agora - por_id["data_entrada"]).dt.days * por_id["_km_dia"]).round(-1).astype("int64")
+
+    andamento = pd.DataFrame({
+        "id": np.arange(proximo_id, proximo_id + len(em_box)),
+        "veiculo_id": em_box,
+        "box_id": ocupados,
+        "funcionario_id": rng.integers(1, n_funcionarios + 1, len(em_box)),
+        "quilometragem": km_agora.loc[em_box].to_numpy(),
+        "status": "em_andamento",
+        "inicio_execucao": agora - pd.to_timedelta(rng.uniform(10, 180, len(em_box)), unit="min"),
+        "fim_execucao": pd.NaT,
+        "usuario_alocacao_id": rng.integers(1, n_usuarios + 1, len(em_box)),
+    })
+    servicos_andamento = _servicos_das_execucoes(rng, andamento, andamento["status"].to_numpy(), agora)
+
+    fila = pd.DataFrame({
+        "id": 0, "veiculo_id": na_fila, "box_id": 0, "funcionario_id": 0,
+        "quilometragem": km_agora.loc[na_fila].to_numpy(),
+        "inicio_execucao": agora - pd.to_timedelta(rng.uniform(0, 120, len(na_fila)), unit="min"),
+        "fim_execucao": pd.NaT,
+    })
+    servicos_fila = _servicos_das_execucoes(rng, fila, np.full(len(fila), "pendente"), agora)
+    servicos_fila["data_atualizacao"] = servicos_fila["data_solicitacao"]
+    return andamento, pd.concat([servicos_andamento, servicos_fila], ignore_index=True)
+
+
+def _copiar(cursor, tabela, df):
+    """COPY do DataFrame (só as colunas sem '_' na frente) para a tabela."""
+    colunas = [c for c in df.columns if not c.startswith("_")]
+    buffer = io.BytesIO(df[colunas].to_csv(index=False, header=False).encode("utf-8"))
+    cursor.copy_expert(f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv, ENCODING 'UTF8')", buffer)
+    return len(df)
+
+
+def criar_esquema(conn, recriar=False):
+    with conn.cursor() as cursor:
+        if recriar:
+            cursor.execute("DROP TABLE IF EXISTS " + ", ".join(reversed(TABELAS)) + " CASCADE")
+        cursor.execute(ESQUEMA)
+    conn.commit()
+    # pg_trgm (busca de clientes por similaridade) pode não estar instalado no Postgres local
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Aviso: extensão pg_trgm indisponível ({str(e).strip().splitlines()[0]}); a busca por similaridade não vai funcionar.")
+
+
+def gerar(conn, escala, semente=42, recriar=False, migracoes=True, arquivar_anos=None):
+    """
+    Cria o esquema, grava os dados da escala e aplica as migrações; com
+    'arquivar_anos', arquiva as visitas mais antigas que isso. Retorna {tabela: linhas}.
+    """
+    parametros = ESCALAS[escala]
+    rng = np.random.default_rng(semente)
+    agora = pd.Timestamp.now(tz="UTC").floor("s")
+    inicio = agora - timedelta(days=365 * parametros["anos"])
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('veiculos') IS NOT NULL")
+        if cursor.fetchone()[0] and not recriar:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM veiculos)")
+            if cursor.fetchone()[0]:
+                raise SystemExit("O banco já tem dados. Use --recriar para apagar e gerar de novo.")
+    conn.rollback()
+    criar_esquema(conn, recriar)
+
+    n_boxes, n_funcionarios = parametros["boxes"], parametros["funcionarios"]
+    usuarios = pd.DataFrame({"nome": ["Administrador"] + [f"Operador {i}" for i in range(1, 6)],
+                             "username": ["admin"] + [f"operador{i}" for i in range(1, 6)],
+                             "role": ["admin"] + ["funcionario"] * 5})
+    usuarios.insert(0, "id", np.arange(1, len(usuarios) + 1))
+    usuarios["password_hash"] = gerar_hash(SENHA_PADRAO)
+    funcionarios = pd.DataFrame({"id": np.arange(0, n_funcionarios + 1),
+                                 "nome": ["-"] + list(_nomes(rng, n_funcionarios))})
+    areas_box = [None] + [AREAS[i % len(AREAS)] if i % 4 else None for i in range(1, n_boxes + 1)]
+    boxes = pd.DataFrame({"id": np.arange(0, n_boxes + 1), "area": areas_box, "ocupado": False})
+
+    clientes = gerar_clientes(rng, parametros["clientes"], agora)
+    veiculos = gerar_veiculos(rng, parametros["veiculos"], clientes, inicio, agora)
+    execucoes, servicos = gerar_historico(rng, veiculos, inicio, agora, n_boxes, n_funcionarios, len(usuarios))
+    andamento, servicos_abertos = gerar_patio_atual(
+        rng, veiculos, agora, n_boxes, n_funcionarios, len(usuarios), len(execucoes) + 1)
+    execucoes = pd.concat([execucoes, andamento], ignore_index=True)
+    servicos = pd.concat([servicos, servicos_abertos], ignore_index=True)
+    boxes.loc[boxes["id"].isin(andamento["box_id"]), "ocupado"] = True
+
+    # Quilometragem atual e média de KM/dia calculadas com a mesma regra do app
+    finalizadas = execucoes[execucoes["status"] == "finalizado"]
+    medias = calcular_medias_km(finalizadas[["veiculo_id", "fim_execucao", "quilometragem"]])
+    veiculos["media_km_diaria"] = veiculos["id"].map(medias)
+    veiculos["quilometragem"] = veiculos["id"].map(
+        execucoes.sort_values("inicio_execucao").groupby("veiculo_id")["quilometragem"].last()).astype("Int64")
+
+    contagem = {}
+    with conn.cursor() as cursor:
+        for tabela, df in [("usuarios", usuarios), ("funcionarios", funcionarios), ("boxes", boxes),
+                           ("clientes", clientes), ("veiculos", veiculos)]:
+            contagem[tabela] = _copiar(cursor, tabela, df)
+        for area in AREAS:
+            contagem[f"servicos_{area}"] = _copiar(cursor, f"servicos_{area}", pd.DataFrame({"nome": CATALOGO[area]}))
+        contagem["execucao_servico"] = _copiar(cursor, "execucao_servico", execucoes)
+        for area in AREAS:
+            contagem[f"servicos_solicitados_{area}"] = _copiar(
+                cursor, f"servicos_solicitados_{area}", servicos[servicos["area"] == area].drop(columns="area"))
+        for tabela in ("clientes", "veiculos", "usuarios", "funcionarios", "execucao_servico") + tuple(
+                f"servicos_solicitados_{a}" for a in AREAS):
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT MAX(id) FROM {tabela}))")
+    conn.commit()
+
+    # Sem migrações, só as que não criam índices: as tabelas que o app usa existem
+    migrar(conn, verbose=False, sem_indices=not migracoes)
+    if arquivar_anos:
+        arquivar(conn, arquivar_anos, tamanho_lote=2000, verbose=False)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("VACUUM ANALYZE")
+    conn.autocommit = False
+    return contagem
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos do pátio num Postgres local.")
+    parser.add_argument("--escala", choices=ESCALAS, default="media")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--recriar", action="store_true", help="apaga as tabelas do pátio antes de gerar")
+    parser.add_argument("--sem-migracoes", action="store_true", help="não aplica as migrações (banco sem os índices)")
+    parser.add_argument("--arquivar", type=int, metavar="ANOS", help="arquiva as visitas com mais de ANOS anos")
+    args = parser.parse_args()
+
+    conn = conexao_local()
+    if conn:
+        try:
+            inicio = time.perf_counter()
+            contagem = gerar(conn, args.escala, args.semente, args.recriar, not args.sem_migracoes,
+                             args.arquivar)
+            for tabela, linhas in contagem.items():
+                print(f"  {tabela:<34} {linhas:>10,}".replace(",", "."))
+            print(f"\nEscala '{args.escala}' gerada em {time.perf_counter() - inicio:.1f}s. "
+                  f"Login: admin / {SENHA_PADRAO}")
+        finally:
+            conn.close()
@@ -0,0 +1,26 @@
+# historico.py
+#
+# Nomes das tabelas do arquivo de visitas (migração 0002) e o início do
+# histórico que ainda está nas tabelas do pátio. Usado pelas páginas (via
+# utils) e por arquivar_historico.py, que faz o arquivamento.
+
+TABELA_ARQUIVO = "execucao_servico_arquivo"
+TABELA_RESUMO_ARQUIVO = "execucao_servico_arquivo_resumo"
+# Visitas canceladas no pátio podem não ter fim_execucao
+ENCERRAMENTO = "COALESCE({0}fim_execucao, {0}inicio_execucao)"
+
+
+def inicio_historico_patio(conn):
+    """
+    Primeiro dia cujas visitas estão todas nas tabelas do pátio (o dia seguinte
+    à visita arquivada mais recente), ou None se nada foi arquivado. Lê o
+    resumo (uma linha por veículo), não o arquivo, que só cresce.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (TABELA_RESUMO_ARQUIVO,))
+        inicio = None
+        if cursor.fetchone()[0]:
+            cursor.execute(f"SELECT MAX(ultima_visita)::date + 1 FROM {TABELA_RESUMO_ARQUIVO}")
+            inicio = cursor.fetchone()[0]
+    conn.rollback()
+    return inicio
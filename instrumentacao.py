@@ -0,0 +1,214 @@
+# instrumentacao.py
+#
+# Mede as consultas feitas pelas conexões do pool do app (database.py usa
+# ConexaoInstrumentada como connection_factory). Para cada consulta guarda a
+# "impressão digital" do SQL (texto sem valores literais), duração, linhas, a
+# página do menu e a função que chamou. Os números ficam na memória do
+# processo, agregados, e aparecem na página "Desempenho" (admin).
+#
+# O custo é um perf_counter e uma caminhada curta na pilha por consulta.
+#
+# Também guarda o PerfilRerun do rerun em andamento (perfil_rerun.py), que
+# divide o tempo de cada rerun entre banco, renderização, chamadas externas e
+# o restante (Python da página).
+
+import contextvars
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+import pandas as pd
+import psycopg2.extensions
+
+PASTA_APP = os.path.dirname(os.path.abspath(__file__))
+AMOSTRAS_POR_CONSULTA = 500     # durações guardadas por consulta para os percentis
+TAMANHO_TEXTO = 400             # caracteres do SQL guardados para exibição
+
+# Página do menu em execução na thread atual (registro_paginas.abrir_pagina e,
+# nos reruns de fragmentos, registro_paginas.fragmento_da_pagina definem)
+pagina_atual = contextvars.ContextVar("pagina_atual", default="(fora de página)")
+# Perfil do rerun em andamento na thread atual, ou None se o perfil está desligado
+rerun_atual = contextvars.ContextVar("rerun_atual", default=None)
+
+CATEGORIAS = ("banco", "render", "externo", "python")
+
+_ARQUIVOS_IGNORADOS = {os.path.join(PASTA_APP, nome) for nome in ("instrumentacao.py", "database.py")}
+
+# Estatísticas por consulta (resumo()); database.init_connection_pool define
+# a partir de INSTRUMENTAR_CONSULTAS
+registrar_estatisticas = True
+
+_lock = threading.Lock()
+_estatisticas = {}
+
+
+# --- Impressão digital do SQL ---
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar_sql(consulta):
+    """SQL sem literais, com listas de valores e espaços colapsados."""
+    if isinstance(consulta, bytes):
+        consulta = consulta.decode("utf-8", errors="replace")
+    texto = _RE_TEXTO.sub("?", str(consulta))
+    texto = _RE_NUMERO.sub("?", texto)
+    texto = _RE_LISTA.sub("(...)", texto)
+    return _RE_ESPACOS.sub(" ", texto).strip()
+
+
+@lru_cache(maxsize=2048)
+def _impressao(consulta):
+    texto = normalizar_sql(consulta)
+    return hashlib.md5(texto.encode()).hexdigest()[:10], texto[:TAMANHO_TEXTO]
+
+
+def _origem():
+    """Primeira função do app na pilha, fora deste módulo e de database.py: 'pages/x.funcao'."""
+    frame = sys._getframe(3)
+    while frame is not None:
+        arquivo = frame.f_code.co_filename
+        if arquivo.startswith(PASTA_APP) and arquivo not in _ARQUIVOS_IGNORADOS:
+            modulo = os.path.relpath(arquivo, PASTA_APP)[:-3].replace(os.sep, "/")
+            return f"{modulo}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "(externo)"
+
+
+def registrar(consulta, duracao_ms, linhas):
+    chave_sql = consulta if isinstance(consulta, (str, bytes)) else str(consulta)
+    if isinstance(chave_sql, bytes) and len(chave_sql) > 4096:
+        chave_sql = chave_sql[:4096]     # execute_values: o começo basta para a impressão
+    impressao, texto = _impressao(chave_sql)
+    chave = (pagina_atual.get(), _origem(), impressao)
+    with _lock:
+        item = _estatisticas.get(chave)
+        if item is None:
+            item = _estatisticas[chave] = {
+                "consulta": texto, "chamadas": 0, "total_ms": 0.0, "max_ms": 0.0, "linhas": 0,
+                "amostras": deque(maxlen=AMOSTRAS_POR_CONSULTA),
+            }
+        item["chamadas"] += 1
+        item["total_ms"] += duracao_ms
+        item["max_ms"] = max(item["max_ms"], duracao_ms)
+        item["linhas"] += max(linhas, 0)
+        item["amostras"].append(duracao_ms)
+
+
+class PerfilRerun:
+    """
+    Tempo de um rerun por categoria. Os trechos podem se aninhar (uma
+    consulta dentro de um trecho de render); o tempo vai sempre para o
+    trecho mais interno, então as categorias somam o tempo total sem contar
+    nada duas vezes.
+    """
+
+    def __init__(self):
+        self.inicio = self._marca = time.perf_counter()
+        self.tempos = dict.fromkeys(CATEGORIAS, 0.0)
+        self.consultas = 0
+        self._pilha = ["python"]
+
+    def entrar(self, categoria):
+        agora = time.perf_counter()
+        self.tempos[self._pilha[-1]] += agora - self._marca
+        self._pilha.append(categoria)
+        self._marca = agora
+
+    def sair(self):
+        agora = time.perf_counter()
+        self.tempos[self._pilha.pop()] += agora - self._marca
+        self._marca = agora
+
+    def encerrar(self):
+        """Fecha o rerun; devolve o tempo total em segundos."""
+        agora = time.perf_counter()
+        self.tempos[self._pilha[-1]] += agora - self._marca
+        self._marca = agora
+        return agora - self.inicio
+
+
+@contextmanager
+def trecho(categoria):
+    """Atribui o tempo do bloco à categoria no perfil do rerun (se houver um em andamento)."""
+    perfil = rerun_atual.get()
+    if perfil is None:
+        yield
+        return
+    perfil.entrar(categoria)
+    try:
+        yield
+    finally:
+        perfil.sair()
+
+
+class _CursorMedido:
+    """Mixin que mede execute/executemany de qualquer classe de cursor."""
+
+    def _medir(self, metodo, query, argumentos):
+        perfil = rerun_atual.get()
+        if perfil is not None:
+            perfil.consultas += 1
+            perfil.entrar("banco")
+        inicio = time.perf_counter()
+        try:
+            return metodo(query, argumentos)
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            if perfil is not None:
+                perfil.sair()
+            if registrar_estatisticas:
+                registrar(query, duracao_ms, self.rowcount)
+
+    def execute(self, query, vars=None):
+        return self._medir(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._medir(super().executemany, query, vars_list)
+
+
+@lru_cache(maxsize=None)
+def _classe_medida(classe_cursor):
+    return type(f"{classe_cursor.__name__}Medido", (_CursorMedido, classe_cursor), {})
+
+
+class ConexaoInstrumentada(psycopg2.extensions.connection):
+    """Conexão cujos cursores (inclusive DictCursor e os do pandas) são medidos."""
+
+    def cursor(self, *args, **kwargs):
+        classe = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _classe_medida(classe)
+        return super().cursor(*args, **kwargs)
+
+
+def resumo():
+    """Uma linha por (página, função, consulta), da que mais consumiu tempo para a que menos."""
+    with _lock:
+        linhas = [
+            {"pagina": pagina, "origem": origem, "impressao": impressao, "consulta": item["consulta"],
+             "chamadas": item["chamadas"], "total_ms": item["total_ms"], "max_ms": item["max_ms"],
+             "linhas": item["linhas"], "amostras": list(item["amostras"])}
+            for (pagina, origem, impressao), item in _estatisticas.items()
+        ]
+    if not linhas:
+        return pd.DataFrame()
+    df = pd.DataFrame(linhas)
+    df["media_ms"] = df["total_ms"] / df["chamadas"]
+    df["p95_ms"] = df.pop("amostras").map(lambda amostras: pd.Series(amostras).quantile(0.95))
+    df["linhas_por_chamada"] = df["linhas"] / df["chamadas"]
+    colunas = ["pagina", "origem", "chamadas", "total_ms", "media_ms", "p95_ms", "max_ms",
+               "linhas_por_chamada", "impressao", "consulta"]
+    return df[colunas].sort_values("total_ms", ascending=False).reset_index(drop=True)
+
+
+def limpar():
+    with _lock:
+        _estatisticas.clear()
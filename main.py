@@ -1,27 +1,10 @@
 # /main.py
 
 import streamlit as st
-from auth_utils import initialize_authenticator # Importante
+from auth_utils import initialize_authenticator, carregar_contexto_usuario, limpar_contexto_usuario, usuario_atual # Importante
 from streamlit_option_menu import option_menu
 from streamlit_js_eval import streamlit_js_eval
-from pages import (
-    cadastro_servico,
-    alocar_servicos,
-    filas_servico,
-    visao_boxes,
-    servicos_concluidos,
-    historico_veiculo,
-    feedback_servicos,
-    revisao_proativa,
-    gerenciar_usuarios,
-    relatorios,
-    dados_clientes,
-    mesclar_historico,
-    gerar_termos,
-    ajustar_media_km,
-    analise_pneus,
-    exportar_contatos
-)
+from registro_paginas import abrir_pagina
 
 st.set_page_config(page_title="Controle de Pátio PRO", layout="wide")
 
@@ -41,10 +24,15 @@ if authentication_status:
     st.session_state['authentication_status'] = True
     st.session_state['name'] = name
     st.session_state['username'] = username
+    if carregar_contexto_usuario(authenticator, username) is None:
+        st.error('Usuário não encontrado. Faça login novamente.')
+        st.stop()
 elif authentication_status is False:
+    limpar_contexto_usuario()
     st.error('Usuário ou senha incorretos.')
     st.stop()
 else:
+    limpar_contexto_usuario()
     st.info('Por favor, insira seu usuário e senha para continuar.')
     st.stop()
 
@@ -83,7 +71,7 @@ user_agent = streamlit_js_eval(js_expressions='window.navigator.userAgent', key=
 
 # --- SIDEBAR ---
 with st.sidebar:
-    st.success(f"Logado como: **{st.session_state.get('name')}**")
+    st.success(f"Logado como: **{usuario_atual().nome}**")
     authenticator.logout('Logout', 'sidebar', key='logout_button')
 
     st.markdown("### Integrações")
@@ -108,7 +96,7 @@ if IS_MOBILE:
         mobile_options.append("Análise de Pneus")
         mobile_icons.append("camera")
 
-    if st.session_state.get('user_role') == 'admin':
+    if usuario_atual().admin:
         mobile_options.extend(["Controle de Feedback", "Revisão Proativa"])
         mobile_icons.extend(["telephone-outbound", "arrow-repeat"])
 
@@ -136,9 +124,9 @@ else:
         pc_options.append("Análise de Pneus")
         pc_icons.append("camera")
 
-    if st.session_state.get('user_role') == 'admin':
-        pc_options.extend(["Gerenciar Usuários", "Relatórios", "Mesclar Históricos"])
-        pc_icons.extend(["people-fill", "graph-up", "sign-merge-left-fill"])
+    if usuario_atual().admin:
+        pc_options.extend(["Gerenciar Usuários", "Relatórios", "Mesclar Históricos", "Diagnóstico de KM", "Desempenho"])
+        pc_icons.extend(["people-fill", "graph-up", "sign-merge-left-fill", "speedometer2", "stopwatch"])
 
     options_to_show = pc_options
     icons_to_show   = pc_icons
@@ -167,31 +155,4 @@ selected_page = option_menu(
 st.markdown('</div>', unsafe_allow_html=True)
 
 # --- ROTEAMENTO ---
-if selected_page == "Alocar Serviços":
-    alocar_servicos.alocar_servicos()
-elif selected_page == "Cadastro de Serviço":
-    cadastro_servico.app()
-elif selected_page == "Dados de Clientes":
-    dados_clientes.app()
-elif selected_page == "Filas de Serviço":
-    filas_servico.app()
-elif selected_page == "Visão dos Boxes":
-    visao_boxes.visao_boxes()
-elif selected_page == "Serviços Concluídos":
-    servicos_concluidos.app()
-elif selected_page == "Histórico por Veículo":
-    historico_veiculo.app()
-elif selected_page == "Controle de Feedback":
-    feedback_servicos.app()
-elif selected_page == "Revisão Proativa":
-    revisao_proativa.app()
-elif selected_page == "Análise de Pneus":
-    analise_pneus.app()
-elif selected_page == "Gerenciar Usuários":
-    gerenciar_usuarios.app()
-elif selected_page == "Relatórios":
-    relatorios.app()
-elif selected_page == "Mesclar Históricos":
-    mesclar_historico.app()
-elif selected_page == "Exportar CSV":
-    exportar_contatos.app()
+abrir_pagina(selected_page)
@@ -0,0 +1,213 @@
+# mesclagem_veiculos.py
+
+import pandas as pd
+import psycopg2.extras
+from arquivar_historico import atualizar_resumos
+from core_utils import QUERY_HISTORICO_KM, recalcular_medias_veiculos, visitas_validas_km
+from controle_versao import CHAVE_PATIO, incrementar_versao
+
+# Tabelas com histórico ligado ao veículo (inclusive as visitas arquivadas);
+# tudo que aponta para o veículo removido passa para o veículo mantido.
+TABELAS_HISTORICO = [
+    "execucao_servico",
+    "servicos_solicitados_borracharia",
+    "servicos_solicitados_alinhamento",
+    "servicos_solicitados_manutencao",
+    "execucao_servico_arquivo",
+]
+
+# Cadastros do mesmo veículo caem no mesmo grupo pela placa normalizada com a
+# placa antiga (AAA9999) convertida para Mercosul (AAA9A99). Isso junta a mesma
+# placa digitada em formatos diferentes e a placa antiga com a sua conversão.
+# Em cada grupo fica um cadastro: o de placa Mercosul, depois o com mais
+# visitas, depois o mais antigo; os outros são os candidatos a remoção.
+QUERY_CANDIDATOS = """
+    WITH resumo AS (
+        SELECT v.id, v.placa, v.placa_normalizada AS chave, v.cliente_id, v.empresa,
+               CASE WHEN v.placa_normalizada ~ '^[A-Z]{3}[0-9]{4}$'
+                    THEN LEFT(v.placa_normalizada, 4) || CHR(ASCII('A') + SUBSTRING(v.placa_normalizada, 5, 1)::int)
+                         || RIGHT(v.placa_normalizada, 2)
+                    ELSE v.placa_normalizada END AS grupo,
+               COUNT(es.id) + COALESCE(MAX(a.visitas), 0) AS visitas,
+               LEAST(MIN(es.fim_execucao), MAX(a.primeira_visita)) AS primeira_visita,
+               GREATEST(MAX(es.fim_execucao), MAX(a.ultima_visita)) AS ultima_visita
+        FROM veiculos v
+        LEFT JOIN execucao_servico es ON es.veiculo_id = v.id AND es.status = 'finalizado'
+        LEFT JOIN execucao_servico_arquivo_resumo a ON a.veiculo_id = v.id
+        WHERE v.placa_normalizada <> ''
+        GROUP BY v.id
+    ), grupos AS (
+        SELECT *,
+               FIRST_VALUE(id) OVER (PARTITION BY grupo
+                                     ORDER BY chave ~ '^[A-Z]{3}[0-9][A-Z][0-9]{2}$' DESC, visitas DESC, id) AS id_manter
+        FROM resumo
+    )
+    SELECT CASE WHEN r.chave = m.chave THEN 'mesma placa' ELSE 'Mercosul' END AS motivo, r.grupo,
+           r.id AS id_remover, r.placa AS placa_remover, r.empresa AS empresa_remover, r.visitas AS visitas_remover,
+           r.primeira_visita AS primeira_remover, r.ultima_visita AS ultima_remover,
+           m.id AS id_manter, m.placa AS placa_manter, m.empresa AS empresa_manter, m.visitas AS visitas_manter,
+           m.primeira_visita AS primeira_manter, m.ultima_visita AS ultima_manter,
+           (r.cliente_id IS NOT NULL AND r.cliente_id = m.cliente_id) AS mesmo_cliente
+    FROM grupos r
+    JOIN resumo m ON m.id = r.id_manter
+    WHERE r.id <> r.id_manter
+    ORDER BY m.placa, r.id;
+"""
+
+
+def _visitas_descartadas(historico):
+    """Quantas visitas a regra monotônica de KM descarta, por veiculo_id."""
+    ordenado = historico.sort_values(['veiculo_id', 'fim_execucao'], kind='stable')
+    total = ordenado.groupby('veiculo_id').size()
+    return total - visitas_validas_km(ordenado).groupby('veiculo_id').size().reindex(total.index, fill_value=0)
+
+
+def _conflitos_por_grupo(conn, candidatos):
+    """
+    Junta o histórico de todos os cadastros de cada grupo como se já
+    estivessem mesclados e conta quantas visitas a regra monotônica de KM
+    descartaria além das que cada cadastro já descarta sozinho.
+    Zero: as quilometragens se encaixam. Retorna Series grupo -> conflitos.
+    """
+    membros = pd.concat([
+        candidatos[['grupo', 'id_remover']].set_axis(['grupo', 'veiculo_id'], axis=1),
+        candidatos[['grupo', 'id_manter']].set_axis(['grupo', 'veiculo_id'], axis=1),
+    ]).drop_duplicates()
+    with conn.cursor() as cursor:
+        cursor.execute(QUERY_HISTORICO_KM, {"ids": [int(i) for i in membros['veiculo_id']]})
+        historico = pd.DataFrame(cursor.fetchall(), columns=['veiculo_id', 'fim_execucao', 'quilometragem'])
+    historico = historico.merge(membros, on='veiculo_id')
+    if historico.empty:
+        return pd.Series(dtype=int)
+
+    juntos = _visitas_descartadas(historico.assign(veiculo_id=historico['grupo']))
+    separados = _visitas_descartadas(historico)
+    separados = separados.groupby(membros.set_index('veiculo_id')['grupo']).sum()
+    return juntos.sub(separados, fill_value=0).astype(int)
+
+
+def detectar_candidatos(conn):
+    """
+    Lista os cadastros que parecem duplicar outro veículo (uma linha por
+    cadastro a remover), com os indicadores para a decisão: mesmo cliente,
+    períodos de visitas que se sobrepõem e quantas visitas do grupo deixariam
+    de encaixar na sequência de KM. A coluna 'confianca' resume: 'alta' quando
+    as KMs se encaixam e o cliente é o mesmo (ou um dos cadastros não tem histórico).
+    """
+    candidatos = pd.read_sql(QUERY_CANDIDATOS, conn)
+    if candidatos.empty:
+        return candidatos
+
+    candidatos['sobreposicao'] = (candidatos['primeira_remover'] <= candidatos['ultima_manter']) & \
+                                 (candidatos['primeira_manter'] <= candidatos['ultima_remover'])
+    candidatos['conflitos_km'] = candidatos['grupo'].map(_conflitos_por_grupo(conn, candidatos)).fillna(0).astype(int)
+    sem_historico = (candidatos['visitas_remover'] == 0) | (candidatos['visitas_manter'] == 0)
+    candidatos['confianca'] = 'baixa'
+    candidatos.loc[(candidatos['conflitos_km'] == 0) | candidatos['mesmo_cliente'], 'confianca'] = 'média'
+    candidatos.loc[(candidatos['conflitos_km'] == 0) & (candidatos['mesmo_cliente'] | sem_historico), 'confianca'] = 'alta'
+    return candidatos
+
+
+def validar_pares(pares):
+    """Rejeita mapeamentos ambíguos: cadastro removido duas vezes, mantido e removido, ou par consigo mesmo."""
+    removidos = [r for r, _ in pares]
+    mantidos = {m for _, m in pares}
+    if len(removidos) != len(set(removidos)):
+        return "Um mesmo cadastro aparece para remoção em mais de um par."
+    if mantidos & set(removidos):
+        return "Um cadastro não pode ser mantido em um par e removido em outro; mescle em etapas."
+    if any(r == m for r, m in pares):
+        return "Par com o mesmo cadastro dos dois lados."
+    return None
+
+
+def mesclar_em_lote(conn, pares):
+    """
+    Mescla vários pares (id_remover, id_manter) numa única transação.
+
+    Os pares vão para uma tabela temporária e cada etapa é um único comando
+    para todos eles: completa os dados do cadastro mantido com os do removido,
+    move o histórico de cada tabela, apaga os cadastros removidos e recalcula
+    as médias de KM dos mantidos.
+    Retorna (True, {'pares': n, 'linhas_movidas': {tabela: n}}) ou (False, mensagem).
+    """
+    pares = [(int(r), int(m)) for r, m in pares]
+    if not pares:
+        return False, "Nenhum par selecionado."
+    erro = validar_pares(pares)
+    if erro:
+        return False, erro
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE mapa_mesclagem (id_antigo INT PRIMARY KEY, id_novo INT NOT NULL) ON COMMIT DROP;
+            """)
+            psycopg2.extras.execute_values(
+                cursor, "INSERT INTO mapa_mesclagem (id_antigo, id_novo) VALUES %s", pares, page_size=1000
+            )
+
+            # 1. Consolida as informações do veículo (pega dados do antigo se o novo não tiver)
+            cursor.execute("""
+                UPDATE veiculos v_novo
+                SET
+                    nome_motorista = COALESCE(v_novo.nome_motorista, v_antigo.nome_motorista),
+                    contato_motorista = COALESCE(v_novo.contato_motorista, v_antigo.contato_motorista),
+                    empresa = COALESCE(v_novo.empresa, v_antigo.empresa),
+                    cliente_id = COALESCE(v_novo.cliente_id, v_antigo.cliente_id),
+                    modelo = COALESCE(v_novo.modelo, v_antigo.modelo),
+                    ano_modelo = COALESCE(v_novo.ano_modelo, v_antigo.ano_modelo)
+                FROM mapa_mesclagem m
+                JOIN veiculos v_antigo ON v_antigo.id = m.id_antigo
+                WHERE v_novo.id = m.id_novo;
+            """)
+
+            # 2. Re-atribui o histórico de serviços, uma tabela por comando
+            linhas_movidas = {}
+            for tabela in TABELAS_HISTORICO:
+                cursor.execute(f"""
+                    UPDATE {tabela} t SET veiculo_id = m.id_novo
+                    FROM mapa_mesclagem m
+                    WHERE t.veiculo_id = m.id_antigo;
+                """)
+                linhas_movidas[tabela] = cursor.rowcount
+
+            # 3. Resumo das visitas arquivadas: passa a ser do mantido
+            atualizar_resumos(cursor, [veiculo_id for par in pares for veiculo_id in par])
+
+            # 4. Remove os cadastros duplicados
+            cursor.execute("DELETE FROM veiculos v USING mapa_mesclagem m WHERE v.id = m.id_antigo;")
+            incrementar_versao(cursor, CHAVE_PATIO)
+
+        # 5. Médias de KM dos mantidos, já com o histórico completo, na mesma transação
+        recalcular_medias_veiculos(conn, {m for _, m in pares}, commit=False)
+        conn.commit()
+        return True, {'pares': len(pares), 'linhas_movidas': linhas_movidas}
+    except Exception as e:
+        conn.rollback()
+        return False, f"Ocorreu um erro crítico durante a mesclagem: {e}"
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import get_script_connection
+
+    parser = argparse.ArgumentParser(description="Lista (e opcionalmente mescla) cadastros duplicados de veículos.")
+    parser.add_argument("--aplicar", action="store_true", help="mescla os pares de confiança alta após confirmação")
+    args = parser.parse_args()
+
+    conexao = get_script_connection()
+    if conexao:
+        try:
+            df = detectar_candidatos(conexao)
+            if df.empty:
+                print("Nenhum cadastro duplicado encontrado.")
+            else:
+                print(df[['motivo', 'placa_remover', 'placa_manter', 'visitas_remover', 'visitas_manter',
+                          'mesmo_cliente', 'sobreposicao', 'conflitos_km', 'confianca']].to_string(index=False))
+                alta = df[df['confianca'] == 'alta']
+                if args.aplicar and not alta.empty:
+                    if input(f"\nMesclar os {len(alta)} pares de confiança alta? (s/N) ").strip().lower() == 's':
+                        print(mesclar_em_lote(conexao, list(zip(alta['id_remover'], alta['id_manter']))))
+        finally:
+            conexao.close()
@@ -0,0 +1,55 @@
+-- sem-transacao
+--
+-- Índices para os filtros das consultas mais frequentes do app. Todos com
+-- CONCURRENTLY: o pátio continua gravando enquanto os índices são criados.
+-- Se a criação for interrompida, o índice fica inválido; migrar_banco.py
+-- remove os inválidos desta migração antes de tentar de novo.
+
+-- Relatórios, serviços concluídos, feedback, snapshot analítico e previsão
+-- de ETA: execuções finalizadas por período de conclusão.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS execucao_servico_finalizadas_fim_idx
+    ON execucao_servico (fim_execucao) WHERE status = 'finalizado';
+
+-- Histórico do veículo, alocação (veículo já em atendimento?), reversão de visita.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS execucao_servico_veiculo_status_idx
+    ON execucao_servico (veiculo_id, status);
+
+-- Snapshot do pátio: execução em andamento de cada box.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS execucao_servico_andamento_box_idx
+    ON execucao_servico (box_id) WHERE status = 'em_andamento';
+
+-- Serviços das três áreas: por veículo (cadastro, alocação, pendentes na
+-- finalização), por execução (toda junção com execucao_servico, retirada do
+-- box) e a fila aberta por ordem de chegada (snapshot do pátio).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_borracharia_veiculo_status_idx
+    ON servicos_solicitados_borracharia (veiculo_id, status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_borracharia_execucao_idx
+    ON servicos_solicitados_borracharia (execucao_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_borracharia_abertos_idx
+    ON servicos_solicitados_borracharia (status, data_solicitacao) WHERE status IN ('pendente', 'em_andamento');
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_alinhamento_veiculo_status_idx
+    ON servicos_solicitados_alinhamento (veiculo_id, status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_alinhamento_execucao_idx
+    ON servicos_solicitados_alinhamento (execucao_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_alinhamento_abertos_idx
+    ON servicos_solicitados_alinhamento (status, data_solicitacao) WHERE status IN ('pendente', 'em_andamento');
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_manutencao_veiculo_status_idx
+    ON servicos_solicitados_manutencao (veiculo_id, status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_manutencao_execucao_idx
+    ON servicos_solicitados_manutencao (execucao_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS servicos_solicitados_manutencao_abertos_idx
+    ON servicos_solicitados_manutencao (status, data_solicitacao) WHERE status IN ('pendente', 'em_andamento');
+
+-- Exportação de contatos: só os cadastros ainda não exportados (ou alterados
+-- depois da última exportação). O predicado é o mesmo da consulta em
+-- pages/exportar_contatos.py, então o índice parcial fica pequeno e é usado.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS clientes_exportacao_pendente_idx
+    ON clientes (id) WHERE data_ultima_exportacao IS NULL OR data_atualizacao_contato > data_ultima_exportacao;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS veiculos_exportacao_pendente_idx
+    ON veiculos (id) WHERE data_ultima_exportacao IS NULL OR data_atualizacao_contato > data_ultima_exportacao;
+
+-- Veículos de um cliente (dados_clientes, mesclagem de veículos).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS veiculos_cliente_idx
+    ON veiculos (cliente_id);
@@ -0,0 +1,37 @@
+-- Arquivo das visitas antigas (arquivar_historico.py).
+--
+-- execucao_servico_arquivo: as visitas encerradas há mais de N anos, com as
+-- mesmas colunas de execucao_servico e os serviços da visita (das três
+-- áreas) numa coluna JSONB, um objeto por serviço com a área e as colunas
+-- originais. Uma linha por visita: as tabelas do pátio ficam só com o
+-- histórico recente.
+CREATE TABLE IF NOT EXISTS execucao_servico_arquivo (
+    LIKE execucao_servico,
+    servicos JSONB NOT NULL DEFAULT '[]',
+    arquivada_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+-- Histórico do veículo (carregado sob demanda) e recálculo do resumo.
+CREATE INDEX IF NOT EXISTS execucao_servico_arquivo_veiculo_idx
+    ON execucao_servico_arquivo (veiculo_id, fim_execucao);
+
+-- execucao_servico_arquivo_resumo: o que o app precisa das visitas
+-- arquivadas sem ler o arquivo. A média de KM/dia só depende da primeira e da
+-- última visita válidas pela regra monotônica (core_utils.visitas_validas_km),
+-- então as duas bastam para a média continuar a mesma; a última visita
+-- finalizada alimenta a revisão proativa dos veículos que não voltaram mais.
+CREATE TABLE IF NOT EXISTS execucao_servico_arquivo_resumo (
+    veiculo_id INT PRIMARY KEY,
+    visitas INT NOT NULL,
+    primeira_visita TIMESTAMPTZ,
+    ultima_visita TIMESTAMPTZ,
+    data_km_inicial TIMESTAMPTZ,
+    km_inicial INT,
+    data_km_final TIMESTAMPTZ,
+    km_final INT,
+    data_ultima_finalizada TIMESTAMPTZ,
+    km_ultima_finalizada INT,
+    servicos_ultima_finalizada TEXT,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
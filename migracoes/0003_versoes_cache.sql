@@ -0,0 +1,13 @@
+-- Contadores de versão dos dados em cache (controle_versao.py): toda escrita
+-- no pátio ou no cadastro de usuários incrementa a versão da sua chave na
+-- mesma transação, e quem lê só refaz as consultas quando a versão muda.
+--
+-- Bancos que já rodavam o app têm a tabela (era criada pelo próprio app na
+-- primeira escrita); aqui ela só passa a ser registrada como migração.
+CREATE TABLE IF NOT EXISTS versoes_cache (
+    chave TEXT PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO versoes_cache (chave) VALUES ('patio'), ('usuarios') ON CONFLICT DO NOTHING;
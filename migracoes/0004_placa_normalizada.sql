@@ -0,0 +1,23 @@
+-- veiculos.placa_normalizada: a placa só com letras e números, em
+-- maiúsculas, chave das buscas por placa (utils.buscar_veiculo_por_placa) e
+-- do histórico do veículo. Uma trigger a mantém em todo INSERT/UPDATE de placa.
+--
+-- Roda numa transação: coluna, trigger e preenchimento entram juntos, então
+-- nada escrito durante a migração fica sem a placa normalizada. O UPDATE
+-- trava as linhas de veiculos até o commit (segundos, no tamanho do cadastro).
+ALTER TABLE veiculos ADD COLUMN IF NOT EXISTS placa_normalizada TEXT;
+
+CREATE OR REPLACE FUNCTION veiculos_normalizar_placa() RETURNS trigger AS $$
+BEGIN
+    NEW.placa_normalizada := upper(regexp_replace(coalesce(NEW.placa, ''), '[^A-Za-z0-9]', '', 'g'));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_veiculos_placa_normalizada ON veiculos;
+CREATE TRIGGER trg_veiculos_placa_normalizada
+    BEFORE INSERT OR UPDATE OF placa ON veiculos
+    FOR EACH ROW EXECUTE FUNCTION veiculos_normalizar_placa();
+
+UPDATE veiculos SET placa_normalizada = upper(regexp_replace(coalesce(placa, ''), '[^A-Za-z0-9]', '', 'g'))
+WHERE placa_normalizada IS DISTINCT FROM upper(regexp_replace(coalesce(placa, ''), '[^A-Za-z0-9]', '', 'g'));
@@ -0,0 +1,13 @@
+-- sem-transacao
+--
+-- Índice único de veiculos.placa_normalizada (busca por placa, histórico do
+-- veículo e a mensagem de placa já cadastrada em cadastro_veiculo), criado
+-- com CONCURRENTLY para o cadastro continuar aceitando escritas.
+--
+-- Se houver o mesmo veículo cadastrado com a placa em formatos diferentes, a
+-- criação falha com "could not create unique index ... is duplicated" e a
+-- migração fica pendente: mescle os cadastros (página Mesclar Histórico ou
+-- python mesclagem_veiculos.py) e rode python migrar_banco.py de novo; o
+-- índice inválido que sobrou é removido antes da nova tentativa.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS veiculos_placa_normalizada_key
+    ON veiculos (placa_normalizada);
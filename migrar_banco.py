@@ -0,0 +1,192 @@
+# migrar_banco.py
+#
+# Aplica as migrações versionadas da pasta migracoes/ (NNNN_descricao.sql),
+# em ordem, registrando cada uma na tabela schema_migrations. Rodar de novo só
+# aplica as que faltam.
+#
+# Cada arquivo roda numa transação, junto com o seu registro. Um arquivo que
+# começa com a linha "-- sem-transacao" (necessário para CREATE INDEX
+# CONCURRENTLY) roda em autocommit, um comando por vez; os comandos devem ser
+# idempotentes (IF NOT EXISTS), porque se a migração parar no meio ela é
+# executada inteira de novo na próxima vez. Antes disso, os índices inválidos
+# deixados por um CONCURRENTLY interrompido, com nome citado no arquivo, são
+# removidos.
+#
+# É o único caminho de alteração do esquema: o app e os scripts não criam
+# tabelas, colunas nem índices por conta própria (gerar_dados_sinteticos.py só
+# cria o esquema base, anterior à primeira migração, e depois chama migrar).
+#
+# Uma migração já aplicada não deve ser editada: se o conteúdo mudou, o
+# script avisa (o checksum gravado não bate) e não a executa de novo.
+#
+# Uso: python migrar_banco.py [--status] [--ate 0003]
+
+import argparse
+import hashlib
+import os
+import re
+import time
+
+from database import get_script_connection
+
+PASTA_MIGRACOES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migracoes")
+MARCA_SEM_TRANSACAO = "-- sem-transacao"
+
+SQL_TABELA = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        versao TEXT PRIMARY KEY,
+        nome TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        aplicada_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        duracao_ms INT
+    );
+"""
+
+SQL_INDICES_INVALIDOS = """
+    SELECT c.relname
+    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE NOT i.indisvalid
+"""
+
+_RE_ARQUIVO = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+class Migracao:
+    def __init__(self, caminho):
+        arquivo = os.path.basename(caminho)
+        self.versao, self.nome = _RE_ARQUIVO.match(arquivo).groups()
+        with open(caminho, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()[:16]
+        self.transacional = not self.sql.lstrip().startswith(MARCA_SEM_TRANSACAO)
+
+    def comandos(self):
+        """Comandos do arquivo, sem comentários, separados por ';' no fim da linha."""
+        linhas = [linha for linha in self.sql.splitlines() if not linha.lstrip().startswith("--")]
+        return [c.strip() for c in re.split(r";\s*$", "\n".join(linhas), flags=re.M) if c.strip()]
+
+    def __repr__(self):
+        return f"{self.versao}_{self.nome}"
+
+
+def listar_migracoes(pasta=PASTA_MIGRACOES):
+    arquivos = sorted(a for a in os.listdir(pasta) if _RE_ARQUIVO.match(a))
+    return [Migracao(os.path.join(pasta, a)) for a in arquivos]
+
+
+def migracoes_aplicadas(conn, somente_leitura=False):
+    """
+    {versao: checksum} das migrações já registradas no banco. Cria a tabela
+    schema_migrations se ainda não existe; com 'somente_leitura' não escreve
+    nada e, sem a tabela, trata todas como pendentes.
+    """
+    with conn.cursor() as cursor:
+        if somente_leitura:
+            cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+            existe = cursor.fetchone()[0]
+        else:
+            cursor.execute(SQL_TABELA)
+            existe = True
+        aplicadas = {}
+        if existe:
+            cursor.execute("SELECT versao, checksum FROM schema_migrations")
+            aplicadas = dict(cursor.fetchall())
+    if somente_leitura:
+        conn.rollback()
+    else:
+        conn.commit()
+    return aplicadas
+
+
+def _remover_indices_invalidos(conn, migracao):
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_INDICES_INVALIDOS)
+        invalidos = [nome for (nome,) in cursor.fetchall() if re.search(rf"\b{re.escape(nome)}\b", migracao.sql)]
+        for nome in invalidos:
+            print(f"  removendo índice inválido {nome} (criação interrompida antes)")
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{nome}"')
+
+
+def aplicar(conn, migracao):
+    inicio = time.perf_counter()
+    registro = "INSERT INTO schema_migrations (versao, nome, checksum, duracao_ms) VALUES (%s, %s, %s, %s)"
+    if migracao.transacional:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(migracao.sql)
+                cursor.execute(registro, (migracao.versao, migracao.nome, migracao.checksum,
+                                          int((time.perf_counter() - inicio) * 1000)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return time.perf_counter() - inicio
+
+    conn.autocommit = True
+    try:
+        _remover_indices_invalidos(conn, migracao)
+        with conn.cursor() as cursor:
+            for comando in migracao.comandos():
+                cursor.execute(comando)
+            cursor.execute(registro, (migracao.versao, migracao.nome, migracao.checksum,
+                                      int((time.perf_counter() - inicio) * 1000)))
+    finally:
+        conn.autocommit = False
+    return time.perf_counter() - inicio
+
+
+def migrar(conn, ate=None, verbose=True, sem_indices=False):
+    """
+    Aplica as migrações pendentes (até a versão 'ate', se informada). Com
+    'sem_indices' pula as sem transação (os índices CONCURRENTLY), que ficam
+    pendentes. Retorna as aplicadas.
+    """
+    aplicadas = migracoes_aplicadas(conn)
+    feitas = []
+    for migracao in listar_migracoes():
+        if ate and migracao.versao > ate:
+            break
+        if sem_indices and not migracao.transacional:
+            continue
+        if migracao.versao in aplicadas:
+            if aplicadas[migracao.versao] != migracao.checksum and verbose:
+                print(f"AVISO: {migracao} foi alterada depois de aplicada (checksum diferente); não será reaplicada.")
+            continue
+        if verbose:
+            print(f"Aplicando {migracao}{'' if migracao.transacional else ' (sem transação)'}...")
+        duracao = aplicar(conn, migracao)
+        feitas.append(migracao)
+        if verbose:
+            print(f"  ok em {duracao:.1f}s")
+    return feitas
+
+
+def mostrar_status(conn):
+    aplicadas = migracoes_aplicadas(conn, somente_leitura=True)
+    for migracao in listar_migracoes():
+        if migracao.versao not in aplicadas:
+            situacao = "PENDENTE"
+        elif aplicadas[migracao.versao] != migracao.checksum:
+            situacao = "aplicada (arquivo alterado depois!)"
+        else:
+            situacao = "aplicada"
+        print(f"  {migracao}: {situacao}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aplica as migrações da pasta migracoes/.")
+    parser.add_argument("--status", action="store_true", help="só lista as migrações e se já foram aplicadas")
+    parser.add_argument("--ate", help="aplica só até esta versão (ex.: 0001)")
+    args = parser.parse_args()
+
+    conn = get_script_connection()
+    if not conn:
+        raise SystemExit(1)
+    try:
+        if args.status:
+            mostrar_status(conn)
+        else:
+            feitas = migrar(conn, args.ate)
+            print(f"{len(feitas)} migração(ões) aplicada(s)." if feitas else "Banco já está na última versão.")
+    finally:
+        conn.close()
@@ -0,0 +1,203 @@
+# motor_relatorios.py
+#
+# Fontes de dados dos relatórios, todas com a mesma assinatura (início, fim):
+#   dados_relatorio_postgres   consulta direta ao banco (o padrão)
+#   dados_relatorio_duckdb     SQL vetorizado (DuckDB) sobre o snapshot em Parquet
+#                              de snapshot_analitico.py; só abre as partições do período
+# e as agregações que ficam pesadas em períodos longos (duração por tipo,
+# produtividade por box/mecânico/empresa e recorrência), calculadas no DuckDB.
+#
+# O DuckDB é opcional: sem ele, o snapshot é lido com pandas
+# (snapshot_analitico.dados_relatorio_snapshot) e as agregações não ficam disponíveis.
+#
+# Uso: python motor_relatorios.py [--inicio AAAA-MM-DD] [--fim AAAA-MM-DD] [--pasta snapshots]
+#      compara o tempo das três fontes no mesmo período.
+
+import glob
+import os
+from datetime import timedelta
+
+import pandas as pd
+from snapshot_analitico import PASTA_SNAPSHOT
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+DUCKDB_DISPONIVEL = duckdb is not None
+DIAS_RETORNO = 30          # volta ao pátio dentro desse prazo conta como retorno
+
+QUERY_RELATORIO = """
+    SELECT
+        es.quilometragem, es.inicio_execucao, es.fim_execucao,
+        EXTRACT(EPOCH FROM (es.fim_execucao - es.inicio_execucao)) / 60 AS duracao_minutos,
+        es.box_id, v.placa, v.empresa,
+        serv.tipo as tipo_servico,
+        func.nome as funcionario_nome,
+        usr_aloc.nome as alocado_por,
+        usr_final.nome as finalizado_por
+    FROM {execucoes} es
+    JOIN {veiculos} v ON es.veiculo_id = v.id
+    LEFT JOIN {servicos} serv ON es.id = serv.execucao_id
+    LEFT JOIN {funcionarios} func ON serv.funcionario_id = func.id
+    LEFT JOIN {usuarios} usr_aloc ON es.usuario_alocacao_id = usr_aloc.id
+    LEFT JOIN {usuarios} usr_final ON es.usuario_finalizacao_id = usr_final.id
+    WHERE
+        es.status = 'finalizado'
+        AND {filtro_periodo}
+"""
+
+# Os serviços são buscados só para as execuções do período (pelo índice de
+# execucao_id), em vez de ler o histórico inteiro.
+EXECUCOES_PERIODO_POSTGRES = """
+            SELECT id FROM execucao_servico
+             WHERE status = 'finalizado' AND fim_execucao BETWEEN %(inicio)s AND %(fim)s"""
+
+SERVICOS_POSTGRES = f"""(
+        SELECT execucao_id, tipo, funcionario_id FROM servicos_solicitados_borracharia
+         WHERE execucao_id IN ({EXECUCOES_PERIODO_POSTGRES})
+        UNION ALL
+        SELECT execucao_id, tipo, funcionario_id FROM servicos_solicitados_alinhamento
+         WHERE execucao_id IN ({EXECUCOES_PERIODO_POSTGRES})
+        UNION ALL
+        SELECT execucao_id, tipo, funcionario_id FROM servicos_solicitados_manutencao
+         WHERE execucao_id IN ({EXECUCOES_PERIODO_POSTGRES})
+    )"""
+
+# Agregações sobre a view 'base' (uma linha por serviço, como dados_relatorio)
+QUERIES_AGREGACAO = {
+    "duracao_por_tipo": """
+        SELECT tipo_servico, COUNT(*) AS servicos,
+               ROUND(AVG(duracao_minutos), 1) AS media_min,
+               ROUND(MEDIAN(duracao_minutos), 1) AS mediana_min,
+               ROUND(QUANTILE_CONT(duracao_minutos, 0.9), 1) AS p90_min
+        FROM base WHERE tipo_servico IS NOT NULL
+        GROUP BY tipo_servico ORDER BY servicos DESC
+    """,
+    "produtividade": """
+        SELECT {grupo} AS grupo, COUNT(DISTINCT execucao_id) AS execucoes, COUNT(tipo_servico) AS servicos,
+               ROUND(SUM(duracao_minutos) FILTER (WHERE primeiro_da_execucao) / 60, 1) AS horas,
+               ROUND(AVG(duracao_minutos) FILTER (WHERE primeiro_da_execucao), 1) AS media_execucao_min
+        FROM base
+        GROUP BY {grupo} ORDER BY execucoes DESC
+    """,
+    "recorrencia": f"""
+        WITH visitas AS (
+            SELECT DISTINCT execucao_id, veiculo_id, placa, empresa, fim_execucao FROM base
+        ), intervalos AS (
+            SELECT *, date_diff('day', LAG(fim_execucao) OVER (PARTITION BY veiculo_id ORDER BY fim_execucao),
+                                fim_execucao) AS dias_desde_anterior
+            FROM visitas
+        )
+        SELECT placa, empresa, COUNT(*) AS visitas,
+               COUNT(*) FILTER (WHERE dias_desde_anterior <= {DIAS_RETORNO}) AS retornos_{DIAS_RETORNO}_dias,
+               ROUND(AVG(dias_desde_anterior), 1) AS intervalo_medio_dias
+        FROM intervalos
+        GROUP BY veiculo_id, placa, empresa
+        HAVING COUNT(*) > 1
+        ORDER BY retornos_{DIAS_RETORNO}_dias DESC, visitas DESC
+    """,
+}
+
+GRUPOS_PRODUTIVIDADE = {"box": "box_id", "funcionario": "funcionario_nome", "empresa": "empresa"}
+
+
+QUERY_RELATORIO_POSTGRES = QUERY_RELATORIO.format(
+    execucoes="execucao_servico", veiculos="veiculos", servicos=SERVICOS_POSTGRES,
+    funcionarios="funcionarios", usuarios="usuarios",
+    filtro_periodo="es.fim_execucao BETWEEN %(inicio)s AND %(fim)s",
+)
+
+
+def dados_relatorio_postgres(conn, start_date, end_date):
+    """Uma linha por serviço finalizado no período, com a duração da execução, direto do banco."""
+    return pd.read_sql(QUERY_RELATORIO_POSTGRES, conn, params={"inicio": start_date, "fim": end_date + timedelta(days=1)})
+
+
+def _ler_parquet(pasta, tabela):
+    """Expressão DuckDB que lê uma tabela do snapshot (particionada ou não)."""
+    caminho = os.path.join(pasta, tabela)
+    if os.path.isdir(caminho):
+        return f"read_parquet('{caminho}/*/*.parquet', hive_partitioning = true, union_by_name = true)"
+    return f"read_parquet('{caminho}.parquet')"
+
+
+def _conectar(pasta, start_date, end_date):
+    """
+    Conexão DuckDB em memória com a view 'base' do período. O filtro pela
+    coluna de partição 'data' faz o DuckDB abrir só os arquivos desses dias.
+    """
+    conexao = duckdb.connect()
+    periodo = f"data BETWEEN DATE '{start_date.isoformat()}' AND DATE '{end_date.isoformat()}'"
+    conexao.execute(f"CREATE VIEW execucoes AS SELECT * FROM {_ler_parquet(pasta, 'execucao_servico')} WHERE {periodo}")
+    conexao.execute(f"CREATE VIEW servicos AS SELECT * FROM {_ler_parquet(pasta, 'servicos')} WHERE {periodo}")
+    for tabela in ("veiculos", "funcionarios", "usuarios"):
+        conexao.execute(f"CREATE VIEW {tabela} AS SELECT * FROM {_ler_parquet(pasta, tabela)}")
+    conexao.execute("CREATE VIEW base AS " + QUERY_RELATORIO.replace(
+        "SELECT\n", "SELECT\n        es.id AS execucao_id, es.veiculo_id,\n"
+                    "        ROW_NUMBER() OVER (PARTITION BY es.id) = 1 AS primeiro_da_execucao,\n", 1
+    ).format(execucoes="execucoes", veiculos="veiculos", servicos="servicos",
+             funcionarios="funcionarios", usuarios="usuarios", filtro_periodo="TRUE"))
+    return conexao
+
+
+def _snapshot_vazio(pasta, start_date, end_date):
+    dias = glob.glob(os.path.join(pasta, "execucao_servico", "data=*"))
+    return not any(start_date.isoformat() <= os.path.basename(d)[5:] <= end_date.isoformat() for d in dias)
+
+
+def dados_relatorio_duckdb(start_date, end_date, pasta=PASTA_SNAPSHOT):
+    """Mesmo resultado de dados_relatorio_postgres, calculado pelo DuckDB sobre o snapshot."""
+    if _snapshot_vazio(pasta, start_date, end_date):
+        return pd.DataFrame()
+    with _conectar(pasta, start_date, end_date) as conexao:
+        return conexao.execute(
+            "SELECT * EXCLUDE (execucao_id, veiculo_id, primeiro_da_execucao) FROM base"
+        ).df()
+
+
+def agregar(nome, start_date, end_date, pasta=PASTA_SNAPSHOT, por="box"):
+    """
+    Executa uma das QUERIES_AGREGACAO no período ('produtividade' é agrupada
+    por box, funcionario ou empresa, conforme 'por'). Retorna um DataFrame.
+    """
+    if _snapshot_vazio(pasta, start_date, end_date):
+        return pd.DataFrame()
+    query = QUERIES_AGREGACAO[nome].format(grupo=GRUPOS_PRODUTIVIDADE[por])
+    with _conectar(pasta, start_date, end_date) as conexao:
+        return conexao.execute(query).df()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from datetime import date
+    from database import get_script_connection
+    from snapshot_analitico import dados_relatorio_snapshot
+
+    parser = argparse.ArgumentParser(description="Compara o tempo das fontes de dados dos relatórios.")
+    parser.add_argument("--inicio", type=date.fromisoformat, default=date(2000, 1, 1))
+    parser.add_argument("--fim", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--pasta", default=PASTA_SNAPSHOT)
+    args = parser.parse_args()
+
+    def medir(nome, funcao):
+        inicio = time.perf_counter()
+        df = funcao()
+        print(f"  {nome:<22} {len(df):>9} linhas  {time.perf_counter() - inicio:7.3f}s")
+
+    print(f"Período {args.inicio} a {args.fim}:")
+    conexao = get_script_connection()
+    if conexao:
+        try:
+            medir("Postgres", lambda: dados_relatorio_postgres(conexao, args.inicio, args.fim))
+        finally:
+            conexao.close()
+    medir("Snapshot (pandas)", lambda: dados_relatorio_snapshot(args.inicio, args.fim, args.pasta))
+    if DUCKDB_DISPONIVEL:
+        medir("Snapshot (DuckDB)", lambda: dados_relatorio_duckdb(args.inicio, args.fim, args.pasta))
+        for nome in QUERIES_AGREGACAO:
+            medir(f"  {nome}", lambda: agregar(nome, args.inicio, args.fim, args.pasta))
+    else:
+        print("  DuckDB não instalado (pip install duckdb).")
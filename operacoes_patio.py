@@ -0,0 +1,345 @@
+# operacoes_patio.py
+
+from datetime import datetime
+import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+import pytz
+from controle_versao import CHAVE_PATIO, incrementar_versao
+
+MS_TZ = pytz.timezone('America/Campo_Grande')
+
+TABELAS_SERVICO = {
+    "borracharia": "servicos_solicitados_borracharia",
+    "alinhamento": "servicos_solicitados_alinhamento",
+    "manutencao": "servicos_solicitados_manutencao",
+}
+
+# Tempo máximo esperando o lock do veículo antes de desistir (outro operador
+# alocando o mesmo veículo). Melhor avisar rápido do que travar a tela.
+LOCK_TIMEOUT = '3s'
+
+# 1º comando: trava o veículo. Serializa alocações concorrentes do MESMO
+# veículo; o comando seguinte roda com um snapshot novo e já enxerga o que o
+# outro operador gravou.
+QUERY_TRAVA_VEICULO = """
+    SET LOCAL lock_timeout = %s;
+    SELECT id FROM veiculos WHERE id = %s FOR UPDATE;
+"""
+
+# 2º comando: reserva o box, cria a execução e move os serviços da área, tudo
+# de uma vez. O box é reservado com FOR UPDATE SKIP LOCKED: se outro operador
+# estiver com ele, não espera — a alocação volta como "box indisponível".
+QUERY_ALOCACAO = """
+    WITH box_livre AS (
+        SELECT id FROM boxes
+         WHERE ocupado = FALSE AND id > 0
+           AND (%(box_id)s::int IS NULL OR id = %(box_id)s::int)
+           AND NOT EXISTS (SELECT 1 FROM execucao_servico
+                            WHERE veiculo_id = %(veiculo_id)s AND status = 'em_andamento')
+         ORDER BY id
+         LIMIT 1
+         FOR UPDATE SKIP LOCKED
+    ), box_ocupado AS (
+        UPDATE boxes b SET ocupado = TRUE
+          FROM box_livre
+         WHERE b.id = box_livre.id
+        RETURNING b.id
+    ), nova_execucao AS (
+        INSERT INTO execucao_servico
+            (veiculo_id, box_id, funcionario_id, quilometragem, status, inicio_execucao,
+             usuario_alocacao_id, nome_motorista, contato_motorista)
+        SELECT v.id, box_ocupado.id, %(funcionario_id)s, %(quilometragem)s, 'em_andamento', %(agora)s,
+               %(usuario_id)s, v.nome_motorista, v.contato_motorista
+          FROM box_ocupado
+          JOIN veiculos v ON v.id = %(veiculo_id)s
+        RETURNING id, box_id
+    ), servicos AS (
+        UPDATE {tabela} s
+           SET box_id = ne.box_id, funcionario_id = %(funcionario_id)s, status = 'em_andamento',
+               data_atualizacao = %(agora)s, execucao_id = ne.id
+          FROM nova_execucao ne
+         WHERE s.veiculo_id = %(veiculo_id)s AND s.status = 'pendente'
+        RETURNING s.id
+    )
+    SELECT (SELECT id FROM nova_execucao),
+           (SELECT box_id FROM nova_execucao),
+           (SELECT COUNT(*) FROM servicos);
+"""
+
+
+def alocar_servico(conn, veiculo_id, area, funcionario_id, quilometragem,
+                   box_id=None, usuario_id=None):
+    """
+    Aloca os serviços pendentes de uma área do veículo em um box, de forma
+    atômica e segura contra alocações simultâneas.
+
+    Com box_id=None reserva o primeiro box livre. Faz commit em caso de
+    sucesso e rollback em caso de falha.
+    Retorna (True, (execucao_id, box_id)) ou (False, mensagem).
+    """
+    tabela = TABELAS_SERVICO.get(area)
+    if not tabela:
+        return False, f"Área de serviço inválida: {area}"
+
+    params = {
+        "veiculo_id": int(veiculo_id),
+        "funcionario_id": int(funcionario_id),
+        "quilometragem": quilometragem,
+        "box_id": int(box_id) if box_id is not None else None,
+        "usuario_id": usuario_id,
+        "agora": datetime.now(MS_TZ),
+    }
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(QUERY_TRAVA_VEICULO, (LOCK_TIMEOUT, params["veiculo_id"]))
+            if cursor.fetchone() is None:
+                conn.rollback()
+                return False, "Veículo não encontrado."
+
+            cursor.execute(QUERY_ALOCACAO.format(tabela=tabela), params)
+            execucao_id, box_alocado, qtd_servicos = cursor.fetchone()
+
+            if execucao_id is None:
+                conn.rollback()
+                if box_id is not None:
+                    return False, f"O Box {box_id} acabou de ser ocupado ou o veículo já está em atendimento."
+                return False, "Nenhum box livre no momento ou o veículo já está em atendimento."
+            if qtd_servicos == 0:
+                conn.rollback()
+                return False, "Os serviços desta área já foram alocados por outro operador."
+
+            incrementar_versao(cursor, CHAVE_PATIO)
+        conn.commit()
+        return True, (execucao_id, box_alocado)
+    except psycopg2.errors.LockNotAvailable:
+        conn.rollback()
+        return False, "Outro operador está alocando este veículo agora. Tente novamente."
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro ao alocar serviços: {e}"
+
+
+# Cadastro de todos os serviços de um veículo em um único comando: os itens vão
+# numa lista VALUES (execute_values) e cada área é um INSERT ... SELECT dentro
+# de uma CTE. Os dados do veículo repetem em cada linha porque execute_values
+# só aceita o placeholder da lista; o template tipa as colunas para que valores
+# nulos (quilometragem, observação) não virem texto.
+QUERY_CADASTRO = """
+    WITH itens (area, tipo, quantidade, veiculo_id, observacao, quilometragem, agora) AS (
+        VALUES %s
+    ), borracharia AS (
+        INSERT INTO servicos_solicitados_borracharia
+            (veiculo_id, tipo, quantidade, observacao, quilometragem, status, data_solicitacao, data_atualizacao)
+        SELECT veiculo_id, tipo, quantidade, observacao, quilometragem, 'pendente', agora, agora
+          FROM itens WHERE area = 'borracharia'
+        RETURNING id
+    ), alinhamento AS (
+        INSERT INTO servicos_solicitados_alinhamento
+            (veiculo_id, tipo, quantidade, observacao, quilometragem, status, data_solicitacao, data_atualizacao)
+        SELECT veiculo_id, tipo, quantidade, observacao, quilometragem, 'pendente', agora, agora
+          FROM itens WHERE area = 'alinhamento'
+        RETURNING id
+    ), manutencao AS (
+        INSERT INTO servicos_solicitados_manutencao
+            (veiculo_id, tipo, quantidade, observacao, quilometragem, status, data_solicitacao, data_atualizacao)
+        SELECT veiculo_id, tipo, quantidade, observacao, quilometragem, 'pendente', agora, agora
+          FROM itens WHERE area = 'manutencao'
+        RETURNING id
+    ), veiculo AS (
+        UPDATE veiculos SET data_revisao_proativa = NULL
+         WHERE id = (SELECT veiculo_id FROM itens LIMIT 1)
+    )
+    SELECT 'borracharia', id FROM borracharia UNION ALL
+    SELECT 'alinhamento', id FROM alinhamento UNION ALL
+    SELECT 'manutencao', id FROM manutencao;
+"""
+
+
+def validar_servicos(itens, catalogo):
+    """
+    Confere cada item {area, tipo, qtd} contra o catálogo de serviços
+    (utils.get_catalogo_servicos). Retorna a lista de erros; vazia se tudo ok.
+    """
+    erros = []
+    for item in itens:
+        area, tipo, qtd = item.get('area'), item.get('tipo'), item.get('qtd')
+        if area not in TABELAS_SERVICO:
+            erros.append(f"Área de serviço inválida: {area}")
+        elif tipo not in catalogo.get(area, []):
+            erros.append(f"'{tipo}' não está no catálogo de {area}.")
+        if not isinstance(qtd, int) or qtd < 1:
+            erros.append(f"Quantidade inválida para '{tipo}': {qtd}")
+    return erros
+
+
+def registrar_servicos(conn, veiculo_id, itens, quilometragem, observacao, catalogo):
+    """
+    Cadastra os serviços pendentes de um veículo numa única transação e num
+    único comando, qualquer que seja o número de itens.
+
+    itens: lista de {area: 'borracharia'|'alinhamento'|'manutencao', tipo, qtd}
+    Faz commit em caso de sucesso e rollback em caso de falha.
+    Retorna (True, {area: [ids]}) ou (False, mensagem).
+    """
+    if not itens:
+        return False, "Nenhum serviço informado."
+    erros = validar_servicos(itens, catalogo)
+    if erros:
+        return False, " ".join(erros)
+
+    agora = datetime.now(MS_TZ)
+    linhas = [(i['area'], i['tipo'], i['qtd'], int(veiculo_id), observacao, quilometragem, agora) for i in itens]
+    try:
+        with conn.cursor() as cursor:
+            inseridos = psycopg2.extras.execute_values(
+                cursor, QUERY_CADASTRO, linhas, page_size=len(linhas), fetch=True,
+                template="(%s::text, %s::text, %s::int, %s::int, %s::text, %s::int, %s::timestamptz)"
+            )
+            incrementar_versao(cursor, CHAVE_PATIO)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro ao cadastrar serviços: {e}"
+
+    ids_por_area = {}
+    for area, servico_id in inseridos:
+        ids_por_area.setdefault(area, []).append(servico_id)
+    return True, ids_por_area
+
+
+# Trava a execução que está no box. Finalização, retirada e serviço extra
+# sobre a mesma execução passam a ser uma de cada vez, e quem chega depois
+# (com a tela desatualizada) não encontra mais a execução em andamento — em vez
+# de liberar o box de outra execução que já foi alocada ali.
+QUERY_TRAVA_EXECUCAO = """
+    SELECT id FROM execucao_servico WHERE id = %s AND status = 'em_andamento' FOR UPDATE
+"""
+
+MSG_EXECUCAO_ENCERRADA = "Esta execução já foi finalizada ou retirada do box por outro operador."
+
+
+def adicionar_servico(conn, box_id, execucao_id, area, tipo, quantidade):
+    """
+    Acrescenta um serviço extra, já em andamento, à execução que está no box.
+    Faz commit em caso de sucesso e rollback em caso de falha.
+    Retorna (True, id do serviço) ou (False, mensagem).
+    """
+    tabela = TABELAS_SERVICO.get(area)
+    if not tabela:
+        return False, f"Área de serviço inválida: {area}"
+    try:
+        with conn.cursor() as cursor:
+            agora = datetime.now(MS_TZ)
+            cursor.execute(f"""
+                INSERT INTO {tabela}
+                    (veiculo_id, tipo, quantidade, status, box_id, execucao_id,
+                     data_solicitacao, data_atualizacao, quilometragem)
+                SELECT veiculo_id, %s, %s, 'em_andamento', %s, id, %s, %s, quilometragem
+                  FROM execucao_servico WHERE id = %s AND status = 'em_andamento'
+                   FOR UPDATE
+                RETURNING id
+            """, (tipo, quantidade, box_id, agora, agora, execucao_id))
+            linha = cursor.fetchone()
+            if linha is None:
+                conn.rollback()
+                return False, MSG_EXECUCAO_ENCERRADA
+            incrementar_versao(cursor, CHAVE_PATIO)
+        conn.commit()
+        return True, linha[0]
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro ao adicionar serviço: {e}"
+
+
+def desalocar_execucao(conn, box_id, execucao_id):
+    """
+    Retira a execução do box: os serviços voltam para a fila (pendente), a
+    execução é apagada e o box fica livre.
+    Retorna (True, None) ou (False, mensagem).
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(QUERY_TRAVA_EXECUCAO, (execucao_id,))
+            if cursor.fetchone() is None:
+                conn.rollback()
+                return False, MSG_EXECUCAO_ENCERRADA
+            agora = datetime.now(MS_TZ)
+            for tabela in TABELAS_SERVICO.values():
+                cursor.execute(
+                    f"""UPDATE {tabela}
+                           SET status = 'pendente', box_id = NULL, funcionario_id = NULL,
+                               execucao_id = NULL, data_atualizacao = %s
+                         WHERE execucao_id = %s""",
+                    (agora, execucao_id)
+                )
+            cursor.execute("DELETE FROM execucao_servico WHERE id = %s", (execucao_id,))
+            cursor.execute("UPDATE boxes SET ocupado = FALSE WHERE id = %s", (box_id,))
+            incrementar_versao(cursor, CHAVE_PATIO)
+        conn.commit()
+        return True, None
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro ao retirar bloco do box: {e}"
+
+
+QUERY_DADOS_FINALIZACAO = """
+    SELECT es.veiculo_id, es.quilometragem, es.nome_motorista,
+           v.placa, v.empresa, f.nome as funcionario_nome
+    FROM execucao_servico es
+    JOIN veiculos v ON es.veiculo_id = v.id
+    LEFT JOIN funcionarios f ON es.funcionario_id = f.id
+    WHERE es.id = %s
+"""
+
+QUERY_PENDENTES_VEICULO = """
+    SELECT COUNT(*) FROM (
+        SELECT 1 FROM servicos_solicitados_borracharia WHERE veiculo_id = %(veiculo_id)s AND status = 'pendente' UNION ALL
+        SELECT 1 FROM servicos_solicitados_alinhamento WHERE veiculo_id = %(veiculo_id)s AND status = 'pendente' UNION ALL
+        SELECT 1 FROM servicos_solicitados_manutencao WHERE veiculo_id = %(veiculo_id)s AND status = 'pendente'
+    ) AS pendentes
+"""
+
+
+def concluir_execucao(conn, box_id, execucao_id, servicos, obs_final, usuario_id):
+    """
+    Finaliza a execução do box: grava quantidade executada, observação e
+    status de cada serviço, fecha a execução e libera o box, numa transação.
+
+    servicos: itens {area, db_id, qtd_executada} (o estado do box na tela)
+    Retorna (True, {'veiculo': dados para as notificações, 'pendentes_restantes': n})
+    ou (False, mensagem).
+    """
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            cursor.execute(QUERY_TRAVA_EXECUCAO, (execucao_id,))
+            if cursor.fetchone() is None:
+                conn.rollback()
+                return False, MSG_EXECUCAO_ENCERRADA
+            cursor.execute(QUERY_DADOS_FINALIZACAO, (execucao_id,))
+            veiculo = cursor.fetchone()
+            if veiculo is None:
+                conn.rollback()
+                return False, "Execução não encontrada."
+            cursor.execute(QUERY_PENDENTES_VEICULO, {"veiculo_id": veiculo['veiculo_id']})
+            pendentes_restantes = cursor.fetchone()[0]
+
+            agora = datetime.now(MS_TZ)
+            for servico in servicos:
+                cursor.execute(
+                    f"""UPDATE {TABELAS_SERVICO[servico['area']]}
+                           SET quantidade = %s, observacao_execucao = %s, status = 'finalizado', data_atualizacao = %s
+                         WHERE id = %s""",
+                    (servico['qtd_executada'], obs_final, agora, servico['db_id'])
+                )
+            cursor.execute(
+                "UPDATE execucao_servico SET status = 'finalizado', fim_execucao = %s, usuario_finalizacao_id = %s WHERE id = %s",
+                (agora, usuario_id, execucao_id)
+            )
+            cursor.execute("UPDATE boxes SET ocupado = FALSE WHERE id = %s", (box_id,))
+            incrementar_versao(cursor, CHAVE_PATIO)
+        conn.commit()
+        return True, {"veiculo": dict(veiculo), "pendentes_restantes": pendentes_restantes}
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
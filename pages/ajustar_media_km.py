@@ -2,8 +2,17 @@
 
 import streamlit as st
 import pandas as pd
+import psycopg2.extras
 from database import get_connection, release_connection
-from datetime import datetime
+from auth_utils import exigir_login
+from core_utils import calcular_medias_km, recalcular_medias_veiculos, visitas_validas_km
+
+def _aplicar_datas(visitas, datas):
+    """Troca o dia de cada visita mantendo o horário original de fim_execucao."""
+    return [
+        original if original.date() == data else original.replace(year=data.year, month=data.month, day=data.day)
+        for original, data in zip(visitas['fim_execucao'], datas)
+    ]
 
 def app():
     st.set_page_config(layout="centered")
@@ -21,81 +30,103 @@ def app():
         st.error("Falha ao conectar ao banco de dados.")
         st.stop()
 
-    # --- Lógica de Estado da Sessão ---
-    session_key = f"visitas_veiculo_{veiculo_id}"
-    if session_key not in st.session_state:
-        query = """
-            SELECT id, fim_execucao, quilometragem
-            FROM execucao_servico
-            WHERE veiculo_id = %s AND status = 'finalizado'
-                  AND quilometragem IS NOT NULL AND quilometragem > 0
-            ORDER BY fim_execucao ASC;
-        """
-        df_visitas = pd.read_sql(query, conn, params=(veiculo_id,))
-        df_visitas['fim_execucao'] = pd.to_datetime(df_visitas['fim_execucao']).dt.date
-        st.session_state[session_key] = df_visitas.to_dict('records')
-
-    # --- Exibe informações do Veículo ---
-    df_veiculo_info = pd.read_sql("SELECT placa, modelo FROM veiculos WHERE id = %s", conn, params=(veiculo_id,))
-    if not df_veiculo_info.empty:
-        placa = df_veiculo_info.iloc[0]['placa']
-        modelo = df_veiculo_info.iloc[0]['modelo']
-        st.header(f"Veículo: `{placa}` - {modelo}")
-    
-    st.markdown("---")
-    st.subheader("Histórico de Visitas Editável")
-    st.info("Altere as datas ou quilometragens abaixo. A nova média será calculada em tempo real.")
-
-    # --- Loop para renderizar os campos editáveis ---
-    visitas = st.session_state[session_key]
-    if len(visitas) < 2:
-        st.warning("São necessárias pelo menos duas visitas com KM válida para calcular a média.")
-        st.stop()
-        
-    for i, visita in enumerate(visitas):
-        cols = st.columns([0.5, 0.5])
-        # Converte a data do BD (que pode ser timestamp) para um objeto date
-        data_visita = visita['fim_execucao']
-        if not isinstance(data_visita, datetime):
-            data_visita = datetime.strptime(str(data_visita), '%Y-%m-%d').date()
-            
-        nova_data = cols[0].date_input("Data da Visita", value=data_visita, key=f"data_{visita['id']}")
-        novo_km = cols[1].number_input("Quilometragem", value=int(visita['quilometragem']), min_value=0, step=100, key=f"km_{visita['id']}")
-        
-        # Atualiza o estado da sessão se houver mudanças
-        st.session_state[session_key][i]['fim_execucao'] = nova_data
-        st.session_state[session_key][i]['quilometragem'] = novo_km
-
-    # --- Cálculo e Exibição da Média em Tempo Real ---
-    st.markdown("---")
-    st.subheader("Previsão da Nova Média")
-
-    visitas_calculo = sorted(st.session_state[session_key], key=lambda x: x['fim_execucao'])
-    
-    primeira_visita = visitas_calculo[0]
-    ultima_visita = visitas_calculo[-1]
-    
-    delta_km = ultima_visita['quilometragem'] - primeira_visita['quilometragem']
-    delta_dias = (ultima_visita['fim_execucao'] - primeira_visita['fim_execucao']).days
-
-    if delta_dias > 0 and delta_km >= 0:
-        nova_media = delta_km / delta_dias
-        st.metric("Nova Média Calculada", f"{nova_media:.2f} km/dia")
-
-        if st.button("💾 Salvar Média e Corrigir Histórico", type="primary", use_container_width=True):
+    try:
+        # --- Lógica de Estado da Sessão: guarda o histórico como veio do banco ---
+        session_key = f"visitas_veiculo_{veiculo_id}"
+        if session_key not in st.session_state:
+            query = """
+                SELECT id, fim_execucao, quilometragem
+                FROM execucao_servico
+                WHERE veiculo_id = %s AND status = 'finalizado'
+                      AND quilometragem IS NOT NULL AND quilometragem > 0
+                ORDER BY fim_execucao ASC, id;
+            """
+            df_visitas = pd.read_sql(query, conn, params=(veiculo_id,))
+            df_visitas['fim_execucao'] = pd.to_datetime(df_visitas['fim_execucao'])
+            st.session_state[session_key] = df_visitas
+        originais = st.session_state[session_key]
+
+        # Visitas arquivadas (arquivar_historico.py) entram na média só pelos extremos do resumo
+        arquivadas = pd.read_sql("""
+            SELECT 0 AS id, k.fim_execucao, k.quilometragem
+            FROM execucao_servico_arquivo_resumo r
+            CROSS JOIN LATERAL (VALUES (r.data_km_inicial, r.km_inicial),
+                                       (r.data_km_final, r.km_final)) AS k (fim_execucao, quilometragem)
+            WHERE r.veiculo_id = %s AND k.quilometragem IS NOT NULL;
+        """, conn, params=(veiculo_id,))
+        arquivadas['fim_execucao'] = pd.to_datetime(arquivadas['fim_execucao'])
+        arquivadas['veiculo_id'] = veiculo_id
+
+        # --- Exibe informações do Veículo ---
+        df_veiculo_info = pd.read_sql("SELECT placa, modelo FROM veiculos WHERE id = %s", conn, params=(veiculo_id,))
+        if not df_veiculo_info.empty:
+            placa = df_veiculo_info.iloc[0]['placa']
+            modelo = df_veiculo_info.iloc[0]['modelo']
+            st.header(f"Veículo: `{placa}` - {modelo}")
+
+        st.markdown("---")
+        st.subheader("Histórico de Visitas Editável")
+        st.info("Altere as datas ou quilometragens abaixo. A nova média será calculada em tempo real, "
+                "com a mesma regra usada ao salvar: visitas cuja KM não supera a anterior são ignoradas.")
+
+        if not arquivadas.empty:
+            st.caption(f"A média também considera as visitas arquivadas até "
+                       f"{arquivadas['fim_execucao'].max().strftime('%d/%m/%Y')}, que não podem ser editadas aqui.")
+
+        if len(originais) + len(arquivadas.drop_duplicates('quilometragem')) < 2:
+            st.warning("São necessárias pelo menos duas visitas com KM válida para calcular a média.")
+            st.stop()
+
+        editado = st.data_editor(
+            pd.DataFrame({'Data da Visita': originais['fim_execucao'].dt.date, 'Quilometragem': originais['quilometragem']}),
+            column_config={
+                'Data da Visita': st.column_config.DateColumn(format="DD/MM/YYYY", required=True),
+                'Quilometragem': st.column_config.NumberColumn(min_value=0, step=100, required=True),
+            },
+            hide_index=True, use_container_width=True, num_rows="fixed", key=f"editor_{veiculo_id}"
+        )
+
+        # --- Histórico como ficará depois de salvar (mesmas colunas de calcular_medias_km) ---
+        visitas = pd.DataFrame({
+            'id': originais['id'],
+            'veiculo_id': veiculo_id,
+            'fim_execucao': _aplicar_datas(originais, editado['Data da Visita']),
+            'quilometragem': editado['Quilometragem'].astype(int).values,
+        })
+        alteradas = visitas[(visitas['fim_execucao'] != originais['fim_execucao']) |
+                            (visitas['quilometragem'] != originais['quilometragem'])]
+
+        # --- Cálculo e Exibição da Média em Tempo Real ---
+        st.markdown("---")
+        st.subheader("Previsão da Nova Média")
+
+        consideradas = pd.concat([arquivadas[visitas.columns], visitas[visitas['quilometragem'] > 0]], ignore_index=True)
+        consideradas = consideradas.sort_values(['fim_execucao', 'id'], kind='stable')
+        nova_media = calcular_medias_km(consideradas).get(veiculo_id)
+        ignoradas = len(consideradas) - len(visitas_validas_km(consideradas))
+
+        if nova_media is None:
+            st.error("Não é possível calcular a média. Verifique se há pelo menos duas visitas válidas em dias diferentes.")
+        else:
+            st.metric("Nova Média Calculada", f"{nova_media:.2f} km/dia")
+        if ignoradas:
+            st.caption(f"{ignoradas} visita(s) ignorada(s) no cálculo por KM repetida ou menor que a de uma visita anterior.")
+
+        if st.button(f"💾 Salvar Média e Corrigir Histórico ({len(alteradas)} visita(s) alterada(s))",
+                     type="primary", use_container_width=True, disabled=nova_media is None):
             try:
                 with conn.cursor() as cursor:
-                    # 1. Atualiza o histórico de cada visita
-                    for v in st.session_state[session_key]:
-                        cursor.execute(
-                            "UPDATE execucao_servico SET fim_execucao = %s, quilometragem = %s WHERE id = %s",
-                            (v['fim_execucao'], v['quilometragem'], v['id'])
-                        )
-                    # 2. Atualiza a média final na tabela de veículos
-                    cursor.execute(
-                        "UPDATE veiculos SET media_km_diaria = %s WHERE id = %s",
-                        (nova_media, veiculo_id)
-                    )
+                    # 1. Atualiza só as visitas alteradas, todas num único comando
+                    if not alteradas.empty:
+                        psycopg2.extras.execute_values(cursor, """
+                            UPDATE execucao_servico es
+                            SET fim_execucao = v.fim_execucao, quilometragem = v.quilometragem
+                            FROM (VALUES %s) AS v (id, fim_execucao, quilometragem)
+                            WHERE es.id = v.id
+                        """, [(int(r.id), r.fim_execucao.to_pydatetime(), int(r.quilometragem)) for r in alteradas.itertuples()],
+                            template="(%s::int, %s::timestamptz, %s::int)", page_size=len(alteradas))
+                # 2. Recalcula a média a partir do banco, com a mesma função da prévia
+                recalcular_medias_veiculos(conn, [veiculo_id], commit=False)
                 conn.commit()
                 st.success("Média e histórico atualizados com sucesso!")
                 # Limpa o estado da sessão para forçar a recarga dos dados na próxima visita
@@ -103,13 +134,11 @@ def app():
             except Exception as e:
                 conn.rollback()
                 st.error(f"Erro ao salvar: {e}")
-
-    else:
-        st.error("Não é possível calcular a média. Verifique se as datas são diferentes e se a quilometragem é crescente.")
-
-    release_connection(conn)
+    finally:
+        release_connection(conn)
 
 
 # Garante que a função app() seja chamada ao rodar o script
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    exigir_login()
+    app()
@@ -1,90 +1,55 @@
 import streamlit as st
 import pandas as pd
 from pages.ui_components import render_mobile_navbar
-render_mobile_navbar(active_page="alocar")
+from auth_utils import exigir_login
 from database import get_connection, release_connection
-from datetime import datetime
-import pytz
-
-MS_TZ = pytz.timezone('America/Campo_Grande')
+from controle_versao import versao_alterada
+from estado_patio import get_snapshot_patio, veiculos_aguardando_alocacao, boxes_livres, servicos_do_veiculo
+from operacoes_patio import alocar_servico
+from agendador import MS_TZ, get_duracoes_historicas, sugestoes_para_patio
+from datetime import datetime, timedelta
 
 def alocar_servicos():
     st.title("🚚 Alocação de Serviços por Área")
     st.markdown("Selecione um veículo com serviços pendentes e aloque-o a um box e funcionário.")
     
     rerun_flag = False
-    conn = get_connection()
-    if not conn:
-        st.error("Falha ao conectar ao banco de dados.")
+    try:
+        # Boxes, fila e funcionários vêm do snapshot compartilhado do pátio;
+        # a conexão só é aberta no momento de gravar a alocação.
+        snapshot = get_snapshot_patio()
+    except Exception as e:
+        st.error(f"❌ Erro ao carregar dados da página: {e}")
+        st.exception(e)
         return
 
     try:
-        query_veiculos_pendentes = """
-            WITH status_por_veiculo AS (
-                SELECT
-                    veiculo_id,
-                    COUNT(*) FILTER (WHERE status = 'pendente') AS pendentes,
-                    COUNT(*) FILTER (WHERE status = 'em_andamento') AS em_andamento
-                FROM (
-                    SELECT veiculo_id, status FROM servicos_solicitados_borracharia WHERE status IN ('pendente', 'em_andamento')
-                    UNION ALL
-                    SELECT veiculo_id, status FROM servicos_solicitados_alinhamento WHERE status IN ('pendente', 'em_andamento')
-                    UNION ALL
-                    SELECT veiculo_id, status FROM servicos_solicitados_manutencao WHERE status IN ('pendente', 'em_andamento')
-                ) AS todos_servicos
-                GROUP BY veiculo_id
-            )
-            SELECT v.id, v.placa, v.empresa
-            FROM veiculos v
-            JOIN status_por_veiculo sv ON v.id = sv.veiculo_id
-            WHERE sv.pendentes > 0 AND sv.em_andamento = 0
-            ORDER BY v.placa;
-        """
-        veiculos_df = pd.read_sql(query_veiculos_pendentes, conn)
-        
-        # --- MUDANÇA: Adicionado "WHERE id > 0" para filtrar os registros de migração ---
-        funcionarios_df = pd.read_sql("SELECT id, nome FROM funcionarios WHERE id > 0 ORDER BY nome", conn)
-        boxes_df = pd.read_sql("SELECT id FROM boxes WHERE ocupado = FALSE AND id > 0 ORDER BY id", conn)
+        veiculos_df = veiculos_aguardando_alocacao(snapshot)
+        funcionarios_df = snapshot["funcionarios"]
 
         veiculo_options = [f"{row['id']} - {row['placa']} ({row['empresa']})" for _, row in veiculos_df.iterrows()]
         funcionario_options = [f"{row['id']} - {row['nome']}" for _, row in funcionarios_df.iterrows()]
-        box_options = [str(row['id']) for _, row in boxes_df.iterrows()]
+        box_options = [str(box_id) for box_id in boxes_livres(snapshot)]
 
         if not veiculo_options:
             st.info("🎉 Nenhum veículo aguardando alocação no momento.")
             return
 
+        rerun_flag = _sugestao_automatica(snapshot)
+
         selected_veiculo_display = st.selectbox("Selecione o Veículo para Alocar", veiculo_options, key="veiculo_select")
         
         if selected_veiculo_display:
             veiculo_id_int = int(selected_veiculo_display.split(" - ")[0])
-            query_areas_pendentes = """
-                SELECT 'borracharia' AS area FROM servicos_solicitados_borracharia WHERE veiculo_id = %s AND status = 'pendente' UNION
-                SELECT 'alinhamento' AS area FROM servicos_solicitados_alinhamento WHERE veiculo_id = %s AND status = 'pendente' UNION
-                SELECT 'manutencao' AS area FROM servicos_solicitados_manutencao WHERE veiculo_id = %s AND status = 'pendente';
-            """
-            areas_df = pd.read_sql(query_areas_pendentes, conn, params=(veiculo_id_int, veiculo_id_int, veiculo_id_int))
-            areas_com_servico_pendente = [a.replace('manutencao', 'Manutenção Mecânica').title() for a in areas_df['area'].tolist()]
+            pendentes_df = servicos_do_veiculo(snapshot, veiculo_id_int, 'pendente')
+            areas_com_servico_pendente = [a.replace('manutencao', 'Manutenção Mecânica').title() for a in pendentes_df['area'].drop_duplicates().tolist()]
 
             if not areas_com_servico_pendente:
                 st.warning("Este veículo não parece ter mais serviços pendentes.")
                 return
 
-            quilometragem_cadastrada = 0
-            try:
-                with conn.cursor() as cursor:
-                    query_km = """
-                        (SELECT quilometragem FROM servicos_solicitados_borracharia WHERE veiculo_id = %s AND status = 'pendente' AND quilometragem IS NOT NULL LIMIT 1) UNION
-                        (SELECT quilometragem FROM servicos_solicitados_alinhamento WHERE veiculo_id = %s AND status = 'pendente' AND quilometragem IS NOT NULL LIMIT 1) UNION
-                        (SELECT quilometragem FROM servicos_solicitados_manutencao WHERE veiculo_id = %s AND status = 'pendente' AND quilometragem IS NOT NULL LIMIT 1)
-                        LIMIT 1;
-                    """
-                    cursor.execute(query_km, (veiculo_id_int, veiculo_id_int, veiculo_id_int))
-                    resultado_km = cursor.fetchone()
-                    if resultado_km and resultado_km[0] is not None:
-                        quilometragem_cadastrada = resultado_km[0]
-            except Exception as e:
-                st.warning(f"Não foi possível buscar a KM do cadastro: {e}")
+            km_pendentes = pendentes_df['quilometragem'].dropna()
+            quilometragem_cadastrada = int(km_pendentes.iloc[0]) if not km_pendentes.empty else 0
             
             with st.form("form_alocacao"):
                 st.subheader(f"Alocar para: {selected_veiculo_display.split(' (')[0]}")
@@ -99,49 +64,91 @@ def alocar_servicos():
                     if not all([box_selecionado, funcionario_selecionado, area_selecionada_display]):
                         st.error("❌ Todos os campos são obrigatórios.")
                     else:
+                        conn = get_connection()
+                        if not conn:
+                            st.error("Falha ao conectar ao banco de dados.")
+                            return
                         try:
-                            with conn.cursor() as cursor:
-                                funcionario_id_int, box_id_int = int(funcionario_selecionado.split(" - ")[0]), int(box_selecionado)
-                                area_selecionada = area_selecionada_display.replace('Manutenção Mecânica', 'manutencao').lower()
-                                
-                                usuario_alocacao_id = st.session_state.get('user_id')
-
-                                cursor.execute(
-                                    "SELECT nome_motorista, contato_motorista FROM veiculos WHERE id = %s",
-                                    (veiculo_id_int,)
-                                )
-                                motorista_info = cursor.fetchone()
-                                nome_motorista_atual = motorista_info[0] if motorista_info else None
-                                contato_motorista_atual = motorista_info[1] if motorista_info else None
-
-                                insert_exec_query = """
-                                    INSERT INTO execucao_servico 
-                                    (veiculo_id, box_id, funcionario_id, quilometragem, status, inicio_execucao, usuario_alocacao_id, nome_motorista, contato_motorista) 
-                                    VALUES (%s, %s, %s, %s, 'em_andamento', %s, %s, %s, %s) RETURNING id
-                                """
-                                cursor.execute(insert_exec_query, (
-                                    veiculo_id_int, box_id_int, funcionario_id_int, 
-                                    quilometragem_cadastrada, datetime.now(MS_TZ), usuario_alocacao_id,
-                                    nome_motorista_atual, contato_motorista_atual
-                                ))
-                                execucao_id = cursor.fetchone()[0]
-
-                                tabela_servico = f"servicos_solicitados_{area_selecionada}"
-                                update_solicitado_query = f"UPDATE {tabela_servico} SET box_id = %s, funcionario_id = %s, status = 'em_andamento', data_atualizacao = %s, execucao_id = %s WHERE veiculo_id = %s AND status = 'pendente';"
-                                cursor.execute(update_solicitado_query, (box_id_int, funcionario_id_int, datetime.now(MS_TZ), execucao_id, veiculo_id_int))
-                                
-                                cursor.execute("UPDATE boxes SET ocupado = TRUE WHERE id = %s;", (box_id_int,))
-                                conn.commit()
-                                st.success(f"✅ Sucesso! Veículo alocado no Box {box_id_int}.")
-                                rerun_flag = True
-                        except Exception as e:
-                            conn.rollback()
-                            st.error(f"❌ Erro Crítico ao alocar serviços: {e}")
+                            funcionario_id_int, box_id_int = int(funcionario_selecionado.split(" - ")[0]), int(box_selecionado)
+                            area_selecionada = area_selecionada_display.replace('Manutenção Mecânica', 'manutencao').lower()
+
+                            sucesso, resultado = alocar_servico(
+                                conn, veiculo_id_int, area_selecionada, funcionario_id_int,
+                                quilometragem_cadastrada, box_id=box_id_int,
+                                usuario_id=st.session_state.get('user_id')
+                            )
+                        finally:
+                            release_connection(conn)
+
+                        # Em caso de conflito o snapshot também está velho: força a releitura
+                        versao_alterada()
+                        if sucesso:
+                            st.success(f"✅ Sucesso! Veículo alocado no Box {resultado[1]}.")
+                            rerun_flag = True
+                        else:
+                            st.error(f"❌ {resultado}")
     except Exception as e:
         st.error(f"❌ Erro ao carregar dados da página: {e}")
         st.exception(e)
-    finally:
-        release_connection(conn)
     
     if rerun_flag:
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+
+def _sugestao_automatica(snapshot):
+    """Mostra a agenda proposta pelo agendador e permite aplicar a primeira alocação sugerida."""
+    with st.expander("💡 Sugestão automática de alocação"):
+        try:
+            agenda = sugestoes_para_patio(snapshot, get_duracoes_historicas())
+        except Exception as e:
+            st.warning(f"Não foi possível calcular a sugestão: {e}")
+            return False
+        if agenda.empty:
+            st.info("Nenhuma alocação possível com os boxes e funcionários atuais.")
+            return False
+
+        nomes = snapshot["funcionarios"].set_index('id')['nome']
+        exibicao = pd.DataFrame({
+            'Placa': agenda['placa'],
+            'Área': agenda['area'].str.replace('manutencao', 'Manutenção Mecânica').str.title(),
+            'Box': agenda['box_id'],
+            'Funcionário': agenda['funcionario_id'].map(nomes),
+            'Início previsto': [t.strftime('%H:%M') for t in agenda['inicio']],
+            'Fim previsto': [t.strftime('%H:%M') for t in agenda['fim']],
+        })
+        st.caption("Ordem que minimiza a espera total, usando a duração histórica de cada tipo de serviço.")
+        st.dataframe(exibicao, use_container_width=True, hide_index=True)
+
+        primeira = agenda.iloc[0]
+        if primeira['inicio'] > datetime.now(MS_TZ).replace(tzinfo=None) + timedelta(minutes=1):
+            st.caption("Nenhum box e funcionário livres agora; a primeira sugestão é para mais tarde.")
+            return False
+        if not st.button(f"Aplicar: {primeira['placa']} no Box {primeira['box_id']}", key="aplicar_sugestao"):
+            return False
+
+        km = servicos_do_veiculo(snapshot, int(primeira['veiculo_id']), 'pendente')['quilometragem'].dropna()
+        conn = get_connection()
+        if not conn:
+            st.error("Falha ao conectar ao banco de dados.")
+            return False
+        try:
+            sucesso, resultado = alocar_servico(
+                conn, int(primeira['veiculo_id']), primeira['area'], int(primeira['funcionario_id']),
+                int(km.iloc[0]) if not km.empty else 0, box_id=int(primeira['box_id']),
+                usuario_id=st.session_state.get('user_id')
+            )
+        finally:
+            release_connection(conn)
+        versao_alterada()
+        if sucesso:
+            st.success(f"✅ Sucesso! Veículo alocado no Box {resultado[1]}.")
+            return True
+        st.error(f"❌ {resultado}")
+        return False
+
+
+# Aberta direto pelo Streamlit (links da barra de navegação do celular)
+if __name__ == "__main__":
+    exigir_login()
+    render_mobile_navbar(active_page="alocar")
+    alocar_servicos()
@@ -3,13 +3,16 @@ import os
 import io
 import json
 import base64
-from typing import Optional, List, Dict
+import time
+from typing import Optional, List, Dict, Tuple, Union
 from datetime import datetime
 
 import streamlit as st
 from PIL import Image, ImageOps, ImageDraw, ImageFont
 from openai import OpenAI
 import utils  # usa consultar_placa_comercial()
+from instrumentacao import trecho
+from auth_utils import exigir_login
 
 # =========================
 # Config
@@ -17,11 +20,22 @@ import utils  # usa consultar_placa_comercial()
 WHATSAPP_NUMERO = "5567984173800"   # telefone da empresa (somente dígitos com DDI)
 MAX_OBS = 250                       # Aumentado para mais detalhes, conforme solicitado
 MAX_SIDE = 1024                     # maior lado ao redimensionar (economia de tokens)
-JPEG_QUALITY = 85                   # compressão
+JPEG_QUALITY = 85                   # qualidade máxima (ponto de partida da busca)
+JPEG_QUALITY_MIN = 45               # piso da busca progressiva de qualidade
+JPEG_SUBSAMPLING = 2                # 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0 (banda de rodagem não depende de cor)
+BYTES_POR_EIXO = 200_000            # orçamento de bytes por eixo (colagem 2x2 codificada)
+PIXELS_POR_EIXO = 1536 * 1536       # orçamento de pixels por eixo (acima disso o modelo reduz de qualquer forma)
+
+# Envia uma imagem por eixo (mesma requisição) em vez de uma única pilha vertical gigante.
+ENVIO_POR_EIXO = bool(st.secrets.get("ENVIO_POR_EIXO_ANALISE_PNEUS", True))
 
 # Modo debug: mostra colagens e resposta bruta. Em produção, deixe False.
 DEBUG = bool(st.secrets.get("DEBUG_ANALISE_PNEUS", False))
 
+# Modo streaming: renderiza as seções do laudo conforme a resposta chega.
+STREAMING = bool(st.secrets.get("STREAMING_ANALISE_PNEUS", True))
+STREAMING_INTERVALO_S = 0.4         # intervalo mínimo entre re-renderizações parciais
+
 # =========================
 # Utilitários de imagem (Sua versão original, intacta)
 # =========================
@@ -153,12 +167,73 @@ def _stack_vertical_center(collages: List[Image.Image], titles: List[str]) -> Im
     return out
 
 
-def _img_to_dataurl(img: Image.Image) -> str:
+def _jpeg_bytes(img: Image.Image, quality: int, subsampling: int) -> bytes:
     buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
-    b64 = base64.b64encode(buf.getvalue()).decode("utf-8")
+    img.save(buf, format="JPEG", quality=quality, subsampling=subsampling, optimize=True)
+    return buf.getvalue()
+
+
+def _codificar_jpeg(img: Image.Image, max_bytes: Optional[int] = None,
+                    max_pixels: Optional[int] = None) -> Tuple[bytes, dict]:
+    """
+    Codifica em JPEG respeitando um orçamento de pixels e de bytes.
+    Reduz a resolução se passar de max_pixels e faz busca binária na qualidade
+    (entre JPEG_QUALITY_MIN e JPEG_QUALITY) até caber em max_bytes. Se nem a
+    qualidade mínima couber, reduz a imagem em 15% e tenta de novo.
+    """
+    if max_pixels and img.width * img.height > max_pixels:
+        fator = (max_pixels / (img.width * img.height)) ** 0.5
+        img = img.resize((max(1, int(img.width * fator)), max(1, int(img.height * fator))), Image.LANCZOS)
+
+    subsampling = JPEG_SUBSAMPLING
+    data = _jpeg_bytes(img, JPEG_QUALITY, subsampling)
+    quality = JPEG_QUALITY
+    if max_bytes and len(data) > max_bytes:
+        for _ in range(4):
+            lo, hi, melhor = JPEG_QUALITY_MIN, JPEG_QUALITY - 1, None
+            while lo <= hi:
+                q = (lo + hi) // 2
+                tentativa = _jpeg_bytes(img, q, subsampling)
+                if len(tentativa) <= max_bytes:
+                    melhor, quality = tentativa, q
+                    lo = q + 1
+                else:
+                    hi = q - 1
+            if melhor is not None:
+                data = melhor
+                break
+            img = img.resize((max(1, int(img.width * 0.85)), max(1, int(img.height * 0.85))), Image.LANCZOS)
+            data, quality = _jpeg_bytes(img, JPEG_QUALITY_MIN, subsampling), JPEG_QUALITY_MIN
+
+    info = {"bytes": len(data), "quality": quality, "subsampling": subsampling,
+            "largura": img.width, "altura": img.height}
+    return data, info
+
+
+def _img_to_dataurl(img: Image.Image, max_bytes: Optional[int] = None,
+                    max_pixels: Optional[int] = None) -> str:
+    data, _ = _codificar_jpeg(img, max_bytes, max_pixels)
+    b64 = base64.b64encode(data).decode("utf-8")
     return f"data:image/jpeg;base64,{b64}"
 
+
+def _registrar_chamada(tipo: str, modelo: str, data_urls: List[str], latencia_s: float,
+                       primeiro_token_s: Optional[float] = None, erro: bool = False):
+    """
+    Guarda tamanho do payload e latência de cada chamada ao modelo na sessão,
+    inclusive das que falharam (timeout, erro da API): são as mais caras.
+    """
+    st.session_state.setdefault("metricas_chamadas_ia", []).append({
+        "quando": datetime.now().strftime("%H:%M:%S"),
+        "tipo": tipo,
+        "modelo": modelo,
+        "imagens": len(data_urls),
+        "payload_kb": round(sum(len(u) for u in data_urls) / 1024, 1),
+        "latencia_s": round(latencia_s, 2),
+        "primeiro_token_s": round(primeiro_token_s, 2) if primeiro_token_s is not None else None,
+        "erro": erro,
+    })
+
 # =========================
 # Utilitários de PDF (ATUALIZADO PARA LAUDO COMPLETO)
 # =========================
@@ -307,8 +382,16 @@ def _build_pdf_bytes(report_img: Image.Image) -> bytes:
 # =========================
 # OpenAI / Prompt helpers (SEÇÃO ATUALIZADA)
 # =========================
-def _build_multimodal_message(data_url: str, meta: dict, obs: str, axis_titles: List[str]) -> list:
+def _build_multimodal_message(data_urls: Union[str, List[str]], meta: dict, obs: str, axis_titles: List[str]) -> list:
     """ATUALIZADO - Constrói o prompt de usuário com base no novo padrão exigido pelo gestor."""
+    if isinstance(data_urls, str):
+        data_urls = [data_urls]
+    if len(data_urls) > 1:
+        organizacao = f"São fornecidas {len(data_urls)} imagens, uma colagem 2x2 por eixo."
+        ordem = "As imagens seguem a ordem"
+    else:
+        organizacao = "A imagem fornecida é uma montagem vertical de colagens 2x2."
+        ordem = "As colagens estão empilhadas na ordem"
     prompt_usuario = f"""
 ### ANÁLISE TÉCNICA DE PNEUS PARA GESTÃO DE FROTA
 
@@ -321,8 +404,8 @@ def _build_multimodal_message(data_url: str, meta: dict, obs: str, axis_titles:
 
 ---
 **2. ORGANIZAÇÃO DAS FOTOS (MUITO IMPORTANTE)**
-A imagem fornecida é uma montagem vertical de colagens 2x2.
-- **Ordem dos Eixos:** As colagens estão empilhadas na ordem: **{", ".join(axis_titles)}**.
+{organizacao}
+- **Ordem dos Eixos:** {ordem}: **{", ".join(axis_titles)}**.
 - **Estrutura da Colagem 2x2 (por eixo):**
   - **Superior Esquerdo:** Motorista, foto de Frente.
   - **Inferior Esquerdo:** Motorista, foto em 45°.
@@ -394,13 +477,12 @@ Execute uma análise completa e retorne a resposta **EXCLUSIVAMENTE** no formato
 }}
 ```
 """
-    return [
-        {"type": "text", "text": prompt_usuario},
-        {"type": "image_url", "image_url": {"url": data_url}},
+    return [{"type": "text", "text": prompt_usuario}] + [
+        {"type": "image_url", "image_url": {"url": url}} for url in data_urls
     ]
 
 
-def _call_openai_single_image(data_url: str, meta: dict, obs: str, model_name: str, axis_titles: List[str]) -> dict:
+def _call_openai_single_image(data_urls: Union[str, List[str]], meta: dict, obs: str, model_name: str, axis_titles: List[str]) -> dict:
     """ATUALIZADO - Chama a API com a nova persona e exigência de JSON."""
     api_key = st.secrets.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -408,30 +490,187 @@ def _call_openai_single_image(data_url: str, meta: dict, obs: str, model_name: s
 
     client = OpenAI(api_key=api_key)
     prompt_sistema = "Você é um especialista sênior em manutenção de frotas pesadas, com vasta experiência em diagnóstico visual de pneus, focado em risco operacional e custo. Seja pedagógico, priorize ações, tenha visão sistêmica e quantifique o impacto. Siga rigorosamente o formato JSON."
-    content = _build_multimodal_message(data_url, meta, obs, axis_titles)
+    if isinstance(data_urls, str):
+        data_urls = [data_urls]
+    content = _build_multimodal_message(data_urls, meta, obs, axis_titles)
 
+    inicio = time.perf_counter()
+    falhou = True
     try:
-        resp = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": prompt_sistema},
-                {"role": "user", "content": content},
-            ],
-            temperature=0.1,
-            response_format={"type": "json_object"},
-        )
+        with trecho("externo"):
+            resp = client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": prompt_sistema},
+                    {"role": "user", "content": content},
+                ],
+                temperature=0.1,
+                response_format={"type": "json_object"},
+            )
         text = resp.choices[0].message.content or ""
-        return json.loads(text)
+        laudo = json.loads(text)
+        falhou = False      # só depois do parse: resposta que não é JSON conta como erro
+        return laudo
     except Exception as e:
         raw_text = locals().get("text", str(e))
         try:
             start = raw_text.find('{')
             end = raw_text.rfind('}') + 1
             if start != -1 and end > start:
-                return json.loads(raw_text[start:end])
+                laudo = json.loads(raw_text[start:end])
+                falhou = False      # JSON recuperado do meio do texto: a resposta serviu
+                return laudo
         except Exception:
             pass
         return {"erro": f"Falha na API ou no processamento do JSON: {e}", "raw": raw_text}
+    finally:
+        _registrar_chamada("principal", model_name, data_urls, time.perf_counter() - inicio, erro=falhou)
+
+
+def _parse_json_parcial(texto: str) -> Tuple[dict, bool]:
+    """
+    Interpreta um JSON possivelmente incompleto (resposta ainda chegando).
+    Corta no último valor completo (vírgula ou fechamento de objeto/lista fora
+    de string) e fecha os colchetes/chaves abertos. Retorna (objeto, completo).
+    """
+    try:
+        obj = json.loads(texto)
+        return (obj, True) if isinstance(obj, dict) else ({}, False)
+    except ValueError:
+        pass
+    inicio = texto.find("{")
+    if inicio == -1:
+        return {}, False
+
+    pilha, cortes = [], []
+    em_string = escape = False
+    for i in range(inicio, len(texto)):
+        c = texto[i]
+        if em_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                em_string = False
+            continue
+        if c == '"':
+            em_string = True
+        elif c in "{[":
+            pilha.append("}" if c == "{" else "]")
+        elif c in "}]":
+            if pilha:
+                pilha.pop()
+            cortes.append((i + 1, "".join(reversed(pilha))))
+        elif c == ",":
+            cortes.append((i, "".join(reversed(pilha))))
+
+    for fim, fechamento in reversed(cortes[-50:]):
+        try:
+            obj = json.loads(texto[inicio:fim] + fechamento)
+        except ValueError:
+            continue
+        if isinstance(obj, dict):
+            return obj, False
+    return {}, False
+
+
+def _secoes_prontas(parcial: dict, completo: bool) -> dict:
+    """
+    Mantém só as seções já fechadas do laudo parcial. A última chave ainda pode
+    estar chegando; no caso dos eixos, os anteriores ao último já estão completos.
+    """
+    if completo or not parcial:
+        return parcial
+    chaves = list(parcial.keys())
+    prontas = {k: parcial[k] for k in chaves[:-1]}
+    ultima = chaves[-1]
+    if ultima == "analise_detalhada_eixos" and isinstance(parcial[ultima], list) and len(parcial[ultima]) > 1:
+        prontas[ultima] = parcial[ultima][:-1]
+    return prontas
+
+
+def _pedacos_medidos(stream):
+    """Itera a resposta em streaming contando só a espera pela rede como chamada externa."""
+    iterador = iter(stream)
+    while True:
+        with trecho("externo"):
+            chunk = next(iterador, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _stream_openai_single_image(data_urls: List[str], meta: dict, obs: str, model_name: str,
+                                axis_titles: List[str], on_parcial) -> dict:
+    """
+    Mesma chamada de _call_openai_single_image, mas consumindo a resposta em
+    streaming. A cada nova seção completa chama on_parcial(laudo_parcial).
+    """
+    api_key = st.secrets.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return {"erro": "OPENAI_API_KEY ausente."}
+
+    client = OpenAI(api_key=api_key)
+    prompt_sistema = "Você é um especialista sênior em manutenção de frotas pesadas, com vasta experiência em diagnóstico visual de pneus, focado em risco operacional e custo. Seja pedagógico, priorize ações, tenha visão sistêmica e quantifique o impacto. Siga rigorosamente o formato JSON."
+    content = _build_multimodal_message(data_urls, meta, obs, axis_titles)
+
+    text = ""
+    inicio = time.perf_counter()
+    primeiro_token = None
+    ultimo_render = 0.0
+    secoes_exibidas = None
+    falhou = True
+    try:
+        with trecho("externo"):
+            stream = client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": prompt_sistema},
+                    {"role": "user", "content": content},
+                ],
+                temperature=0.1,
+                response_format={"type": "json_object"},
+                stream=True,
+            )
+        for chunk in _pedacos_medidos(stream):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if primeiro_token is None:
+                primeiro_token = time.perf_counter() - inicio
+            text += delta
+
+            # Só tenta interpretar quando algum valor pode ter fechado
+            agora = time.perf_counter()
+            if not any(c in delta for c in ",}]") or agora - ultimo_render < STREAMING_INTERVALO_S:
+                continue
+            parcial, completo = _parse_json_parcial(text)
+            prontas = _secoes_prontas(parcial, completo)
+            assinatura = [(k, len(v) if isinstance(v, list) else 1) for k, v in prontas.items()]
+            if prontas and assinatura != secoes_exibidas:
+                on_parcial(prontas)
+                secoes_exibidas = assinatura
+                ultimo_render = agora
+
+        laudo = json.loads(text)
+        falhou = False
+        return laudo
+    except Exception as e:
+        raw_text = text or str(e)
+        try:
+            start = raw_text.find('{')
+            end = raw_text.rfind('}') + 1
+            if start != -1 and end > start:
+                laudo = json.loads(raw_text[start:end])
+                falhou = False      # JSON recuperado do meio do texto: a resposta serviu
+                return laudo
+        except Exception:
+            pass
+        return {"erro": f"Falha na API ou no processamento do JSON: {e}", "raw": raw_text}
+    finally:
+        _registrar_chamada("principal (streaming)", model_name, data_urls, time.perf_counter() - inicio,
+                           primeiro_token, erro=falhou)
 
 
 def _call_openai_single_axis(collage: Image.Image, meta: dict, obs: str, model_name: str, axis_title: str) -> dict:
@@ -440,7 +679,7 @@ def _call_openai_single_axis(collage: Image.Image, meta: dict, obs: str, model_n
     if not api_key:
         return {"erro": "OPENAI_API_KEY ausente."}
     client = OpenAI(api_key=api_key)
-    data_url = _img_to_dataurl(collage)
+    data_url = _img_to_dataurl(collage, BYTES_POR_EIXO, PIXELS_POR_EIXO)
     
     # Usando o prompt de fallback original da sua versão estável
     formato_fallback = '{"eixos": [ { "titulo": "' + axis_title + '", "tipo": "Dianteiro|Traseiro", "diagnostico_global": "...", "necessita_alinhamento": true, "parametros_suspeitos":[], "pressao_pneus":{}, "balanceamento_sugerido": "...", "achados_chave":[], "severidade_eixo":0, "prioridade_manutencao":"baixa", "rodizio_recomendado":"..." } ]}'
@@ -450,45 +689,65 @@ def _call_openai_single_axis(collage: Image.Image, meta: dict, obs: str, model_n
         {"type": "text", "text": header},
         {"type": "image_url", "image_url": {"url": data_url}},
     ]
+    inicio = time.perf_counter()
+    falhou = True
     try:
-        resp = client.chat.completions.create(
-            model=model_name, messages=[{"role": "user", "content": content}], temperature=0, response_format={"type": "json_object"}
-        )
+        with trecho("externo"):
+            resp = client.chat.completions.create(
+                model=model_name, messages=[{"role": "user", "content": content}], temperature=0, response_format={"type": "json_object"}
+            )
         text = resp.choices[0].message.content or ""
-        return json.loads(text)
+        laudo = json.loads(text)
+        falhou = False
+        return laudo
     except Exception as e:
         return {"erro": f"Falha na API (fallback): {e}"}
+    finally:
+        _registrar_chamada(f"fallback ({axis_title})", model_name, [data_url], time.perf_counter() - inicio, erro=falhou)
 
 # =========================
 # UI helpers (SEÇÃO ATUALIZADA)
 # =========================
-def _render_laudo_ui(laudo: dict, meta: dict, obs: str):
-    """ATUALIZADO - Renderiza o novo laudo profissional na tela."""
+def _render_laudo_ui(laudo: dict, meta: dict, obs: str, parcial: bool = False):
+    """
+    ATUALIZADO - Renderiza o novo laudo profissional na tela.
+    Com parcial=True (streaming) mostra apenas as seções já recebidas.
+    """
     
     # Compatibilidade: Se o laudo vier no formato antigo (do fallback), mostra o antigo renderizador
-    if "resumo_executivo" not in laudo:
+    if parcial:
+        st.caption("⏳ Recebendo laudo… as seções aparecem conforme ficam prontas.")
+    elif "resumo_executivo" not in laudo:
         st.warning("Laudo recebido em formato de compatibilidade (fallback). A análise pode ser menos detalhada.")
         _render_laudo_ui_original(laudo, meta, obs) # Chama a função original
         return
-
-    st.success("Laudo Profissional Gerado")
+    else:
+        st.success("Laudo Profissional Gerado")
     
+    def _mostrar(chave):
+        return not parcial or chave in laudo
+
     urgency_map = {
         "Crítico": "⛔ Crítico", "Médio": "⚠️ Médio", "Baixo": "ℹ️ Baixo",
     }
 
-    st.markdown("### 1. Resumo Executivo para o Gestor")
-    st.write(laudo.get('resumo_executivo', "N/A"))
+    if _mostrar('resumo_executivo'):
+        st.markdown("### 1. Resumo Executivo para o Gestor")
+        st.write(laudo.get('resumo_executivo', "N/A"))
 
-    st.markdown("### 2. Tabela de Visão Geral")
-    if laudo.get('tabela_visao_geral'):
-        st.dataframe(laudo['tabela_visao_geral'], use_container_width=True, hide_index=True)
+    if _mostrar('tabela_visao_geral'):
+        st.markdown("### 2. Tabela de Visão Geral")
+        if laudo.get('tabela_visao_geral'):
+            st.dataframe(laudo['tabela_visao_geral'], use_container_width=True, hide_index=True)
 
-    st.markdown("### 3. Diagnóstico Global do Veículo")
-    st.info(laudo.get('diagnostico_global_veiculo', "N/A"))
+    if _mostrar('diagnostico_global_veiculo'):
+        st.markdown("### 3. Diagnóstico Global do Veículo")
+        st.info(laudo.get('diagnostico_global_veiculo', "N/A"))
 
+    if not _mostrar('analise_detalhada_eixos'):
+        return
     st.markdown("### 4. Análise Detalhada por Eixo")
-    if 'ultima_colagem' in st.session_state:
+    if 'ultima_colagem' in st.session_state and not parcial:
         st.image(st.session_state['ultima_colagem'], caption="Imagem completa enviada para análise", use_container_width=True)
 
     for eixo in laudo.get('analise_detalhada_eixos', []):
@@ -508,6 +767,8 @@ def _render_laudo_ui(laudo: dict, meta: dict, obs: str):
                         - **Risco se não corrigido:** {exp.get('risco_nao_corrigir', 'N/A')}
                         """)
 
+    if not _mostrar('plano_de_acao'):
+        return
     st.markdown("### 5. Plano de Ação Recomendado")
     plano = laudo.get('plano_de_acao', {})
     st.error("⛔ Ações Críticas (Risco Imediato)")
@@ -578,9 +839,11 @@ def app():
     st.caption("Laudo automático de apoio (sujeito a erros). Recomenda-se inspeção presencial.")
 
     # Toggle do modelo
-    col_m1, _ = st.columns([1, 3])
+    col_m1, col_m2, _ = st.columns([1, 1, 2])
     with col_m1:
         modo_detalhado = st.toggle("Análise detalhada (gpt-4o)", value=False)
+    with col_m2:
+        modo_streaming = st.toggle("Mostrar laudo enquanto é gerado", value=STREAMING)
     modelo = "gpt-4o" if modo_detalhado else "gpt-4o-mini"
 
     # Identificação
@@ -685,6 +948,14 @@ def app():
             link_wpp = f"https://wa.me/{WHATSAPP_NUMERO}?text={quote(msg)}"
             st.markdown(f"[📲 Enviar resultado via WhatsApp]({link_wpp})")
 
+        metricas = st.session_state.get("metricas_chamadas_ia", [])
+        if metricas:
+            ultima = metricas[-1]
+            resultado = "falhou após" if ultima.get("erro") else "resposta em"
+            st.caption(f"Última chamada: {ultima['imagens']} imagem(ns), {ultima['payload_kb']} KB enviados, {resultado} {ultima['latencia_s']} s.")
+            if DEBUG:
+                st.dataframe(metricas, use_container_width=True, hide_index=True)
+
     if pronto:
         for i, eixo in enumerate(st.session_state.axes, start=1):
             if not all(eixo["files"].get(k) for k in ("lt","lb","rt","rb")):
@@ -701,13 +972,29 @@ def app():
                 titles.append(labels["title"])
             colagem_final = _stack_vertical_center(collages, titles)
             st.session_state["ultima_colagem"] = colagem_final
+            st.session_state["collages"] = collages
             st.session_state["titles"] = titles
 
-        data_url = _img_to_dataurl(colagem_final)
+            # Orçamento proporcional ao número de eixos: por eixo separado ou na pilha única
+            if ENVIO_POR_EIXO:
+                data_urls = [_img_to_dataurl(c, BYTES_POR_EIXO, PIXELS_POR_EIXO) for c in collages]
+            else:
+                data_urls = [_img_to_dataurl(colagem_final, BYTES_POR_EIXO * len(collages), PIXELS_POR_EIXO * len(collages))]
         meta = {"placa": placa, "nome": nome, "empresa": empresa, "telefone": telefone, "email": email, "placa_info": placa_info}
         
-        with st.spinner("Analisando com IA (pode levar até 2 minutos)..."):
-            laudo = _call_openai_single_image(data_url, meta, observacao, modelo, titles)
+        if modo_streaming:
+            area_parcial = st.empty()
+
+            def _mostrar_parcial(laudo_parcial):
+                with area_parcial.container():
+                    _render_laudo_ui(laudo_parcial, meta, observacao, parcial=True)
+
+            with st.spinner("Analisando com IA… o laudo aparece abaixo conforme é gerado."):
+                laudo = _stream_openai_single_image(data_urls, meta, observacao, modelo, titles, _mostrar_parcial)
+            area_parcial.empty()
+        else:
+            with st.spinner("Analisando com IA (pode levar até 2 minutos)..."):
+                laudo = _call_openai_single_image(data_urls, meta, observacao, modelo, titles)
         
         if "erro" in laudo or not ("analise_detalhada_eixos" in laudo or "eixos" in laudo):
             st.warning("Análise principal falhou. Tentando fallback por eixo...")
@@ -737,4 +1024,5 @@ def app():
         st.rerun()
 
 if __name__ == "__main__":
+    exigir_login()
     app()
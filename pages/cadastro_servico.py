@@ -2,12 +2,15 @@
 
 import streamlit as st
 from database import get_connection, release_connection
+import psycopg2.errors
 import psycopg2.extras
 from datetime import datetime
 import pytz
-from utils import get_catalogo_servicos, consultar_placa_comercial, formatar_telefone, formatar_placa, buscar_clientes_por_similaridade, get_cliente_details
+from utils import get_catalogo_servicos, consultar_placa_comercial, formatar_telefone, formatar_placa, buscar_clientes_por_similaridade, get_cliente_details, buscar_veiculo_por_placa
+from controle_versao import versao_alterada
+from operacoes_patio import registrar_servicos
 from pages.ui_components import render_mobile_navbar
-render_mobile_navbar(active_page="cadastro")
+from auth_utils import exigir_login
 
 MS_TZ = pytz.timezone('America/Campo_Grande')
 
@@ -46,13 +49,10 @@ def app():
             conn = get_connection()
             if conn:
                 try:
-                    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-                        query = "SELECT v.id, v.empresa, v.modelo, v.ano_modelo, v.nome_motorista, v.contato_motorista, v.cliente_id, c.nome_responsavel, c.contato_responsavel FROM veiculos v LEFT JOIN clientes c ON v.cliente_id = c.id WHERE v.placa = %s"
-                        cursor.execute(query, (formatar_placa(state["placa_input"]),))
-                        resultado = cursor.fetchone()
-                        if resultado:
-                            state["veiculo_id"] = resultado["id"]
-                            state["veiculo_info"] = resultado
+                    resultado = buscar_veiculo_por_placa(conn, state["placa_input"])
+                    if resultado:
+                        state["veiculo_id"] = resultado["id"]
+                        state["veiculo_info"] = resultado
                 finally:
                     release_connection(conn)
 
@@ -252,7 +252,7 @@ def app():
                 with col3:
                     if st.button("➕ Adicionar", key=f"add_{chave_area}", use_container_width=True):
                         if servico_selecionado:
-                            st.session_state.servicos_para_adicionar.append({"area": nome_area, "tipo": servico_selecionado, "qtd": quantidade})
+                            st.session_state.servicos_para_adicionar.append({"area": nome_area, "chave_area": chave_area, "tipo": servico_selecionado, "qtd": quantidade})
                             st.rerun()
                         else:
                             st.warning("Por favor, selecione um serviço para adicionar.")
@@ -284,27 +284,23 @@ def app():
                     conn = get_connection()
                     if conn:
                         try:
-                            with conn.cursor() as cursor:
-                                table_map = {"Borracharia": "servicos_solicitados_borracharia", "Alinhamento": "servicos_solicitados_alinhamento", "Mecânica": "servicos_solicitados_manutencao"}
-                                for s in st.session_state.servicos_para_adicionar:
-                                    table_name = table_map.get(s['area'])
-                                    query = f"INSERT INTO {table_name} (veiculo_id, tipo, quantidade, observacao, quilometragem, status, data_solicitacao, data_atualizacao) VALUES (%s, %s, %s, %s, %s, 'pendente', %s, %s)"
-                                    cursor.execute(query, (state["veiculo_id"], s['tipo'], s['qtd'], observacao_geral, state["quilometragem"], datetime.now(MS_TZ), datetime.now(MS_TZ)))
-                                
-                                cursor.execute(
-                                    "UPDATE veiculos SET data_revisao_proativa = NULL WHERE id = %s",
-                                    (state["veiculo_id"],)
-                                )
-
-                                conn.commit()
-                                st.success("✅ Serviços cadastrados com sucesso!")
-                                state["search_triggered"] = False
-                                state["placa_input"] = ""
-                                st.session_state.servicos_para_adicionar = []
-                                st.balloons()
-                                st.rerun()
+                            sucesso, resultado = registrar_servicos(
+                                conn, state["veiculo_id"],
+                                [{"area": s["chave_area"], "tipo": s["tipo"], "qtd": int(s["qtd"])} for s in st.session_state.servicos_para_adicionar],
+                                state["quilometragem"], observacao_geral, servicos_do_banco
+                            )
                         finally:
                             release_connection(conn)
+                        if sucesso:
+                            versao_alterada()
+                            st.success("✅ Serviços cadastrados com sucesso!")
+                            state["search_triggered"] = False
+                            state["placa_input"] = ""
+                            st.session_state.servicos_para_adicionar = []
+                            st.balloons()
+                            st.rerun()
+                        else:
+                            st.error(f"❌ {resultado}")
 
         else: # Se o veículo não foi encontrado no banco
             st.warning("Veículo não encontrado no seu banco de dados.")
@@ -405,6 +401,9 @@ def app():
                                             for key in ['modelo_aceito', 'ano_aceito']:
                                                 if key in st.session_state: del st.session_state[key]
                                             st.rerun()
+                                    except psycopg2.errors.UniqueViolation:
+                                        conn.rollback()
+                                        st.error(f"❌ A placa '{placa_formatada}' já está cadastrada (em outro formato). Faça a busca novamente.")
                                     finally:
                                         release_connection(conn)
 
@@ -416,3 +415,9 @@ def app():
                     del st.session_state[key]
             st.rerun()
 
+
+# Aberta direto pelo Streamlit (links da barra de navegação do celular)
+if __name__ == "__main__":
+    exigir_login()
+    render_mobile_navbar(active_page="cadastro")
+    app()
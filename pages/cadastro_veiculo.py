@@ -54,7 +54,7 @@ def app():
                 except psycopg2.IntegrityError as e:
                     conn.rollback()
                     # Verifica se o erro foi de placa duplicada
-                    if "veiculos_placa_key" in str(e) or "unique_placa" in str(e):
+                    if "veiculos_placa_key" in str(e) or "unique_placa" in str(e) or "veiculos_placa_normalizada_key" in str(e):
                         st.error(f"❌ Erro: A placa '{placa}' já está cadastrada no sistema.")
                     else:
                         st.error(f"❌ Erro de integridade no banco de dados: {e}")
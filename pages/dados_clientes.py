@@ -3,10 +3,28 @@
 import streamlit as st
 import pandas as pd
 from database import get_connection, release_connection
-from utils import formatar_telefone
+from utils import formatar_telefone, normalizar_placa
 import psycopg2.extras
 from datetime import datetime
 
+def buscar_clientes(conn, search_term):
+    """Clientes cujo nome (ou fantasia) contém o termo, ou cujo id/código antigo é o termo."""
+    query_params = {}
+    where_clauses = []
+    like_term = f"%{search_term}%"
+    query_params['like_term'] = like_term
+    where_clauses.append("(nome_empresa ILIKE %(like_term)s OR nome_fantasia ILIKE %(like_term)s)")
+    try:
+        num_term = int(search_term)
+        query_params['num_term'] = num_term
+        where_clauses.append("(id = %(num_term)s OR codigo_antigo = %(num_term)s)")
+    except ValueError:
+        pass
+
+    # Este select agora busca todos os dados para evitar uma segunda consulta
+    query = "SELECT * FROM clientes WHERE " + " OR ".join(where_clauses) + " ORDER BY nome_empresa"
+    return pd.read_sql(query, conn, params=query_params)
+
 def app():
     st.title("📇 Dados de Clientes")
     st.markdown("Pesquise, visualize e edite os dados dos clientes e seus veículos.")
@@ -52,21 +70,7 @@ def app():
         st.stop()
 
     try:
-        query_params = {}
-        where_clauses = []
-        like_term = f"%{search_term}%"
-        query_params['like_term'] = like_term
-        where_clauses.append("(nome_empresa ILIKE %(like_term)s OR nome_fantasia ILIKE %(like_term)s)")
-        try:
-            num_term = int(search_term)
-            query_params['num_term'] = num_term
-            where_clauses.append("(id = %(num_term)s OR codigo_antigo = %(num_term)s)")
-        except ValueError:
-            pass
-        
-        # Este select agora busca todos os dados para evitar uma segunda consulta
-        query = "SELECT * FROM clientes WHERE " + " OR ".join(where_clauses) + " ORDER BY nome_empresa"
-        df_clientes_results = pd.read_sql(query, conn, params=query_params)
+        df_clientes_results = buscar_clientes(conn, search_term)
 
         if df_clientes_results.empty:
             st.warning("Nenhum cliente encontrado com os critérios de busca.")
@@ -245,10 +249,10 @@ def app():
                     ) serv ON es.id = serv.execucao_id
                     LEFT JOIN funcionarios f ON serv.funcionario_id = f.id
                     JOIN veiculos v ON es.veiculo_id = v.id
-                    WHERE v.placa = %s
+                    WHERE v.placa_normalizada = %s
                     ORDER BY es.inicio_execucao DESC, serv.area;
                 """
-                df_historico = pd.read_sql(history_query, conn, params=(st.session_state.dc_selected_vehicle_placa,))
+                df_historico = pd.read_sql(history_query, conn, params=(normalizar_placa(st.session_state.dc_selected_vehicle_placa),))
                 if df_historico.empty:
                     st.info("Nenhum histórico de serviço encontrado para esta placa.")
                 else:
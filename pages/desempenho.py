@@ -0,0 +1,128 @@
+# /pages/desempenho.py
+
+import streamlit as st
+import instrumentacao
+import perfil_rerun
+
+def app():
+    st.title("⏱️ Desempenho")
+    if st.session_state.get('user_role') != 'admin':
+        st.error("Acesso negado. Apenas administradores podem acessar esta página.")
+        st.stop()
+
+    tab_consultas, tab_reruns = st.tabs(["🗄️ Consultas", "🔁 Reruns das páginas"])
+    with tab_consultas:
+        painel_consultas()
+    with tab_reruns:
+        painel_reruns()
+
+def painel_consultas():
+    st.markdown("Tempo gasto no banco por página e por consulta, desde que o servidor subiu "
+                "(ou desde a última limpeza). Consultas iguais com valores diferentes contam juntas.")
+
+    df = instrumentacao.resumo()
+    if df.empty:
+        if not st.secrets.get("INSTRUMENTAR_CONSULTAS", False):
+            st.info("A medição de consultas está desligada. Para medir, coloque INSTRUMENTAR_CONSULTAS = true "
+                    "nos secrets e reinicie o app (cada consulta passa a custar alguns microssegundos a mais).")
+        else:
+            st.info("Nenhuma consulta medida ainda. Navegue pelas páginas e volte aqui.")
+        return
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Consultas executadas", f"{int(df['chamadas'].sum()):,}".replace(",", "."))
+    c2.metric("Tempo total no banco", f"{df['total_ms'].sum() / 1000:.2f} s")
+    c3.metric("Consultas distintas", df['impressao'].nunique())
+
+    # --- Por página ---
+    st.markdown("---")
+    st.subheader("Por página")
+    por_pagina = (df.groupby('pagina')
+                    .agg(chamadas=('chamadas', 'sum'), total_ms=('total_ms', 'sum'), max_ms=('max_ms', 'max'))
+                    .sort_values('total_ms', ascending=False).reset_index())
+    st.dataframe(
+        por_pagina,
+        column_config={
+            'pagina': 'Página', 'chamadas': 'Consultas',
+            'total_ms': st.column_config.NumberColumn('Total (ms)', format="%.0f"),
+            'max_ms': st.column_config.NumberColumn('Mais lenta (ms)', format="%.1f"),
+        },
+        hide_index=True, use_container_width=True
+    )
+
+    # --- Por consulta ---
+    st.markdown("---")
+    st.subheader("Por consulta")
+    paginas = st.multiselect("Filtrar páginas", sorted(df['pagina'].unique()))
+    if paginas:
+        df = df[df['pagina'].isin(paginas)]
+    st.dataframe(
+        df,
+        column_config={
+            'pagina': 'Página', 'origem': 'Chamada em', 'chamadas': 'Chamadas',
+            'total_ms': st.column_config.NumberColumn('Total (ms)', format="%.0f"),
+            'media_ms': st.column_config.NumberColumn('Média (ms)', format="%.1f"),
+            'p95_ms': st.column_config.NumberColumn('p95 (ms)', format="%.1f"),
+            'max_ms': st.column_config.NumberColumn('Máx. (ms)', format="%.1f"),
+            'linhas_por_chamada': st.column_config.NumberColumn('Linhas/chamada', format="%.0f"),
+            'impressao': 'Impressão', 'consulta': 'SQL',
+        },
+        hide_index=True, use_container_width=True
+    )
+
+    col_baixar, col_limpar = st.columns(2)
+    col_baixar.download_button("⬇️ Baixar perfil (CSV)", df.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig'),
+                               "perfil_consultas.csv", "text/csv", use_container_width=True)
+    if col_limpar.button("🧹 Zerar medições", use_container_width=True, key="limpar_consultas"):
+        instrumentacao.limpar()
+        st.rerun()
+
+def painel_reruns():
+    st.markdown("Tempo de cada execução das páginas, dividido em **banco** (consultas), **render** "
+                "(montagem dos cartões e widgets das páginas pesadas), **externo** (OpenAI, Telegram, "
+                "API de placas) e **python** (cálculos da própria página).")
+    st.caption("Atualizações automáticas de um trecho da página (como o painel das filas) aparecem "
+               "separadas, como \"<página> (fragmento)\".")
+    if not perfil_rerun.perfil_ativo():
+        st.info("O perfil de reruns está desligado. Para medir, coloque PERFIL_RERUN = true nos secrets "
+                "e reinicie o app (as consultas passam a ser cronometradas).")
+        return
+
+    resumo = perfil_rerun.resumo_por_pagina()
+    if resumo.empty:
+        st.info("Nenhum rerun medido ainda. Navegue pelas páginas e volte aqui.")
+        return
+
+    st.subheader("Por página (ms)")
+    formato = {coluna: st.column_config.NumberColumn(coluna.replace("_ms_", " ").replace("_", " "), format="%.0f")
+               for coluna in resumo.columns if "_ms_" in coluna}
+    st.dataframe(
+        resumo,
+        column_config={'pagina': 'Página', 'reruns': 'Reruns',
+                       'consultas_media': st.column_config.NumberColumn('Consultas/rerun', format="%.1f"),
+                       **formato},
+        hide_index=True, use_container_width=True
+    )
+
+    st.subheader("Onde vai o tempo (p50)")
+    colunas_p50 = [f"{categoria}_ms_p50" for categoria in instrumentacao.CATEGORIAS]
+    st.bar_chart(resumo.set_index('pagina')[colunas_p50].rename(columns=lambda c: c.split("_")[0]), horizontal=True)
+
+    st.subheader("Últimos reruns")
+    df = perfil_rerun.reruns()
+    st.dataframe(
+        df.head(200),
+        column_config={
+            'momento': st.column_config.DatetimeColumn('Momento', format="DD/MM HH:mm:ss"),
+            'pagina': 'Página', 'sessao': 'Sessão', 'usuario': 'Usuário', 'consultas': 'Consultas',
+            **{c: st.column_config.NumberColumn(c.replace("_ms", " (ms)"), format="%.0f") for c in df.columns if c.endswith("_ms")},
+        },
+        hide_index=True, use_container_width=True
+    )
+
+    col_baixar, col_limpar = st.columns(2)
+    col_baixar.download_button("⬇️ Baixar reruns (CSV)", df.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig'),
+                               "perfil_reruns.csv", "text/csv", use_container_width=True)
+    if col_limpar.button("🧹 Zerar medições", use_container_width=True, key="limpar_reruns"):
+        perfil_rerun.limpar()
+        st.rerun()
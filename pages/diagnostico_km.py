@@ -0,0 +1,93 @@
+# /pages/diagnostico_km.py
+
+import streamlit as st
+import pandas as pd
+from database import get_connection, release_connection
+from diagnostico_anomalias import KM_DIA_MAXIMO, PESOS, varrer
+
+NOMES_ANOMALIAS = {
+    'km_decrescente': 'KM menor que a anterior',
+    'km_dia_implausivel': 'KM/dia implausível',
+    'descartada_pela_regra': 'Ignorada na média',
+    'intervalo_zero_dias': 'KM mudou no mesmo dia',
+    'km_duplicada': 'KM repetida',
+}
+
+@st.cache_data(ttl=600, show_spinner=False)
+def buscar_varredura(km_dia_max):
+    """Varredura completa (uma consulta), compartilhada entre as sessões por 10 minutos."""
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("Falha ao conectar ao banco de dados.")
+    try:
+        return varrer(conn, km_dia_max)
+    finally:
+        release_connection(conn)
+
+def app():
+    st.title("🔎 Diagnóstico de KM")
+    st.markdown("Varre o histórico de todos os veículos atrás de leituras de quilometragem suspeitas, "
+                "que distorcem a média de KM/dia usada na Revisão Proativa.")
+
+    col_limite, col_atualizar = st.columns([3, 1])
+    km_dia_max = col_limite.number_input("Limite de KM/dia plausível", min_value=100, max_value=5000,
+                                         value=KM_DIA_MAXIMO, step=100)
+    if col_atualizar.button("🔄 Refazer varredura", use_container_width=True):
+        buscar_varredura.clear()
+
+    try:
+        with st.spinner("Analisando o histórico de todos os veículos..."):
+            df_anomalias, df_ranking = buscar_varredura(km_dia_max)
+    except Exception as e:
+        st.error(f"Erro ao analisar o histórico: {e}")
+        st.stop()
+
+    if df_ranking.empty:
+        st.success("✅ Nenhuma anomalia de quilometragem encontrada.")
+        st.stop()
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Veículos afetados", len(df_ranking))
+    c2.metric("Anomalias", len(df_anomalias))
+    c3.metric("Visitas ignoradas na média", int((df_anomalias['tipo'] == 'descartada_pela_regra').sum()))
+
+    # --- Ranking ---
+    st.markdown("---")
+    st.subheader("Veículos mais afetados")
+    st.caption("**Pontuação**: soma dos pesos das anomalias (" +
+               ", ".join(f"{NOMES_ANOMALIAS[t]} = {p}" for t, p in PESOS.items()) + "). "
+               "**Distorção**: diferença relativa entre a média calculada e a mediana dos KM/dia entre visitas válidas.")
+    st.dataframe(
+        df_ranking.drop(columns=['veiculo_id']).rename(columns=NOMES_ANOMALIAS),
+        column_config={
+            'placa': 'Placa', 'empresa': 'Empresa', 'pontuacao': 'Pontuação',
+            'media_km_diaria': st.column_config.NumberColumn('Média salva', format="%.1f"),
+            'media_calculada': st.column_config.NumberColumn('Média calculada', format="%.1f"),
+            'mediana_km_dia': st.column_config.NumberColumn('Mediana KM/dia', format="%.1f"),
+            'distorcao_media': st.column_config.NumberColumn('Distorção', format="%.2f"),
+        },
+        hide_index=True, use_container_width=True
+    )
+
+    col_ranking, col_anomalias = st.columns(2)
+    col_ranking.download_button("⬇️ Baixar ranking (CSV)", df_ranking.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig'),
+                                "ranking_anomalias_km.csv", "text/csv", use_container_width=True)
+    col_anomalias.download_button("⬇️ Baixar anomalias (CSV)", df_anomalias.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig'),
+                                  "anomalias_km.csv", "text/csv", use_container_width=True)
+
+    # --- Detalhe por veículo ---
+    st.markdown("---")
+    st.subheader("Detalhe do veículo")
+    opcoes = dict(zip(df_ranking['placa'] + " - " + df_ranking['empresa'].fillna(''), df_ranking['veiculo_id']))
+    escolhido = st.selectbox("Veículo", list(opcoes))
+    veiculo_id = int(opcoes[escolhido])
+
+    detalhe = df_anomalias[df_anomalias['veiculo_id'] == veiculo_id].copy()
+    detalhe['tipo'] = detalhe['tipo'].map(NOMES_ANOMALIAS)
+    detalhe['fim_execucao'] = pd.to_datetime(detalhe['fim_execucao']).dt.strftime('%d/%m/%Y %H:%M')
+    st.dataframe(
+        detalhe[['fim_execucao', 'quilometragem', 'tipo', 'detalhe']].rename(columns={
+            'fim_execucao': 'Visita', 'quilometragem': 'KM', 'tipo': 'Anomalia', 'detalhe': 'Detalhe'}),
+        hide_index=True, use_container_width=True
+    )
+    st.link_button("✏️ Corrigir histórico e média", url=f"ajustar_media_km?veiculo_id={veiculo_id}")
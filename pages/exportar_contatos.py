@@ -4,6 +4,7 @@ import pandas as pd
 import io
 import re  # Importa a biblioteca de expressões regulares
 from database import get_connection, release_connection
+from auth_utils import exigir_login
 
 # NOVA FUNÇÃO, MAIS ROBUSTA, PARA PADRONIZAR TELEFONES
 def padronizar_telefone(numero):
@@ -56,40 +57,51 @@ def get_contacts_to_export(re_export_all=False):
         return pd.DataFrame(), pd.DataFrame()
 
     try:
-        # Query para responsáveis de empresas
-        query_responsaveis = """
-            SELECT nome_responsavel, contato_responsavel, nome_empresa, id AS cliente_id
-            FROM clientes
-            WHERE 
-                (nome_responsavel IS NOT NULL AND nome_responsavel <> '') AND
-                (contato_responsavel IS NOT NULL AND contato_responsavel <> '')
-        """
-        if not re_export_all:
-            query_responsaveis += " AND (data_ultima_exportacao IS NULL OR data_atualizacao_contato > data_ultima_exportacao)"
-
-        # Query para motoristas de veículos
-        query_motoristas = """
-            SELECT v.nome_motorista, v.contato_motorista, c.nome_empresa, v.placa, v.modelo, v.id AS veiculo_id
-            FROM veiculos v
-            LEFT JOIN clientes c ON v.cliente_id = c.id
-            WHERE
-                (v.nome_motorista IS NOT NULL AND v.nome_motorista <> '') AND
-                (v.contato_motorista IS NOT NULL AND v.contato_motorista <> '')
-        """
-        if not re_export_all:
-            query_motoristas += " AND (v.data_ultima_exportacao IS NULL OR v.data_atualizacao_contato > v.data_ultima_exportacao)"
-
-        df_responsaveis = pd.read_sql(query_responsaveis, conn)
-        df_motoristas = pd.read_sql(query_motoristas, conn)
-        
-        return df_responsaveis, df_motoristas
-
+        return consultar_contatos(conn, re_export_all)
     except Exception as e:
         st.error(f"Erro ao buscar contatos: {e}")
         return pd.DataFrame(), pd.DataFrame()
     finally:
         release_connection(conn)
 
+
+def queries_contatos(re_export_all=False):
+    """SQL das duas consultas de get_contacts_to_export: (responsáveis, motoristas)."""
+    # Query para responsáveis de empresas
+    query_responsaveis = """
+        SELECT nome_responsavel, contato_responsavel, nome_empresa, id AS cliente_id
+        FROM clientes
+        WHERE 
+            (nome_responsavel IS NOT NULL AND nome_responsavel <> '') AND
+            (contato_responsavel IS NOT NULL AND contato_responsavel <> '')
+    """
+    if not re_export_all:
+        query_responsaveis += " AND (data_ultima_exportacao IS NULL OR data_atualizacao_contato > data_ultima_exportacao)"
+
+    # Query para motoristas de veículos
+    query_motoristas = """
+        SELECT v.nome_motorista, v.contato_motorista, c.nome_empresa, v.placa, v.modelo, v.id AS veiculo_id
+        FROM veiculos v
+        LEFT JOIN clientes c ON v.cliente_id = c.id
+        WHERE
+            (v.nome_motorista IS NOT NULL AND v.nome_motorista <> '') AND
+            (v.contato_motorista IS NOT NULL AND v.contato_motorista <> '')
+    """
+    if not re_export_all:
+        query_motoristas += " AND (v.data_ultima_exportacao IS NULL OR v.data_atualizacao_contato > v.data_ultima_exportacao)"
+
+    return query_responsaveis, query_motoristas
+
+
+def consultar_contatos(conn, re_export_all=False):
+    """As duas consultas de get_contacts_to_export: (responsáveis, motoristas)."""
+    query_responsaveis, query_motoristas = queries_contatos(re_export_all)
+    df_responsaveis = pd.read_sql(query_responsaveis, conn)
+    df_motoristas = pd.read_sql(query_motoristas, conn)
+    
+    return df_responsaveis, df_motoristas
+
+
 def format_for_google_contacts(df_responsaveis, df_motoristas):
     """
     Formata os dataframes no padrão CSV do Google Contacts.
@@ -228,5 +240,7 @@ def app():
                     del st.session_state.ids_to_mark_exported
                     st.rerun()
 
-# Ponto de entrada da página
-app()
\ No newline at end of file
+# Ponto de entrada da página quando aberta direto pelo Streamlit
+if __name__ == "__main__":
+    exigir_login()
+    app()
\ No newline at end of file
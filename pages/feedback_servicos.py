@@ -2,10 +2,55 @@ import streamlit as st
 import pandas as pd
 from pages.ui_components import render_mobile_navbar
 from database import get_connection, release_connection
+from utils import aviso_historico_arquivado, get_inicio_historico
 from datetime import date, timedelta
 from urllib.parse import quote_plus
 import re
 
+QUERY_FEEDBACK_PENDENTE = """
+    -- As execuções do período vêm primeiro, e os serviços são buscados só para
+    -- elas (pelo índice de execucao_id), em vez de agrupar o histórico inteiro.
+    WITH execucoes AS (
+        SELECT id, veiculo_id, quilometragem, fim_execucao
+        FROM execucao_servico
+        WHERE status = 'finalizado'
+          AND data_feedback IS NULL
+          AND fim_execucao <= NOW() - INTERVAL '5 days'
+          AND fim_execucao >= %s::date     -- sem cast na coluna: usa o índice de fim_execucao
+    ), servicos_agrupados AS (
+        SELECT 
+            execucao_id, 
+            STRING_AGG(DISTINCT tipo, '; ') as lista_servicos
+        FROM (
+            SELECT execucao_id, tipo FROM servicos_solicitados_borracharia
+             WHERE status = 'finalizado' AND execucao_id IN (SELECT id FROM execucoes)
+            UNION ALL
+            SELECT execucao_id, tipo FROM servicos_solicitados_alinhamento
+             WHERE status = 'finalizado' AND execucao_id IN (SELECT id FROM execucoes)
+            UNION ALL
+            SELECT execucao_id, tipo FROM servicos_solicitados_manutencao
+             WHERE status = 'finalizado' AND execucao_id IN (SELECT id FROM execucoes)
+        ) s
+        GROUP BY execucao_id
+    )
+    SELECT
+        v.placa,
+        v.modelo,
+        v.nome_motorista,    -- CORRIGIDO: Nome exato da coluna na tabela 'veiculos'
+        v.contato_motorista, -- CORRIGIDO: Nome exato da coluna na tabela 'veiculos'
+        es.quilometragem,
+        MAX(es.fim_execucao) as ultima_data_servico,
+        STRING_AGG(sa.lista_servicos, '; ') as todos_os_servicos,
+        ARRAY_AGG(es.id) as lista_execucao_ids
+    FROM execucoes es
+    JOIN veiculos v ON es.veiculo_id = v.id
+    LEFT JOIN servicos_agrupados sa ON es.id = sa.execucao_id
+    GROUP BY
+        v.placa, v.modelo, es.quilometragem, v.nome_motorista, v.contato_motorista -- CORRIGIDO
+    ORDER BY
+        ultima_data_servico ASC;
+"""
+
 def app():
     st.title("📝 Controle de Feedback de Serviços")
     st.markdown("Acompanhe e registre o feedback dos serviços concluídos há 5 dias ou mais.")
@@ -46,13 +91,16 @@ def app():
     st.markdown("---")
     st.subheader("Filtro de Período")
     today = date.today()
+    inicio_historico = get_inicio_historico()
     
     start_date = st.date_input(
         "Mostrar serviços concluídos a partir de:",
-        value=today - timedelta(days=30),
+        value=max(today - timedelta(days=30), inicio_historico or date.min),
+        min_value=inicio_historico,
         max_value=today - timedelta(days=5),
         help="A lista mostrará apenas os serviços concluídos entre esta data e 5 dias atrás."
     )
+    aviso_historico_arquivado(inicio_historico)
     st.markdown("---")
 
     # --- BUSCA E EXIBIÇÃO DOS DADOS ---
@@ -63,43 +111,7 @@ def app():
 
     try:
         # ATUALIZADO: A query agora agrupa por visita (placa e quilometragem)
-        query = """
-            WITH servicos_agrupados AS (
-                SELECT 
-                    execucao_id, 
-                    STRING_AGG(DISTINCT tipo, '; ') as lista_servicos
-                FROM (
-                    SELECT execucao_id, tipo FROM servicos_solicitados_borracharia WHERE status = 'finalizado'
-                    UNION ALL
-                    SELECT execucao_id, tipo FROM servicos_solicitados_alinhamento WHERE status = 'finalizado'
-                    UNION ALL
-                    SELECT execucao_id, tipo FROM servicos_solicitados_manutencao WHERE status = 'finalizado'
-                ) s
-                GROUP BY execucao_id
-            )
-            SELECT
-                v.placa,
-                v.modelo,
-                v.nome_motorista,    -- CORRIGIDO: Nome exato da coluna na tabela 'veiculos'
-                v.contato_motorista, -- CORRIGIDO: Nome exato da coluna na tabela 'veiculos'
-                es.quilometragem,
-                MAX(es.fim_execucao) as ultima_data_servico,
-                STRING_AGG(sa.lista_servicos, '; ') as todos_os_servicos,
-                ARRAY_AGG(es.id) as lista_execucao_ids
-            FROM execucao_servico es
-            JOIN veiculos v ON es.veiculo_id = v.id
-            LEFT JOIN servicos_agrupados sa ON es.id = sa.execucao_id
-            WHERE 
-                es.status = 'finalizado'
-                AND es.data_feedback IS NULL
-                AND es.fim_execucao <= NOW() - INTERVAL '5 days'
-                AND es.fim_execucao::date >= %s
-            GROUP BY
-                v.placa, v.modelo, es.quilometragem, v.nome_motorista, v.contato_motorista -- CORRIGIDO
-            ORDER BY
-                ultima_data_servico ASC;
-        """
-        df_feedback = pd.read_sql(query, conn, params=(start_date,))
+        df_feedback = pd.read_sql(QUERY_FEEDBACK_PENDENTE, conn, params=(start_date,))
 
         if df_feedback.empty:
             st.info("🎉 Nenhum serviço pendente de feedback para o período selecionado.")
@@ -1,17 +1,72 @@
 import streamlit as st
 import pandas as pd
 from pages.ui_components import render_mobile_navbar
-render_mobile_navbar(active_page="filas")
-from database import get_connection, release_connection
-from streamlit_autorefresh import st_autorefresh
+from auth_utils import exigir_login
+from controle_versao import CHAVE_PATIO, get_versao
+from estado_patio import get_snapshot_patio
+from previsao_eta import MS_TZ, calcular_eta, get_modelo_eta
+from registro_paginas import fragmento_da_pagina
+from datetime import datetime
+
+# O painel verifica a versão do pátio a cada poucos segundos (consulta de uma
+# linha, compartilhada entre as TVs) e só refaz as consultas pesadas quando
+# alguma alocação, finalização ou cadastro mudou o pátio.
+INTERVALO_PAINEL_S = 5
+
+
+def _descricao_servicos(servicos):
+    return servicos['tipo'] + ' (Qtd: ' + servicos['quantidade'].astype('Int64').astype(str) + ')'
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def buscar_painel(versao, minuto):
+    """
+    Monta os dados do painel a partir do snapshot compartilhado do pátio.
+    Como a versão faz parte da chave do cache, todas as TVs e sessões
+    reaproveitam o mesmo resultado até a próxima alteração; o minuto atual
+    também entra na chave para as previsões acompanharem o relógio.
+    """
+    snapshot = get_snapshot_patio(versao)
+    boxes = snapshot["boxes"]
+    servicos = snapshot["servicos"].assign(descricao=lambda df: _descricao_servicos(df))
+
+    em_andamento = servicos[servicos['status'] == 'em_andamento']
+    lista_por_execucao = em_andamento.groupby('execucao_id')['descricao'].agg('<br>'.join)
+    ocupados = boxes[boxes['execucao_id'].notna()]
+    df_boxes = pd.DataFrame({
+        'box_id': ocupados.index,
+        'placa': ocupados['placa'].values,
+        'empresa': ocupados['empresa'].values,
+        'funcionario': ocupados['funcionario_nome'].values,
+        'lista_servicos': ocupados['execucao_id'].map(lista_por_execucao).fillna('').values,
+    })
+
+    pendentes = servicos[servicos['status'] == 'pendente']
+    df_fila = (pendentes.groupby(['veiculo_id', 'placa', 'empresa'], sort=False, dropna=False)
+                        .agg(servicos=('descricao', '<br>'.join), chegada=('data_solicitacao', 'min'))
+                        .reset_index()
+                        .sort_values('chegada', kind='stable')
+                        .reset_index(drop=True))
+
+    try:
+        fim_boxes, eta_fila = calcular_eta(snapshot, get_modelo_eta(), minuto)
+        df_boxes['fim_previsto'] = df_boxes['box_id'].map(fim_boxes).values
+        df_fila = df_fila.merge(eta_fila, on='veiculo_id', how='left')
+    except Exception:
+        # Sem previsão o painel continua funcionando, só sem os horários
+        df_boxes['fim_previsto'] = pd.NaT
+        df_fila['inicio_previsto'] = pd.NaT
+        df_fila['fim_previsto'] = pd.NaT
+    return df_boxes, df_fila
+
+
+def _hora(ts):
+    return ts.strftime('%H:%M') if pd.notna(ts) else '--:--'
 
 
 def app():
     # --- CONFIGURAÇÕES DA PÁGINA ---
     st.set_page_config(layout="wide")
-    
-    # Atualiza a página a cada 30 segundos
-    st_autorefresh(interval=30000, key="datarefresh")
 
     # --- CSS APRIMORADO PARA O PAINEL DE TV ---
     st.markdown("""
@@ -81,113 +136,78 @@ def app():
     st.title("Painel Operacional do Pátio")
     st.markdown("---")
 
-    conn = get_connection()
-    if not conn:
-        st.error("Falha ao conectar ao banco de dados.")
-        return
+    _painel()
 
-    try:
-        # --- SEÇÃO 1: VEÍCULOS EM ATENDIMENTO NOS BOXES ---
-        st.markdown('<p class="section-header">EM ATENDIMENTO</p>', unsafe_allow_html=True)
-        
-        # MUDANÇA: Query agora busca a lista de serviços para cada box
-        query_boxes = """
-            WITH servicos_em_andamento AS (
-                SELECT 
-                    execucao_id, 
-                    STRING_AGG(tipo || ' (Qtd: ' || quantidade || ')', '<br>') as lista_servicos
-                FROM (
-                    SELECT execucao_id, tipo, quantidade FROM servicos_solicitados_borracharia WHERE status = 'em_andamento'
-                    UNION ALL
-                    SELECT execucao_id, tipo, quantidade FROM servicos_solicitados_alinhamento WHERE status = 'em_andamento'
-                    UNION ALL
-                    SELECT execucao_id, tipo, quantidade FROM servicos_solicitados_manutencao WHERE status = 'em_andamento'
-                ) s
-                GROUP BY execucao_id
-            )
-            SELECT 
-                b.id as box_id,
-                v.placa,
-                v.empresa,
-                f.nome as funcionario,
-                sa.lista_servicos
-            FROM boxes b
-            JOIN execucao_servico es ON b.id = es.box_id
-            JOIN veiculos v ON es.veiculo_id = v.id
-            LEFT JOIN funcionarios f ON es.funcionario_id = f.id
-            LEFT JOIN servicos_em_andamento sa ON es.id = sa.execucao_id
-            WHERE es.status = 'em_andamento' AND b.id > 0
-            ORDER BY b.id;
-        """
-        df_boxes = pd.read_sql(query_boxes, conn)
-
-        if not df_boxes.empty:
-            cols = st.columns(len(df_boxes))
-            for i, row in df_boxes.iterrows():
-                with cols[i]:
-                    # MUDANÇA: Exibe a lista de serviços no cartão
-                    st.markdown(f'''
-                        <div class="card">
-                            <p class="card-title">BOX {row["box_id"]}</p>
-                            <p class="placa-text">{row["placa"]}</p>
-                            <p class="card-content">
-                                <b>Empresa:</b> {row["empresa"]}<br>
-                                <b>Mecânico:</b> {row["funcionario"]}
-                            </p>
-                            <hr>
-                            <p class="service-list">{row["lista_servicos"] or "N/A"}</p>
-                        </div>
-                    ''', unsafe_allow_html=True)
-        else:
-            st.info("Nenhum veículo em atendimento nos boxes no momento.")
-
-        st.markdown("---")
-
-        # --- SEÇÃO 2: FILA DE ESPERA (SERVIÇOS PENDENTES) ---
-        st.markdown('<p class="section-header">FILA DE ESPERA</p>', unsafe_allow_html=True)
-        
-        # MUDANÇA: Query agora busca os serviços com suas quantidades
-        query_fila = """
-            SELECT 
-                v.placa,
-                v.empresa,
-                STRING_AGG(s.tipo || ' (Qtd: ' || s.quantidade || ')', '<br>') as servicos
-            FROM (
-                SELECT veiculo_id, tipo, quantidade, data_solicitacao FROM servicos_solicitados_borracharia WHERE status = 'pendente'
-                UNION ALL
-                SELECT veiculo_id, tipo, quantidade, data_solicitacao FROM servicos_solicitados_alinhamento WHERE status = 'pendente'
-                UNION ALL
-                SELECT veiculo_id, tipo, quantidade, data_solicitacao FROM servicos_solicitados_manutencao WHERE status = 'pendente'
-            ) s
-            JOIN veiculos v ON s.veiculo_id = v.id
-            GROUP BY v.placa, v.empresa, s.veiculo_id
-            ORDER BY MIN(s.data_solicitacao) ASC;
-        """
-        df_fila = pd.read_sql(query_fila, conn)
-
-        if not df_fila.empty:
-            col1, col2, col3 = st.columns(3)
-            cols_fila = [col1, col2, col3]
-            
-            for i, row in df_fila.iterrows():
-                with cols_fila[i % 3]:
-                    # MUDANÇA: Adiciona o número de ordem e a lista detalhada de serviços
-                    st.markdown(f'''
-                        <div class="card">
-                            <p class="card-title">
-                                <span class="queue-number">{i + 1}º</span>
-                                <span>NA FILA</span>
-                            </p>
-                            <p class="placa-text">{row["placa"]}</p>
-                            <p class="card-content"><b>Empresa:</b> {row["empresa"]}</p>
-                            <hr>
-                            <p class="service-list">{row["servicos"] or "N/A"}</p>
-                        </div>
-                    ''', unsafe_allow_html=True)
-        else:
-            st.info("Fila de espera vazia.")
 
+@st.fragment(run_every=INTERVALO_PAINEL_S)
+@fragmento_da_pagina("Filas de Serviço")
+def _painel():
+    # Só este trecho é reexecutado periodicamente; CSS e título ficam como estão.
+    try:
+        minuto = datetime.now(MS_TZ).replace(tzinfo=None, second=0, microsecond=0)
+        df_boxes, df_fila = buscar_painel(get_versao(CHAVE_PATIO), minuto)
     except Exception as e:
         st.error(f"Ocorreu um erro ao buscar os dados: {e}")
-    finally:
-        release_connection(conn)
\ No newline at end of file
+        return
+
+    # --- SEÇÃO 1: VEÍCULOS EM ATENDIMENTO NOS BOXES ---
+    st.markdown('<p class="section-header">EM ATENDIMENTO</p>', unsafe_allow_html=True)
+
+    if not df_boxes.empty:
+        cols = st.columns(len(df_boxes))
+        for i, row in df_boxes.iterrows():
+            with cols[i]:
+                # MUDANÇA: Exibe a lista de serviços no cartão
+                st.markdown(f'''
+                    <div class="card">
+                        <p class="card-title">BOX {row["box_id"]}</p>
+                        <p class="placa-text">{row["placa"]}</p>
+                        <p class="card-content">
+                            <b>Empresa:</b> {row["empresa"]}<br>
+                            <b>Mecânico:</b> {row["funcionario"]}<br>
+                            <b>Término previsto:</b> {_hora(row["fim_previsto"])}
+                        </p>
+                        <hr>
+                        <p class="service-list">{row["lista_servicos"] or "N/A"}</p>
+                    </div>
+                ''', unsafe_allow_html=True)
+    else:
+        st.info("Nenhum veículo em atendimento nos boxes no momento.")
+
+    st.markdown("---")
+
+    # --- SEÇÃO 2: FILA DE ESPERA (SERVIÇOS PENDENTES) ---
+    st.markdown('<p class="section-header">FILA DE ESPERA</p>', unsafe_allow_html=True)
+
+    if not df_fila.empty:
+        col1, col2, col3 = st.columns(3)
+        cols_fila = [col1, col2, col3]
+        
+        for i, row in df_fila.iterrows():
+            with cols_fila[i % 3]:
+                # MUDANÇA: Adiciona o número de ordem e a lista detalhada de serviços
+                st.markdown(f'''
+                    <div class="card">
+                        <p class="card-title">
+                            <span class="queue-number">{i + 1}º</span>
+                            <span>NA FILA</span>
+                        </p>
+                        <p class="placa-text">{row["placa"]}</p>
+                        <p class="card-content">
+                            <b>Empresa:</b> {row["empresa"]}<br>
+                            <b>Início previsto:</b> {_hora(row["inicio_previsto"])}<br>
+                            <b>Término previsto:</b> {_hora(row["fim_previsto"])}
+                        </p>
+                        <hr>
+                        <p class="service-list">{row["servicos"] or "N/A"}</p>
+                    </div>
+                ''', unsafe_allow_html=True)
+    else:
+        st.info("Fila de espera vazia.")
+
+
+# Aberta direto pelo Streamlit (links da barra de navegação do celular)
+if __name__ == "__main__":
+    exigir_login()
+    render_mobile_navbar(active_page="filas")
+    app()
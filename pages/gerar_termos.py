@@ -3,6 +3,7 @@
 import streamlit as st
 import pandas as pd
 from database import get_connection, release_connection
+from auth_utils import exigir_login
 from datetime import datetime
 import locale
 import psycopg2.extras
@@ -255,4 +256,5 @@ def app():
     st.components.v1.html(html_para_impressao, height=600, scrolling=True)
 
 if __name__ == "__main__":
+    exigir_login()
     app()
\ No newline at end of file
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from database import get_connection, release_connection
 from utils import hash_password # Importa a função de hash centralizada
+from controle_versao import CHAVE_USUARIOS, incrementar_versao, versao_alterada
 import psycopg2
 
 def app():
@@ -49,7 +50,9 @@ def app():
                             "INSERT INTO usuarios (nome, username, password_hash, role) VALUES (%s, %s, %s, %s)",
                             (nome, username, password_hash, role)
                         )
+                        incrementar_versao(cursor, CHAVE_USUARIOS)
                         conn.commit()
+                    versao_alterada()
                     st.success(f"Usuário '{username}' adicionado com sucesso!")
                     st.rerun() # Recarrega a página para mostrar o novo usuário na lista
                 except psycopg2.IntegrityError:
@@ -1,6 +1,49 @@
 import streamlit as st
 import pandas as pd
 from database import get_connection, release_connection
+from utils import normalizar_placa
+
+QUERY_HISTORICO_VEICULO = """
+    SELECT
+        es.quilometragem, es.inicio_execucao, es.fim_execucao, es.status as status_execucao,
+        es.nome_motorista, es.contato_motorista,
+        serv.area, serv.tipo, serv.quantidade, serv.status as status_servico, f.nome as funcionario_nome,
+        serv.observacao_execucao
+    FROM execucao_servico es
+    LEFT JOIN (
+        SELECT execucao_id, 'Borracharia' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_borracharia UNION ALL
+        SELECT execucao_id, 'Alinhamento' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_alinhamento UNION ALL
+        SELECT execucao_id, 'Manutenção Mecânica' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_manutencao
+    ) serv ON es.id = serv.execucao_id
+    LEFT JOIN funcionarios f ON serv.funcionario_id = f.id
+    JOIN veiculos v ON es.veiculo_id = v.id
+    WHERE v.placa_normalizada = %s
+    ORDER BY es.inicio_execucao DESC, serv.area;
+"""
+
+# Visitas arquivadas (arquivar_historico.py): lidas só quando pedidas
+QUERY_RESUMO_ARQUIVO = """
+    SELECT r.visitas, r.primeira_visita, r.ultima_visita
+    FROM execucao_servico_arquivo_resumo r
+    JOIN veiculos v ON r.veiculo_id = v.id
+    WHERE v.placa_normalizada = %s;
+"""
+
+QUERY_HISTORICO_ARQUIVADO = """
+    SELECT
+        es.quilometragem, es.inicio_execucao, es.fim_execucao, es.status as status_execucao,
+        es.nome_motorista, es.contato_motorista,
+        CASE serv->>'area' WHEN 'borracharia' THEN 'Borracharia' WHEN 'alinhamento' THEN 'Alinhamento'
+                           ELSE 'Manutenção Mecânica' END as area,
+        serv->>'tipo' as tipo, (serv->>'quantidade')::int as quantidade, serv->>'status' as status_servico,
+        f.nome as funcionario_nome, serv->>'observacao_execucao' as observacao_execucao
+    FROM execucao_servico_arquivo es
+    LEFT JOIN LATERAL jsonb_array_elements(es.servicos) serv ON TRUE
+    LEFT JOIN funcionarios f ON (serv->>'funcionario_id')::int = f.id
+    JOIN veiculos v ON es.veiculo_id = v.id
+    WHERE v.placa_normalizada = %s
+    ORDER BY es.inicio_execucao DESC, area;
+"""
 
 def app():
     st.title("📋 Histórico por Veículo")
@@ -16,24 +59,17 @@ def app():
         return
 
     try:
-        query = """
-            SELECT
-                es.quilometragem, es.inicio_execucao, es.fim_execucao, es.status as status_execucao,
-                es.nome_motorista, es.contato_motorista,
-                serv.area, serv.tipo, serv.quantidade, serv.status as status_servico, f.nome as funcionario_nome,
-                serv.observacao_execucao
-            FROM execucao_servico es
-            LEFT JOIN (
-                SELECT execucao_id, 'Borracharia' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_borracharia UNION ALL
-                SELECT execucao_id, 'Alinhamento' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_alinhamento UNION ALL
-                SELECT execucao_id, 'Manutenção Mecânica' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_manutencao
-            ) serv ON es.id = serv.execucao_id
-            LEFT JOIN funcionarios f ON serv.funcionario_id = f.id
-            JOIN veiculos v ON es.veiculo_id = v.id
-            WHERE v.placa = %s
-            ORDER BY es.inicio_execucao DESC, serv.area;
-        """
-        df_completo = pd.read_sql(query, conn, params=(search_placa,))
+        placa = normalizar_placa(search_placa)
+        df_completo = pd.read_sql(QUERY_HISTORICO_VEICULO, conn, params=(placa,))
+
+        resumo_arquivo = pd.read_sql(QUERY_RESUMO_ARQUIVO, conn, params=(placa,))
+        if not resumo_arquivo.empty:
+            arquivo = resumo_arquivo.iloc[0]
+            periodo = (f"de {pd.to_datetime(arquivo['primeira_visita']).strftime('%d/%m/%Y')} "
+                       f"a {pd.to_datetime(arquivo['ultima_visita']).strftime('%d/%m/%Y')}")
+            if st.toggle(f"Incluir {arquivo['visitas']} visita(s) arquivada(s) ({periodo})", key="hist_arquivado"):
+                df_arquivado = pd.read_sql(QUERY_HISTORICO_ARQUIVADO, conn, params=(placa,))
+                df_completo = pd.concat([df_completo, df_arquivado], ignore_index=True)
 
         if df_completo.empty:
             st.info("Nenhum histórico encontrado para esta placa.")
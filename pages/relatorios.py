@@ -3,47 +3,40 @@ import pandas as pd
 from database import get_connection, release_connection
 from datetime import date, timedelta
 import plotly.express as px
+from agendador import get_duracoes_historicas, simular_dia
+from utils import aviso_historico_arquivado, get_inicio_historico
+from snapshot_analitico import dados_relatorio_snapshot
+from motor_relatorios import DUCKDB_DISPONIVEL, DIAS_RETORNO, agregar, dados_relatorio_duckdb, dados_relatorio_postgres
+
+# Com RELATORIOS_DO_SNAPSHOT = true nos secrets, os relatórios leem a cópia em
+# Parquet gerada por snapshot_analitico.py em vez de consultar o banco (pelo
+# DuckDB, se estiver instalado, que também habilita a aba de análises históricas).
+RELATORIOS_DO_SNAPSHOT = bool(st.secrets.get("RELATORIOS_DO_SNAPSHOT", False))
 
 # Função de busca de dados foi melhorada para calcular a duração dos serviços
 @st.cache_data(ttl=600)
 def buscar_dados_relatorio(start_date, end_date):
     """Busca e une todos os dados necessários para os relatórios, já calculando a duração."""
+    if RELATORIOS_DO_SNAPSHOT:
+        if DUCKDB_DISPONIVEL:
+            return dados_relatorio_duckdb(start_date, end_date)
+        return dados_relatorio_snapshot(start_date, end_date)
+
     conn = get_connection()
     if not conn:
         st.error("Falha ao obter conexão para o relatório.")
         return pd.DataFrame()
 
     try:
-        # Query final e completa com todos os JOINs
-        query = """
-            SELECT
-                es.quilometragem, es.inicio_execucao, es.fim_execucao,
-                EXTRACT(EPOCH FROM (es.fim_execucao - es.inicio_execucao)) / 60 AS duracao_minutos,
-                es.box_id, v.placa, v.empresa,
-                serv.tipo as tipo_servico,
-                func.nome as funcionario_nome,
-                usr_aloc.nome as alocado_por,
-                usr_final.nome as finalizado_por
-            FROM execucao_servico es
-            JOIN veiculos v ON es.veiculo_id = v.id
-            LEFT JOIN (
-                SELECT execucao_id, tipo, funcionario_id FROM servicos_solicitados_borracharia UNION ALL
-                SELECT execucao_id, tipo, funcionario_id FROM servicos_solicitados_alinhamento UNION ALL
-                SELECT execucao_id, tipo, funcionario_id FROM servicos_solicitados_manutencao
-            ) serv ON es.id = serv.execucao_id
-            LEFT JOIN funcionarios func ON serv.funcionario_id = func.id
-            LEFT JOIN usuarios usr_aloc ON es.usuario_alocacao_id = usr_aloc.id
-            LEFT JOIN usuarios usr_final ON es.usuario_finalizacao_id = usr_final.id
-            WHERE
-                es.status = 'finalizado'
-                AND es.fim_execucao BETWEEN %s AND %s;
-        """
-        end_date_inclusive = end_date + timedelta(days=1)
-        df = pd.read_sql(query, conn, params=(start_date, end_date_inclusive))
-        return df
+        return dados_relatorio_postgres(conn, start_date, end_date)
     finally:
         release_connection(conn)
 
+@st.cache_data(ttl=600, show_spinner=False)
+def buscar_agregacao(nome, start_date, end_date, por="box"):
+    """Agregações do DuckDB sobre o snapshot (motor_relatorios.QUERIES_AGREGACAO)."""
+    return agregar(nome, start_date, end_date, por=por)
+
 def app():
     st.title("📊 Dashboard de Gestão")
     st.markdown("Use os filtros para analisar a operação do pátio.")
@@ -56,9 +49,13 @@ def app():
     
     st.subheader("Filtro de Período")
     today = date.today()
+    # O snapshot em Parquet pode ter o período já arquivado; só o banco do pátio começa em inicio_historico
+    inicio_historico = None if RELATORIOS_DO_SNAPSHOT else get_inicio_historico()
     col1, col2 = st.columns(2)
-    start_date = col1.date_input("Data de Início", today - timedelta(days=30), key="bi_start_date")
-    end_date = col2.date_input("Data de Fim", today, key="bi_end_date")
+    start_date = col1.date_input("Data de Início", max(today - timedelta(days=30), inicio_historico or date.min),
+                                 min_value=inicio_historico, key="bi_start_date")
+    end_date = col2.date_input("Data de Fim", today, min_value=inicio_historico, key="bi_end_date")
+    aviso_historico_arquivado(inicio_historico)
 
     if start_date > end_date:
         st.error("A data de início não pode ser posterior à data de fim.")
@@ -71,7 +68,9 @@ def app():
         st.info(f"Nenhum serviço finalizado no período selecionado.")
     else:
         # Abas para cada área de análise
-        tab_op, tab_com, tab_eq = st.tabs(["Visão Operacional", "Visão Comercial", "Visão de Equipe"])
+        abas = st.tabs(["Visão Operacional", "Visão Comercial", "Visão de Equipe", "Simulação de Agenda"]
+                       + (["Análises Históricas"] if RELATORIOS_DO_SNAPSHOT else []))
+        tab_op, tab_com, tab_eq, tab_sim = abas[:4]
 
         with tab_op:
             st.header("Análise de Eficiência do Pátio")
@@ -113,4 +112,61 @@ def app():
                                 title="Contagem de Serviços por Funcionário e Tipo")
                 st.plotly_chart(fig, use_container_width=True)
             else:
-                st.info("Não há dados suficientes para gerar a análise de especialização.")
\ No newline at end of file
+                st.info("Não há dados suficientes para gerar a análise de especialização.")
+
+        with tab_sim:
+            st.header("Simulação do Agendador")
+            st.caption("Reexecuta um dia do período com os mesmos boxes e mecânicos e compara a espera real "
+                       "com a ordem de chegada (FIFO) e com o agendador (menor serviço primeiro).")
+            dia = st.date_input("Dia a simular", end_date, min_value=start_date, max_value=end_date, key="bi_dia_simulacao")
+            if st.button("Simular dia", key="bi_simular"):
+                conn = get_connection()
+                if not conn:
+                    st.error("Falha ao obter conexão para a simulação.")
+                    st.stop()
+                try:
+                    resultado = simular_dia(conn, dia, get_duracoes_historicas())
+                finally:
+                    release_connection(conn)
+
+                if not resultado:
+                    st.info("Nenhum serviço finalizado iniciado nesse dia.")
+                else:
+                    st.write(f"{resultado['trabalhos']} trabalhos, {resultado['boxes']} boxes, {resultado['mecanicos']} mecânicos.")
+                    resumo = pd.DataFrame(
+                        {nome: resultado[chave] for nome, chave in
+                         (("Real", "real"), ("FIFO", "fifo"), ("Agendador", "agendador")) if resultado[chave]}
+                    ).T.rename(columns={'espera_total_min': 'Espera total (min)',
+                                        'espera_media_min': 'Espera média (min)',
+                                        'ultimo_fim_min': 'Último término (min após 00:00)'})
+                    st.dataframe(resumo, use_container_width=True)
+                    st.subheader("Agenda proposta")
+                    st.dataframe(resultado['agenda'], use_container_width=True, hide_index=True)
+
+        if RELATORIOS_DO_SNAPSHOT:
+            with abas[4]:
+                if not DUCKDB_DISPONIVEL:
+                    st.warning("As análises históricas precisam do pacote duckdb, que não está instalado "
+                               "neste servidor (pip install -r requirements.txt).")
+                else:
+                    st.header("Análises do Período")
+                    st.caption("Calculadas pelo DuckDB sobre o snapshot em Parquet; períodos de vários anos respondem em segundos.")
+
+                    st.subheader("Duração por Tipo de Serviço")
+                    st.dataframe(buscar_agregacao("duracao_por_tipo", start_date, end_date).rename(columns={
+                        'tipo_servico': 'Serviço', 'servicos': 'Serviços', 'media_min': 'Média (min)',
+                        'mediana_min': 'Mediana (min)', 'p90_min': 'P90 (min)'}), hide_index=True, use_container_width=True)
+
+                    st.subheader("Produtividade")
+                    nomes_grupo = {"box": "Box", "funcionario": "Mecânico", "empresa": "Empresa"}
+                    por = st.radio("Agrupar por", list(nomes_grupo), horizontal=True, key="bi_produtividade_por",
+                                   format_func=nomes_grupo.get)
+                    st.dataframe(buscar_agregacao("produtividade", start_date, end_date, por).rename(columns={
+                        'grupo': nomes_grupo[por], 'execucoes': 'Execuções', 'servicos': 'Serviços', 'horas': 'Horas',
+                        'media_execucao_min': 'Média por execução (min)'}), hide_index=True, use_container_width=True)
+
+                    st.subheader("Recorrência de Veículos")
+                    st.dataframe(buscar_agregacao("recorrencia", start_date, end_date).rename(columns={
+                        'placa': 'Placa', 'empresa': 'Empresa', 'visitas': 'Visitas',
+                        f'retornos_{DIAS_RETORNO}_dias': f'Retornos em até {DIAS_RETORNO} dias',
+                        'intervalo_medio_dias': 'Intervalo médio (dias)'}), hide_index=True, use_container_width=True)
@@ -3,7 +3,8 @@
 import streamlit as st
 import pandas as pd
 from pages.ui_components import render_mobile_navbar
-render_mobile_navbar(active_page="revisao")
+from auth_utils import exigir_login
+from instrumentacao import trecho
 from database import get_connection, release_connection
 from datetime import datetime
 import pytz
@@ -15,6 +16,49 @@ import psycopg2.extras
 
 MS_TZ = pytz.timezone('America/Campo_Grande')
 
+# Veículos com média de KM/dia e sem revisão proativa registrada, com a última visita
+QUERY_CANDIDATOS_REVISAO = """
+    WITH ranked_visits AS (
+        SELECT veiculo_id, id as execucao_id, fim_execucao, quilometragem,
+               ROW_NUMBER() OVER(PARTITION BY veiculo_id ORDER BY fim_execucao DESC) as rn
+        FROM execucao_servico WHERE status = 'finalizado' AND quilometragem IS NOT NULL
+    ),
+    ultima_visita AS (
+        SELECT veiculo_id, execucao_id, fim_execucao as data_ultima_visita, quilometragem as km_ultima_visita
+        FROM ranked_visits WHERE rn = 1
+    ),
+    servicos_ultima_visita AS (
+        SELECT uv.veiculo_id, STRING_AGG(s.tipo, '; ') as servicos_anteriores
+        FROM ultima_visita uv
+        LEFT JOIN (
+            SELECT execucao_id, tipo FROM servicos_solicitados_borracharia UNION ALL
+            SELECT execucao_id, tipo FROM servicos_solicitados_alinhamento UNION ALL
+            SELECT execucao_id, tipo FROM servicos_solicitados_manutencao
+        ) s ON uv.execucao_id = s.execucao_id GROUP BY uv.veiculo_id
+    ),
+    -- Quem não voltou desde o corte do arquivo: última visita vem do resumo
+    ultima_visita_geral AS (
+        SELECT uv.veiculo_id, uv.data_ultima_visita, uv.km_ultima_visita, suv.servicos_anteriores
+        FROM ultima_visita uv
+        LEFT JOIN servicos_ultima_visita suv ON uv.veiculo_id = suv.veiculo_id
+        UNION ALL
+        SELECT r.veiculo_id, r.data_ultima_finalizada, r.km_ultima_finalizada, r.servicos_ultima_finalizada
+        FROM execucao_servico_arquivo_resumo r
+        WHERE r.km_ultima_finalizada IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM ultima_visita uv WHERE uv.veiculo_id = r.veiculo_id)
+    )
+    SELECT
+        v.id as veiculo_id, v.placa, v.empresa, v.modelo, v.ano_modelo,
+        v.nome_motorista, v.contato_motorista, v.media_km_diaria,
+        v.cliente_id, c.nome_responsavel, c.contato_responsavel,
+        uv.data_ultima_visita, uv.km_ultima_visita, uv.servicos_anteriores
+    FROM veiculos v
+    JOIN ultima_visita_geral uv ON v.id = uv.veiculo_id
+    LEFT JOIN clientes c ON v.cliente_id = c.id
+    WHERE v.media_km_diaria IS NOT NULL AND v.media_km_diaria > 0
+    AND v.data_revisao_proativa IS NULL;
+"""
+
 def app():
     st.title("📞 Revisão Proativa de Clientes")
     st.markdown("Identifique, contate e atualize os dados de veículos que precisam de uma nova revisão.")
@@ -223,38 +267,7 @@ def app():
 
     try:
         with st.spinner("Buscando veículos e fazendo previsões..."):
-            query = """
-                WITH ranked_visits AS (
-                    SELECT veiculo_id, id as execucao_id, fim_execucao, quilometragem,
-                           ROW_NUMBER() OVER(PARTITION BY veiculo_id ORDER BY fim_execucao DESC) as rn
-                    FROM execucao_servico WHERE status = 'finalizado' AND quilometragem IS NOT NULL
-                ),
-                ultima_visita AS (
-                    SELECT veiculo_id, execucao_id, fim_execucao as data_ultima_visita, quilometragem as km_ultima_visita
-                    FROM ranked_visits WHERE rn = 1
-                ),
-                servicos_ultima_visita AS (
-                    SELECT uv.veiculo_id, STRING_AGG(s.tipo, '; ') as servicos_anteriores
-                    FROM ultima_visita uv
-                    LEFT JOIN (
-                        SELECT execucao_id, tipo FROM servicos_solicitados_borracharia UNION ALL
-                        SELECT execucao_id, tipo FROM servicos_solicitados_alinhamento UNION ALL
-                        SELECT execucao_id, tipo FROM servicos_solicitados_manutencao
-                    ) s ON uv.execucao_id = s.execucao_id GROUP BY uv.veiculo_id
-                )
-                SELECT
-                    v.id as veiculo_id, v.placa, v.empresa, v.modelo, v.ano_modelo,
-                    v.nome_motorista, v.contato_motorista, v.media_km_diaria,
-                    v.cliente_id, c.nome_responsavel, c.contato_responsavel,
-                    uv.data_ultima_visita, uv.km_ultima_visita, suv.servicos_anteriores
-                FROM veiculos v
-                JOIN ultima_visita uv ON v.id = uv.veiculo_id
-                LEFT JOIN servicos_ultima_visita suv ON v.id = suv.veiculo_id
-                LEFT JOIN clientes c ON v.cliente_id = c.id
-                WHERE v.media_km_diaria IS NOT NULL AND v.media_km_diaria > 0
-                AND v.data_revisao_proativa IS NULL;
-            """
-            df = pd.read_sql(query, conn)
+            df = pd.read_sql(QUERY_CANDIDATOS_REVISAO, conn)
 
         if df.empty:
             st.info("Não há veículos com média de KM calculada para exibir.")
@@ -292,7 +305,7 @@ def app():
             veiculos_pagina_atual = veiculos_para_contatar.iloc[start_index:end_index]
 
             for _, veiculo in veiculos_pagina_atual.iterrows():
-                with st.container(border=True):
+                with st.container(border=True), trecho("render"):
                     col1, col2 = st.columns([0.7, 0.3])
                     with col1:
                         st.markdown(f"**Veículo:** `{veiculo['placa']}` - {veiculo['modelo']} ({veiculo['empresa']})")
@@ -407,3 +420,10 @@ def app():
         st.exception(e)
     finally:
         release_connection(conn)
+
+
+# Aberta direto pelo Streamlit (links da barra de navegação do celular)
+if __name__ == "__main__":
+    exigir_login()
+    render_mobile_navbar(active_page="revisao")
+    app()
@@ -4,6 +4,45 @@ import streamlit as st
 import pandas as pd
 from database import get_connection, release_connection
 from datetime import date, timedelta
+from controle_versao import CHAVE_PATIO, incrementar_versao, versao_alterada
+from instrumentacao import trecho
+from utils import aviso_historico_arquivado, get_inicio_historico
+
+# As execuções do período vêm primeiro, e os serviços são buscados só para
+# elas (pelo índice de execucao_id), em vez de ler o histórico inteiro.
+QUERY_SERVICOS_CONCLUIDOS = """
+    WITH execucoes AS (
+        SELECT id, veiculo_id, quilometragem, fim_execucao, nome_motorista, contato_motorista
+        FROM execucao_servico
+        WHERE status = 'finalizado'
+          AND fim_execucao >= %(inicio)s
+          AND fim_execucao < %(fim)s
+    )
+    SELECT
+        es.id as execucao_id,
+        es.veiculo_id, es.quilometragem, es.fim_execucao,
+        es.nome_motorista, es.contato_motorista,
+        v.placa, v.empresa,
+        serv.area, serv.tipo, serv.quantidade, serv.status, f.nome as funcionario_nome,
+        serv.observacao_execucao
+    FROM execucoes es
+    JOIN veiculos v ON es.veiculo_id = v.id
+    LEFT JOIN (
+        SELECT execucao_id, 'Borracharia' as area, tipo, quantidade, status, funcionario_id, observacao_execucao
+          FROM servicos_solicitados_borracharia
+         WHERE execucao_id IN (SELECT id FROM execucoes)
+        UNION ALL
+        SELECT execucao_id, 'Alinhamento' as area, tipo, quantidade, status, funcionario_id, observacao_execucao
+          FROM servicos_solicitados_alinhamento
+         WHERE execucao_id IN (SELECT id FROM execucoes)
+        UNION ALL
+        SELECT execucao_id, 'Manutenção Mecânica' as area, tipo, quantidade, status, funcionario_id, observacao_execucao
+          FROM servicos_solicitados_manutencao
+         WHERE execucao_id IN (SELECT id FROM execucoes)
+    ) serv ON es.id = serv.execucao_id
+    LEFT JOIN funcionarios f ON serv.funcionario_id = f.id
+    ORDER BY es.fim_execucao DESC, serv.area;
+"""
 
 def reverter_visita(conn, veiculo_id, quilometragem):
     """
@@ -36,8 +75,10 @@ def reverter_visita(conn, veiculo_id, quilometragem):
                 "UPDATE execucao_servico SET status = 'cancelado' WHERE id = ANY(%s)",
                 (execucao_ids,)
             )
+            incrementar_versao(cursor, CHAVE_PATIO)
 
             conn.commit()
+            versao_alterada()
             st.success("Visita revertida com sucesso! Os serviços estão pendentes novamente na tela de alocação.")
             st.rerun()
 
@@ -52,20 +93,23 @@ def app():
 
     st.subheader("Filtrar por Período de Conclusão")
     today = date.today()
+    inicio_historico = get_inicio_historico()
     
     selected_dates = st.date_input(
         "Selecione um dia ou um intervalo de datas",
-        value=(today - timedelta(days=30), today),
+        value=(max(today - timedelta(days=30), inicio_historico or date.min), today),
+        min_value=inicio_historico,
         max_value=today,
         key="date_filter_concluidos"
     )
+    aviso_historico_arquivado(inicio_historico)
 
     if len(selected_dates) == 2:
         start_date, end_date = selected_dates
         end_date_inclusive = end_date + timedelta(days=1)
     else:
         # Fallback para caso o usuário selecione apenas uma data
-        start_date = selected_dates[0] - timedelta(days=30)
+        start_date = max(selected_dates[0] - timedelta(days=30), inicio_historico or date.min)
         end_date_inclusive = selected_dates[0] + timedelta(days=1)
     
     st.markdown("---")
@@ -76,29 +120,7 @@ def app():
         return
 
     try:
-        query = """
-            SELECT
-                es.id as execucao_id,
-                es.veiculo_id, es.quilometragem, es.fim_execucao,
-                es.nome_motorista, es.contato_motorista,
-                v.placa, v.empresa,
-                serv.area, serv.tipo, serv.quantidade, serv.status, f.nome as funcionario_nome,
-                serv.observacao_execucao
-            FROM execucao_servico es
-            JOIN veiculos v ON es.veiculo_id = v.id
-            LEFT JOIN (
-                SELECT execucao_id, 'Borracharia' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_borracharia UNION ALL
-                SELECT execucao_id, 'Alinhamento' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_alinhamento UNION ALL
-                SELECT execucao_id, 'Manutenção Mecânica' as area, tipo, quantidade, status, funcionario_id, observacao_execucao FROM servicos_solicitados_manutencao
-            ) serv ON es.id = serv.execucao_id
-            LEFT JOIN funcionarios f ON serv.funcionario_id = f.id
-            WHERE 
-                es.status = 'finalizado'
-                AND es.fim_execucao >= %s 
-                AND es.fim_execucao < %s
-            ORDER BY es.fim_execucao DESC, serv.area;
-        """
-        df_completo = pd.read_sql(query, conn, params=(start_date, end_date_inclusive))
+        df_completo = pd.read_sql(QUERY_SERVICOS_CONCLUIDOS, conn, params={"inicio": start_date, "fim": end_date_inclusive})
 
         if df_completo.empty:
             st.info(f"ℹ️ Nenhum serviço foi concluído no período selecionado.")
@@ -112,7 +134,7 @@ def app():
             info_visita = grupo_visita.iloc[0]
             execucao_id_principal = info_visita['execucao_id']
             
-            with st.container(border=True):
+            with st.container(border=True), trecho("render"):
                 col1, col2, col3, col4 = st.columns([0.4, 0.3, 0.15, 0.15])
                 with col1:
                     st.markdown(f"#### Veículo: **{placa or 'N/A'}** ({empresa or 'N/A'})")
@@ -3,15 +3,13 @@
 import streamlit as st
 import pandas as pd
 from database import get_connection, release_connection
-from datetime import datetime
-import pytz
 from utils import get_catalogo_servicos, enviar_notificacao_telegram, recalcular_media_veiculo
+from controle_versao import versao_alterada
+from estado_patio import get_snapshot_patio, servicos_do_veiculo, sincronizar_patio
+from operacoes_patio import adicionar_servico, concluir_execucao, desalocar_execucao
+from instrumentacao import trecho
 import psycopg2.extras
 
-MS_TZ = pytz.timezone('America/Campo_Grande')
-
-if 'box_states' not in st.session_state:
-    st.session_state.box_states = {}
 
 def visao_boxes():
     st.title("🔧 Visão Geral dos Boxes")
@@ -20,6 +18,7 @@ def visao_boxes():
     # --- BOTÃO DE SINCRONIZAÇÃO GLOBAL ---
     if st.button("🔄 Sincronizar Todos os Boxes"):
         st.session_state.box_states = {}
+        sincronizar_patio()
         st.toast("Dados sincronizados com o servidor.", icon="✅")
         st.rerun()
 
@@ -35,7 +34,7 @@ def visao_boxes():
         if not df_boxes.empty:
             cols = st.columns(len(df_boxes))
             for i, (box_id, box_data) in enumerate(df_boxes.iterrows()):
-                with cols[i]:
+                with cols[i], trecho("render"):
                     render_box(conn, box_data, catalogo_servicos)
         else:
             st.info("Nenhum box em operação no momento.")
@@ -46,32 +45,9 @@ def visao_boxes():
     finally:
         release_connection(conn)
 
-def get_estado_atual_boxes(conn):
-    query = """
-        SELECT 
-            b.id, 
-            b.area as box_area, 
-            es.id as execucao_id, 
-            v.placa, 
-            v.empresa, 
-            v.nome_motorista, 
-            v.contato_motorista,
-            v.modelo,                     -- << NOVO: modelo do veículo
-            f.nome as funcionario_nome, 
-            es.veiculo_id, 
-            es.funcionario_id, 
-            es.quilometragem
-        FROM boxes b
-        LEFT JOIN execucao_servico es 
-               ON b.id = es.box_id AND es.status = 'em_andamento'
-        LEFT JOIN veiculos v 
-               ON es.veiculo_id = v.id
-        LEFT JOIN funcionarios f 
-               ON es.funcionario_id = f.id
-        WHERE b.id > 0
-        ORDER BY b.id;
-    """
-    return pd.read_sql(query, conn, index_col='id')
+def get_estado_atual_boxes(conn=None):
+    """Boxes e ocupantes atuais, lidos do snapshot compartilhado do pátio (conn mantido por compatibilidade)."""
+    return get_snapshot_patio()["boxes"]
 
 
 
@@ -190,26 +166,7 @@ def render_box(conn, box_data, catalogo_servicos):
 
 
 def sync_box_state_from_db(conn, box_id, veiculo_id):
-    query = """
-        (SELECT 'borracharia'  AS area, id, tipo, quantidade,
-                observacao AS observacao_cadastro,               -- << NOVO
-                observacao_execucao
-           FROM servicos_solicitados_borracharia
-          WHERE veiculo_id = %s AND box_id = %s AND status = 'em_andamento')
-        UNION ALL
-        (SELECT 'alinhamento' AS area, id, tipo, quantidade,
-                observacao AS observacao_cadastro,               -- << NOVO
-                observacao_execucao
-           FROM servicos_solicitados_alinhamento
-          WHERE veiculo_id = %s AND box_id = %s AND status = 'em_andamento')
-        UNION ALL
-        (SELECT 'manutencao'  AS area, id, tipo, quantidade,
-                observacao AS observacao_cadastro,               -- << NOVO
-                observacao_execucao
-           FROM servicos_solicitados_manutencao
-          WHERE veiculo_id = %s AND box_id = %s AND status = 'em_andamento')
-    """
-    df_servicos = pd.read_sql(query, conn, params=[veiculo_id, box_id] * 3)
+    df_servicos = servicos_do_veiculo(get_snapshot_patio(), veiculo_id, 'em_andamento', box_id=box_id)
 
     servicos_dict = {
         f"{row['area']}_{row['id']}": {
@@ -239,119 +196,50 @@ def sync_box_state_from_db(conn, box_id, veiculo_id):
 
 
 def adicionar_servico_extra(conn, box_id, execucao_id, tipo, qtd, catalogo):
-    try:
-        area_servico = ''
-        if tipo in catalogo.get("borracharia", []): area_servico = 'borracharia'
-        elif tipo in catalogo.get("alinhamento", []): area_servico = 'alinhamento'
-        elif tipo in catalogo.get("manutencao", []): area_servico = 'manutencao'
-        if not area_servico:
-            st.error("Não foi possível identificar a área do serviço.")
-            return
+    area_servico = ''
+    if tipo in catalogo.get("borracharia", []): area_servico = 'borracharia'
+    elif tipo in catalogo.get("alinhamento", []): area_servico = 'alinhamento'
+    elif tipo in catalogo.get("manutencao", []): area_servico = 'manutencao'
+    if not area_servico:
+        st.error("Não foi possível identificar a área do serviço.")
+        return
 
-        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-            cursor.execute("SELECT veiculo_id, quilometragem, nome_motorista FROM execucao_servico WHERE id = %s", (execucao_id,))
-            result = cursor.fetchone()
-            veiculo_id, quilometragem, nome_motorista = result['veiculo_id'], result['quilometragem'], result['nome_motorista']
-            
-            tabela = f"servicos_solicitados_{area_servico}"
-            query = f"""
-                INSERT INTO {tabela}
-                    (veiculo_id, tipo, quantidade, status, box_id, execucao_id,
-                     data_solicitacao, data_atualizacao, quilometragem)
-                VALUES
-                    (%s, %s, %s, 'em_andamento', %s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, (veiculo_id, tipo, qtd, box_id, execucao_id,
-                                    datetime.now(MS_TZ), datetime.now(MS_TZ), quilometragem))
-            conn.commit()
-            st.toast(f"Serviço '{tipo}' adicionado ao Box {box_id}.", icon="➕")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Erro ao adicionar serviço: {e}")
+    sucesso, resultado = adicionar_servico(conn, box_id, execucao_id, area_servico, tipo, qtd)
+    if sucesso:
+        versao_alterada()
+        st.toast(f"Serviço '{tipo}' adicionado ao Box {box_id}.", icon="➕")
+    else:
+        st.error(resultado)
 
 def desalocar_bloco_do_box(conn, box_id, execucao_id):
-    try:
-        with conn.cursor() as cursor:
-            for tabela in ["servicos_solicitados_borracharia",
-                           "servicos_solicitados_alinhamento",
-                           "servicos_solicitados_manutencao"]:
-                cursor.execute(
-                    f"""UPDATE {tabela}
-                           SET status = 'pendente',
-                               box_id = NULL,
-                               funcionario_id = NULL,
-                               execucao_id = NULL,
-                               data_atualizacao = %s
-                         WHERE execucao_id = %s""",
-                    (datetime.now(MS_TZ), execucao_id)
-                )
-
-            cursor.execute("DELETE FROM execucao_servico WHERE id = %s", (execucao_id,))
-            cursor.execute("UPDATE boxes SET ocupado = FALSE WHERE id = %s", (box_id,))
-            conn.commit()
+    sucesso, resultado = desalocar_execucao(conn, box_id, execucao_id)
+    if sucesso:
+        versao_alterada()
         st.info(f"Execução retirada do Box {box_id}. Serviços voltaram para a fila (pendente).")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Erro ao retirar bloco do box: {e}")
-
-def _salvar_alteracoes_finais(conn, box_id, execucao_id, status_final, obs_final):
-    try:
-        with conn.cursor() as cursor:
-            for servico in st.session_state.box_states.get(box_id, {}).get('servicos', {}).values():
-                tabela = f"servicos_solicitados_{servico['area']}"
-                cursor.execute(
-                    f"""UPDATE {tabela}
-                           SET quantidade = %s,
-                               observacao_execucao = %s,
-                               status = %s,
-                               data_atualizacao = %s
-                         WHERE id = %s""",
-                    (servico['qtd_executada'], obs_final, status_final, datetime.now(MS_TZ), servico['db_id'])
-                )
-        return True
-    except Exception as e:
-        st.error(f"Erro ao salvar alterações finais: {e}")
-        return False
+    else:
+        st.error(resultado)
 
 def finalizar_execucao(conn, box_id, execucao_id):
     box_state = st.session_state.box_states.get(box_id, {})
     obs_final = box_state.get('obs_final', '')
+    usuario_finalizacao_id = st.session_state.get('user_id')
+    usuario_finalizacao_nome = st.session_state.get('user_name', 'N/A')
+
+    # PASSOS 1 E 2: DADOS PARA AS NOTIFICAÇÕES E GRAVAÇÃO, NUMA TRANSAÇÃO (operacoes_patio)
+    sucesso, resultado = concluir_execucao(
+        conn, box_id, execucao_id, box_state.get('servicos', {}).values(), obs_final, usuario_finalizacao_id
+    )
+    if not sucesso:
+        st.error(f"Erro Crítico ao finalizar Box {box_id}: {resultado}")
+        return
+    versao_alterada()
+    info_notificacao = resultado['veiculo']
+    servicos_pendentes_restantes = resultado['pendentes_restantes']
+    veiculo_id = info_notificacao['veiculo_id']
+    quilometragem = info_notificacao['quilometragem']
 
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-            # PASSO 1: COLETAR DADOS PARA AS NOTIFICAÇÕES ANTES DE QUALQUER ALTERAÇÃO
-            usuario_finalizacao_id = st.session_state.get('user_id')
-            usuario_finalizacao_nome = st.session_state.get('user_name', 'N/A')
-
-            cursor.execute("""
-                SELECT 
-                    es.veiculo_id, es.quilometragem, es.nome_motorista,
-                    v.placa, v.empresa, f.nome as funcionario_nome
-                FROM execucao_servico es
-                JOIN veiculos v ON es.veiculo_id = v.id
-                LEFT JOIN funcionarios f ON es.funcionario_id = f.id
-                WHERE es.id = %s
-            """, (execucao_id,))
-            info_notificacao = cursor.fetchone()
-            veiculo_id = info_notificacao['veiculo_id']
-            quilometragem = info_notificacao['quilometragem']
-
-            query_pendentes = "SELECT COUNT(*) FROM (SELECT 1 FROM servicos_solicitados_borracharia WHERE veiculo_id = %s AND status = 'pendente' UNION ALL SELECT 1 FROM servicos_solicitados_alinhamento WHERE veiculo_id = %s AND status = 'pendente' UNION ALL SELECT 1 FROM servicos_solicitados_manutencao WHERE veiculo_id = %s AND status = 'pendente') as pending_services;"
-            cursor.execute(query_pendentes, (veiculo_id, veiculo_id, veiculo_id))
-            servicos_pendentes_restantes = cursor.fetchone()[0]
-
-            # PASSO 2: SALVAR ALTERAÇÕES NO BANCO DE DADOS
-            if not _salvar_alteracoes_finais(conn, box_id, execucao_id, 'finalizado', obs_final):
-                conn.rollback()
-                return
-
-            cursor.execute(
-                "UPDATE execucao_servico SET status = 'finalizado', fim_execucao = %s, usuario_finalizacao_id = %s WHERE id = %s",
-                (datetime.now(MS_TZ), usuario_finalizacao_id, execucao_id)
-            )
-            cursor.execute("UPDATE boxes SET ocupado = FALSE WHERE id = %s", (box_id,))
-            conn.commit()
-
             st.success(f"Box {box_id} finalizado com sucesso!")
 
             # PASSO 3: AÇÕES PÓS-COMMIT (CÁLCULO DE MÉDIA E NOTIFICAÇÕES)
@@ -0,0 +1,93 @@
+# perfil_rerun.py
+#
+# Perfil dos reruns das páginas, ligado por PERFIL_RERUN = true nos secrets.
+# Cada vez que registro_paginas.abrir_pagina roda uma página (ou que um
+# fragmento marcado com registro_paginas.fragmento_da_pagina roda sozinho,
+# registrado como "<página> (fragmento)"), o tempo total é dividido em:
+#   banco     consultas (cursores de instrumentacao.ConexaoInstrumentada)
+#   render    montagem dos widgets nos blocos marcados com
+#             instrumentacao.trecho("render") (os cartões de visao_boxes,
+#             revisao_proativa e servicos_concluidos)
+#   externo   APIs de fora (OpenAI, Telegram, consulta de placas), marcadas com
+#             instrumentacao.trecho("externo")
+#   python    o restante: cálculos e pandas da própria página
+# Só o código do app é marcado; os comandos do Streamlit não são alterados,
+# então o perfil não afeta as sessões de quem não está sendo medido. Fora de
+# um rerun medido, trecho() só lê a ContextVar e não faz nada.
+# Os últimos reruns ficam na memória do processo, com a página, a sessão e o
+# usuário; a página "Desempenho" mostra p50/p95 por página.
+#
+# Desligado, o custo é uma leitura de st.secrets por rerun.
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from instrumentacao import CATEGORIAS, PerfilRerun, rerun_atual
+
+MAX_RERUNS = 5000
+
+_lock = threading.Lock()
+_reruns = deque(maxlen=MAX_RERUNS)
+
+
+def perfil_ativo():
+    return bool(st.secrets.get("PERFIL_RERUN", False))
+
+
+@contextmanager
+def medir_rerun(pagina):
+    """Mede a execução da página (inclusive quando termina com st.stop ou st.rerun)."""
+    if not perfil_ativo():
+        yield
+        return
+    perfil = PerfilRerun()
+    marcador = rerun_atual.set(perfil)
+    try:
+        yield
+    finally:
+        rerun_atual.reset(marcador)
+        total = perfil.encerrar()
+        ctx = get_script_run_ctx()
+        registro = {
+            "momento": datetime.now(), "pagina": pagina,
+            "sessao": ctx.session_id[:8] if ctx else "-",
+            "usuario": st.session_state.get("username", "-"),
+            "total_ms": total * 1000, "consultas": perfil.consultas,
+        }
+        registro.update({f"{categoria}_ms": segundos * 1000 for categoria, segundos in perfil.tempos.items()})
+        with _lock:
+            _reruns.append(registro)
+
+
+def reruns():
+    """Reruns medidos, do mais recente para o mais antigo."""
+    with _lock:
+        registros = list(_reruns)
+    return pd.DataFrame(registros[::-1])
+
+
+def resumo_por_pagina():
+    """p50 e p95 do tempo total e de cada categoria, por página."""
+    df = reruns()
+    if df.empty:
+        return df
+    colunas = ["total_ms"] + [f"{categoria}_ms" for categoria in CATEGORIAS]
+    agrupado = df.groupby("pagina")
+    resumo = pd.concat(
+        {"p50": agrupado[colunas].quantile(0.5), "p95": agrupado[colunas].quantile(0.95)}, axis=1
+    )
+    resumo.columns = [f"{coluna}_{percentil}" for percentil, coluna in resumo.columns]
+    resumo.insert(0, "reruns", agrupado.size())
+    resumo.insert(1, "consultas_media", agrupado["consultas"].mean())
+    return resumo.sort_values("total_ms_p95", ascending=False).reset_index()
+
+
+def limpar():
+    with _lock:
+        _reruns.clear()
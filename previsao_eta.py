@@ -0,0 +1,170 @@
+# previsao_eta.py
+
+import heapq
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from database import get_connection, release_connection
+from agendador import MS_TZ, DURACAO_PADRAO_MIN, historico_execucoes, mediana_por_tipo, normalizar_area
+
+# Modelo multiplicativo de duração de uma execução:
+#   duração = soma(base do tipo de serviço) x fator do box x fator do mecânico
+# A base é a mediana histórica de cada tipo, a mesma do agendador
+# (agendador.historico_execucoes). Os fatores são a média geométrica de
+# real/previsto de cada box e mecânico, "encolhida" em direção a 1: com
+# poucas execuções o fator fica perto de 1, com muitas vale o que foi observado.
+PESO_PRIOR = 10                 # execuções "fictícias" com fator 1 somadas a cada box/mecânico
+FATOR_MIN, FATOR_MAX = 0.5, 2.0
+RESTANTE_MINIMO_MIN = 5.0       # execução já passou do previsto: assume que termina em breve
+
+def _fatores(log_razao, grupos):
+    """Fator encolhido por grupo: exp(soma dos log(real/previsto) / (n + PESO_PRIOR))."""
+    agregado = log_razao.groupby(grupos).agg(['sum', 'count'])
+    fatores = np.exp(agregado['sum'] / (agregado['count'] + PESO_PRIOR)).clip(FATOR_MIN, FATOR_MAX)
+    return {int(k): round(float(v), 3) for k, v in fatores.items() if pd.notna(k)}
+
+
+def ajustar_modelo(conn):
+    """
+    Ajusta o modelo com as execuções finalizadas do último ano.
+    Retorna {'base': {tipo: minutos}, 'box': {box_id: fator},
+    'funcionario': {funcionario_id: fator}, 'execucoes': n}.
+    """
+    df = historico_execucoes(conn)
+    if df.empty:
+        return {'base': {}, 'box': {}, 'funcionario': {}, 'execucoes': 0}
+
+    # 1) Base por tipo: a duração da execução dividida entre os tipos feitos nela
+    base = mediana_por_tipo(df)
+
+    # 2) Uma linha por execução com a duração prevista só pela base
+    df['base'] = df['tipo'].map(base).fillna(DURACAO_PADRAO_MIN)
+    execucoes = df.groupby('execucao_id').agg(
+        box_id=('box_id', 'first'), funcionario_id=('funcionario_id', 'first'),
+        real=('duracao_minutos', 'first'), prevista=('base', 'sum'),
+    )
+    log_razao = np.log(execucoes['real'] / execucoes['prevista'])
+
+    # 3) Fator do box e, sobre o que o box não explica, fator do mecânico
+    fator_box = _fatores(log_razao, execucoes['box_id'])
+    residuo = log_razao - np.log(execucoes['box_id'].map(fator_box).fillna(1.0))
+    fator_funcionario = _fatores(residuo, execucoes['funcionario_id'])
+
+    return {'base': base, 'box': fator_box, 'funcionario': fator_funcionario, 'execucoes': len(execucoes)}
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_modelo_eta():
+    """ajustar_modelo com cache de 1h, compartilhado entre as sessões e as TVs."""
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("Falha ao conectar ao banco de dados.")
+    try:
+        return ajustar_modelo(conn)
+    finally:
+        release_connection(conn)
+
+
+def _hora_local(serie):
+    """Converte para horário de MS sem fuso, aceitando timestamps com ou sem fuso."""
+    serie = pd.to_datetime(serie)
+    if getattr(serie.dt, 'tz', None) is not None:
+        serie = serie.dt.tz_convert(MS_TZ).dt.tz_localize(None)
+    return serie
+
+
+def prever_minutos(servicos, modelo, por):
+    """
+    Duração prevista (minutos) de cada grupo de serviços, sem fatores de
+    box/mecânico. 'por' é a coluna de agrupamento (execucao_id, veiculo_id...).
+    """
+    minutos = servicos['tipo'].map(modelo['base']).fillna(DURACAO_PADRAO_MIN)
+    return minutos.groupby(servicos[por]).sum()
+
+
+def calcular_eta(snapshot, modelo, agora=None):
+    """
+    Previsões para o painel a partir do snapshot do pátio (estado_patio).
+
+    Retorna (fim_boxes, eta_fila):
+      fim_boxes: Series box_id -> término previsto da execução em andamento
+      eta_fila: DataFrame veiculo_id, inicio_previsto, fim_previsto, na ordem
+                de chegada (a mesma do painel)
+
+    A fila é atendida por ordem de chegada, um trabalho (veículo + área) por
+    vez, como na tela de alocação: cada trabalho vai para o box compatível
+    (da área ou geral, como em agendador.propor_alocacao) e o mecânico que
+    ficarem livres primeiro, e nunca começa antes de o veículo sair do box
+    em que está. O veículo começa no primeiro trabalho e termina no último.
+    """
+    agora = agora or datetime.now(MS_TZ).replace(tzinfo=None)
+    boxes = snapshot["boxes"]
+    servicos = snapshot["servicos"]
+
+    # --- Boxes em atendimento: início + previsão ajustada pelo box e pelo mecânico ---
+    ocupados = boxes[boxes['execucao_id'].notna()]
+    em_andamento = servicos[servicos['status'] == 'em_andamento']
+    prevista = ocupados['execucao_id'].map(prever_minutos(em_andamento, modelo, 'execucao_id')).fillna(DURACAO_PADRAO_MIN)
+    prevista *= ocupados.index.map(lambda b: modelo['box'].get(int(b), 1.0)).to_numpy()
+    prevista *= ocupados['funcionario_id'].map(lambda f: modelo['funcionario'].get(int(f), 1.0) if pd.notna(f) else 1.0)
+    inicio = _hora_local(ocupados['inicio_execucao']).fillna(agora)
+    fim_boxes = (inicio + pd.to_timedelta(prevista, unit='m')).clip(
+        lower=pd.Timestamp(agora + timedelta(minutes=RESTANTE_MINIMO_MIN))
+    )
+
+    # --- Fila: trabalhos por ordem de chegada, boxes por área e um heap de mecânicos ---
+    pendentes = servicos[servicos['status'] == 'pendente']
+    vazia = pd.DataFrame(columns=['veiculo_id', 'inicio_previsto', 'fim_previsto'])
+    if pendentes.empty:
+        return fim_boxes, vazia
+    pendentes = pendentes.assign(area=pendentes['area'].map(normalizar_area),
+                                 minutos=pendentes['tipo'].map(modelo['base']).fillna(DURACAO_PADRAO_MIN))
+    trabalhos = pendentes.groupby(['veiculo_id', 'area'], dropna=False).agg(
+        chegada=('data_solicitacao', 'min'), duracao=('minutos', 'sum')).sort_values('chegada', kind='stable')
+
+    box_livre = {int(b): fim_boxes.get(b, agora) for b in boxes.index}
+    box_area = {int(b): normalizar_area(a) for b, a in boxes['box_area'].items()}
+    ocupacao = dict(zip(ocupados['funcionario_id'].dropna().astype(int), fim_boxes[ocupados['funcionario_id'].notna()]))
+    heap_mecanicos = [(ocupacao.get(int(f), agora), int(f)) for f in snapshot["funcionarios"]['id']]
+    heapq.heapify(heap_mecanicos)
+    veiculo_livre = dict(zip(ocupados['veiculo_id'].astype(int), fim_boxes))
+
+    linhas = []
+    for (veiculo_id, area), duracao in trabalhos['duracao'].items():
+        compativeis = [b for b in box_livre if box_area[b] in (None, area)]
+        if not compativeis:
+            continue    # nenhum box atende esta área: sem previsão
+        box_id = min(compativeis, key=lambda b: (box_livre[b], box_area[b] is None, b))
+        livre_mec, funcionario_id = heapq.heappop(heap_mecanicos) if heap_mecanicos else (agora, None)
+        inicio_previsto = max(box_livre[box_id], livre_mec, veiculo_livre.get(int(veiculo_id), agora), agora)
+        fator = modelo['box'].get(box_id, 1.0) * modelo['funcionario'].get(funcionario_id, 1.0)
+        fim_previsto = inicio_previsto + timedelta(minutes=float(duracao) * fator)
+        box_livre[box_id] = fim_previsto
+        veiculo_livre[int(veiculo_id)] = fim_previsto
+        if funcionario_id is not None:
+            heapq.heappush(heap_mecanicos, (fim_previsto, funcionario_id))
+        linhas.append({'veiculo_id': veiculo_id, 'inicio_previsto': inicio_previsto, 'fim_previsto': fim_previsto})
+
+    if not linhas:
+        return fim_boxes, vazia
+    eta = pd.DataFrame(linhas).groupby('veiculo_id', sort=False).agg(
+        inicio_previsto=('inicio_previsto', 'min'), fim_previsto=('fim_previsto', 'max'))
+    return fim_boxes, eta.reset_index()
+
+
+if __name__ == "__main__":
+    from database import get_script_connection
+
+    conexao = get_script_connection()
+    if conexao:
+        try:
+            modelo = ajustar_modelo(conexao)
+            print(f"{modelo['execucoes']} execuções, {len(modelo['base'])} tipos com base própria")
+            for nome in ('box', 'funcionario'):
+                print(f"\nFatores por {nome} (1.0 = na média):")
+                for chave, fator in sorted(modelo[nome].items(), key=lambda item: item[1]):
+                    print(f"  {chave:>5}: {fator:.2f}")
+        finally:
+            conexao.close()
@@ -0,0 +1,64 @@
+# registro_paginas.py
+
+import functools
+import importlib
+
+from instrumentacao import pagina_atual, rerun_atual
+from perfil_rerun import medir_rerun
+
+# Opção do menu -> (módulo em pages/, função de entrada). O módulo só é
+# importado quando a página é aberta pela primeira vez no processo; assim o
+# formulário de login não espera por plotly, openai, PIL etc.
+PAGINAS = {
+    "Cadastro de Serviço":   ("cadastro_servico", "app"),
+    "Dados de Clientes":     ("dados_clientes", "app"),
+    "Alocar Serviços":       ("alocar_servicos", "alocar_servicos"),
+    "Filas de Serviço":      ("filas_servico", "app"),
+    "Visão dos Boxes":       ("visao_boxes", "visao_boxes"),
+    "Serviços Concluídos":   ("servicos_concluidos", "app"),
+    "Histórico por Veículo": ("historico_veiculo", "app"),
+    "Controle de Feedback":  ("feedback_servicos", "app"),
+    "Revisão Proativa":      ("revisao_proativa", "app"),
+    "Exportar CSV":          ("exportar_contatos", "app"),
+    "Análise de Pneus":      ("analise_pneus", "app"),
+    "Gerenciar Usuários":    ("gerenciar_usuarios", "app"),
+    "Relatórios":            ("relatorios", "app"),
+    "Mesclar Históricos":    ("mesclar_historico", "app"),
+    "Diagnóstico de KM":     ("diagnostico_km", "app"),
+    "Desempenho":            ("desempenho", "app"),
+}
+
+
+def abrir_pagina(nome):
+    """Importa a página (se ainda não foi importada) e chama a sua função de entrada."""
+    modulo, funcao = PAGINAS[nome]
+    marcador = pagina_atual.set(nome)     # as consultas medidas ficam atribuídas à página
+    try:
+        with medir_rerun(nome):
+            getattr(importlib.import_module(f"pages.{modulo}"), funcao)()
+    finally:
+        pagina_atual.reset(marcador)
+
+
+def fragmento_da_pagina(nome):
+    """
+    Para funções com @st.fragment (aplicar abaixo dele): os reruns só do
+    fragmento não passam por abrir_pagina, e as consultas deles ficariam em
+    "(fora de página)" e fora do perfil de reruns. O decorador atribui essas
+    consultas à página `nome` e mede o rerun como "<nome> (fragmento)". Quando
+    o fragmento roda dentro do rerun completo da página, o tempo já entra na
+    medição da página e não é registrado de novo.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def fragmento(*args, **kwargs):
+            marcador = pagina_atual.set(nome)
+            try:
+                if rerun_atual.get() is not None:
+                    return funcao(*args, **kwargs)
+                with medir_rerun(f"{nome} (fragmento)"):
+                    return funcao(*args, **kwargs)
+            finally:
+                pagina_atual.reset(marcador)
+        return fragmento
+    return decorador
@@ -0,0 +1,225 @@
+# snapshot_analitico.py
+#
+# Cópia em Parquet das tabelas usadas nas análises, para que relatórios pesados
+# leiam arquivos locais em vez de consultar o banco de que o pátio depende.
+#
+# Estrutura da pasta (PASTA_SNAPSHOT):
+#   execucao_servico/data=AAAA-MM-DD/parte.parquet   execuções finalizadas, pelo dia de fim_execucao
+#   servicos/data=AAAA-MM-DD/parte.parquet           serviços das três áreas (coluna 'area'), pelo
+#                                                    dia de fim_execucao da execução a que pertencem
+#   veiculos.parquet, clientes.parquet,              cadastros, regravados inteiros a cada exportação
+#   funcionarios.parquet, usuarios.parquet           (usuarios só com id e nome)
+#   _estado.json                                     último dia exportado
+#
+# A exportação é incremental: regrava só os dias a partir do último exportado,
+# voltando DIAS_REPROCESSAR dias para pegar correções recentes (ajuste de KM,
+# mesclagem de veículos). Cada dia é regravado inteiro, então repetir é seguro.
+# Correções mais antigas que isso pedem --completo.
+#
+# As visitas arquivadas (arquivar_historico.py) também são lidas, do arquivo:
+# o snapshot continua com o histórico inteiro, e --completo ou --desde antes
+# do corte do arquivo não apagam esses dias.
+#
+# Uso: python snapshot_analitico.py [--pasta snapshots] [--completo] [--desde AAAA-MM-DD]
+
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from historico import TABELA_ARQUIVO
+
+PASTA_SNAPSHOT = os.getenv("PASTA_SNAPSHOT", "snapshots")
+DIAS_REPROCESSAR = 7
+FUSO_DIA = "America/Campo_Grande"    # o "dia" de cada partição é o dia local do pátio
+
+_COLUNAS_EXECUCAO = """id, veiculo_id, box_id, funcionario_id, quilometragem, status, inicio_execucao,
+           fim_execucao, usuario_alocacao_id, usuario_finalizacao_id, data_feedback"""
+
+QUERY_EXECUCOES = f"""
+    SELECT es.*, (es.fim_execucao AT TIME ZONE '{FUSO_DIA}')::date AS data
+    FROM (
+        SELECT {_COLUNAS_EXECUCAO} FROM execucao_servico UNION ALL
+        SELECT {_COLUNAS_EXECUCAO} FROM {TABELA_ARQUIVO}
+    ) es
+    WHERE es.status = 'finalizado' AND es.fim_execucao >= %s::date AT TIME ZONE '{FUSO_DIA}'
+    ORDER BY es.fim_execucao, es.id;
+"""
+
+_COLUNAS_SERVICO = """id, execucao_id, veiculo_id, box_id, funcionario_id, tipo, quantidade,
+               status, quilometragem, data_solicitacao, data_atualizacao"""
+
+# Os serviços das visitas arquivadas estão no JSONB 'servicos' do arquivo, um
+# objeto por serviço com a área e as colunas da linha original.
+QUERY_SERVICOS = f"""
+    SELECT serv.area, serv.id, serv.execucao_id, serv.veiculo_id, serv.box_id, serv.funcionario_id, serv.tipo,
+           serv.quantidade, serv.status, serv.quilometragem, serv.data_solicitacao, serv.data_atualizacao,
+           (serv.fim_execucao AT TIME ZONE '{FUSO_DIA}')::date AS data
+    FROM (
+        SELECT s.*, es.fim_execucao
+        FROM (
+            SELECT 'borracharia' AS area, {_COLUNAS_SERVICO} FROM servicos_solicitados_borracharia UNION ALL
+            SELECT 'alinhamento', {_COLUNAS_SERVICO} FROM servicos_solicitados_alinhamento UNION ALL
+            SELECT 'manutencao', {_COLUNAS_SERVICO} FROM servicos_solicitados_manutencao
+        ) s
+        JOIN execucao_servico es ON es.id = s.execucao_id
+        WHERE es.status = 'finalizado'
+        UNION ALL
+        SELECT servico->>'area', s.*, a.fim_execucao
+        FROM {TABELA_ARQUIVO} a
+        CROSS JOIN LATERAL jsonb_array_elements(a.servicos) servico
+        CROSS JOIN LATERAL jsonb_to_record(servico) AS s(
+            id INT, execucao_id INT, veiculo_id INT, box_id INT, funcionario_id INT, tipo TEXT, quantidade INT,
+            status TEXT, quilometragem INT, data_solicitacao TIMESTAMPTZ, data_atualizacao TIMESTAMPTZ)
+        WHERE a.status = 'finalizado'
+    ) serv
+    WHERE serv.fim_execucao >= %s::date AT TIME ZONE '{FUSO_DIA}';
+"""
+
+QUERIES_CADASTROS = {
+    "veiculos": "SELECT id, placa, placa_normalizada, empresa, modelo, ano_modelo, cliente_id, media_km_diaria FROM veiculos",
+    "clientes": "SELECT id, nome_empresa, nome_fantasia, cidade, uf FROM clientes",
+    "funcionarios": "SELECT id, nome FROM funcionarios",
+    "usuarios": "SELECT id, nome FROM usuarios",
+}
+
+TABELAS_PARTICIONADAS = {"execucao_servico": QUERY_EXECUCOES, "servicos": QUERY_SERVICOS}
+
+
+def _caminho_estado(pasta):
+    return os.path.join(pasta, "_estado.json")
+
+
+def ler_estado(pasta=PASTA_SNAPSHOT):
+    """Estado da última exportação ({'ultimo_dia': 'AAAA-MM-DD', 'exportado_em': ...}) ou {}."""
+    try:
+        with open(_caminho_estado(pasta), encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+
+
+def _gravar_parquet(df, caminho):
+    """Grava num arquivo temporário e troca no fim: quem lê nunca vê um arquivo pela metade."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + ".tmp"
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, caminho)
+
+
+def _gravar_particoes(df, pasta_tabela, dias):
+    """Regrava as partições de cada dia em 'dias' (um dia sem linhas tem a partição removida)."""
+    por_dia = dict(tuple(df.groupby("data"))) if not df.empty else {}
+    for dia in dias:
+        pasta_dia = os.path.join(pasta_tabela, f"data={dia.isoformat()}")
+        linhas = por_dia.get(dia)
+        if linhas is None:
+            shutil.rmtree(pasta_dia, ignore_errors=True)
+        else:
+            _gravar_parquet(linhas.drop(columns="data"), os.path.join(pasta_dia, "parte.parquet"))
+
+
+def exportar(conn, pasta=PASTA_SNAPSHOT, desde=None, completo=False):
+    """
+    Exporta as tabelas para 'pasta'. Sem 'desde', continua da última
+    exportação (menos DIAS_REPROCESSAR dias); com 'completo', apaga e refaz tudo.
+    Retorna {tabela: linhas gravadas}.
+    """
+    hoje = date.today()
+    if completo:
+        for tabela in TABELAS_PARTICIONADAS:
+            shutil.rmtree(os.path.join(pasta, tabela), ignore_errors=True)
+        desde = date(1900, 1, 1)
+    elif desde is None:
+        ultimo = ler_estado(pasta).get("ultimo_dia")
+        desde = date.fromisoformat(ultimo) - timedelta(days=DIAS_REPROCESSAR) if ultimo else date(1900, 1, 1)
+
+    linhas = {}
+    for tabela, query in TABELAS_PARTICIONADAS.items():
+        df = pd.read_sql(query, conn, params=(desde,))
+        df["data"] = pd.to_datetime(df["data"]).dt.date
+        pasta_tabela = os.path.join(pasta, tabela)
+        # Dias já gravados no intervalo também entram: se ficaram vazios, a partição sai
+        existentes = {date.fromisoformat(nome[5:]) for nome in os.listdir(pasta_tabela)} if os.path.isdir(pasta_tabela) else set()
+        dias = set(df["data"]) | {dia for dia in existentes if dia >= desde}
+        _gravar_particoes(df, pasta_tabela, sorted(dias))
+        linhas[tabela] = len(df)
+
+    for tabela, query in QUERIES_CADASTROS.items():
+        df = pd.read_sql(query, conn)
+        _gravar_parquet(df, os.path.join(pasta, f"{tabela}.parquet"))
+        linhas[tabela] = len(df)
+
+    with open(_caminho_estado(pasta), "w", encoding="utf-8") as arquivo:
+        json.dump({"ultimo_dia": hoje.isoformat(), "exportado_em": datetime.now().isoformat(timespec="seconds")}, arquivo)
+    return linhas
+
+
+def ler_snapshot(tabela, inicio=None, fim=None, pasta=PASTA_SNAPSHOT, colunas=None):
+    """
+    Lê uma tabela do snapshot. Nas tabelas particionadas, só os arquivos dos
+    dias entre 'inicio' e 'fim' (inclusive) são abertos.
+    """
+    if tabela not in TABELAS_PARTICIONADAS:
+        return pd.read_parquet(os.path.join(pasta, f"{tabela}.parquet"), columns=colunas)
+
+    pasta_tabela = os.path.join(pasta, tabela)
+    arquivos = []
+    for nome in sorted(os.listdir(pasta_tabela)) if os.path.isdir(pasta_tabela) else []:
+        dia = date.fromisoformat(nome[5:])
+        if (inicio is None or dia >= inicio) and (fim is None or dia <= fim):
+            arquivos.append(os.path.join(pasta_tabela, nome, "parte.parquet"))
+    if not arquivos:
+        return pd.DataFrame(columns=colunas)
+    return pd.concat([pd.read_parquet(arquivo, columns=colunas) for arquivo in arquivos], ignore_index=True)
+
+
+def dados_relatorio_snapshot(start_date, end_date, pasta=PASTA_SNAPSHOT):
+    """
+    Mesmo resultado de relatorios.buscar_dados_relatorio, montado a partir do
+    snapshot: uma linha por serviço finalizado no período, com a duração da execução.
+    """
+    execucoes = ler_snapshot("execucao_servico", start_date, end_date, pasta)
+    if execucoes.empty:
+        return pd.DataFrame()
+    servicos = ler_snapshot("servicos", start_date, end_date, pasta, colunas=["execucao_id", "tipo", "funcionario_id"])
+    veiculos = ler_snapshot("veiculos", pasta=pasta, colunas=["id", "placa", "empresa"])
+    funcionarios = ler_snapshot("funcionarios", pasta=pasta).set_index("id")["nome"]
+    usuarios = ler_snapshot("usuarios", pasta=pasta).set_index("id")["nome"]
+
+    df = execucoes.merge(veiculos, left_on="veiculo_id", right_on="id", suffixes=("", "_veiculo"))
+    df = df.merge(servicos.rename(columns={"funcionario_id": "funcionario_servico"}),
+                  left_on="id", right_on="execucao_id", how="left")
+    df["duracao_minutos"] = (df["fim_execucao"] - df["inicio_execucao"]).dt.total_seconds() / 60
+    df["funcionario_nome"] = df["funcionario_servico"].map(funcionarios)
+    df["alocado_por"] = df["usuario_alocacao_id"].map(usuarios)
+    df["finalizado_por"] = df["usuario_finalizacao_id"].map(usuarios)
+    return df.rename(columns={"tipo": "tipo_servico"})[[
+        "quilometragem", "inicio_execucao", "fim_execucao", "duracao_minutos", "box_id", "placa", "empresa",
+        "tipo_servico", "funcionario_nome", "alocado_por", "finalizado_por",
+    ]]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from database import get_script_connection
+
+    parser = argparse.ArgumentParser(description="Exporta as tabelas de análise para Parquet.")
+    parser.add_argument("--pasta", default=PASTA_SNAPSHOT)
+    parser.add_argument("--completo", action="store_true", help="apaga o snapshot e exporta tudo de novo")
+    parser.add_argument("--desde", type=date.fromisoformat, help="regrava a partir deste dia (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    conexao = get_script_connection()
+    if conexao:
+        try:
+            inicio = time.perf_counter()
+            resultado = exportar(conexao, args.pasta, args.desde, args.completo)
+            for nome, total in resultado.items():
+                print(f"  {nome}: {total} linhas")
+            print(f"Snapshot gravado em '{args.pasta}' em {time.perf_counter() - inicio:.1f}s.")
+        finally:
+            conexao.close()
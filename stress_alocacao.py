@@ -0,0 +1,146 @@
+# stress_alocacao.py
+#
+# Teste de estresse da alocação de boxes (operacoes_patio.alocar_servico).
+# Várias threads, cada uma com sua conexão, tentam alocar ao mesmo tempo os
+# mesmos veículos pendentes nos mesmos boxes. Ao final verifica que nenhum box
+# ficou com duas execuções, nenhum veículo ficou em dois boxes e que a coluna
+# boxes.ocupado bate com as execuções em andamento; depois desfaz as alocações.
+#
+# ATENÇÃO: grava no banco. Só roda contra um Postgres local (localhost).
+#
+# Uso: python stress_alocacao.py --threads 8 --tentativas 40
+
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+
+from database import get_script_connection
+from operacoes_patio import alocar_servico
+
+VERIFICACOES = {
+    "box com mais de uma execução em andamento": """
+        SELECT box_id FROM execucao_servico WHERE status = 'em_andamento'
+        GROUP BY box_id HAVING COUNT(*) > 1
+    """,
+    "veículo em mais de um box": """
+        SELECT veiculo_id FROM execucao_servico WHERE status = 'em_andamento'
+        GROUP BY veiculo_id HAVING COUNT(*) > 1
+    """,
+    "execução em box marcado como livre": """
+        SELECT es.id FROM execucao_servico es JOIN boxes b ON b.id = es.box_id
+        WHERE es.status = 'em_andamento' AND b.ocupado = FALSE
+    """,
+}
+
+
+def _conexao_local():
+    conn = get_script_connection()
+    if conn and conn.info.host not in ("localhost", "127.0.0.1", "::1", "/tmp", "/var/run/postgresql"):
+        conn.close()
+        raise SystemExit(f"Recusado: o banco em '{conn.info.host}' não é local. Aponte DB_URL para um Postgres local.")
+    return conn
+
+
+def _carregar_candidatos(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT veiculo_id, area FROM (
+                SELECT veiculo_id, 'borracharia' AS area FROM servicos_solicitados_borracharia WHERE status = 'pendente' UNION ALL
+                SELECT veiculo_id, 'alinhamento' AS area FROM servicos_solicitados_alinhamento WHERE status = 'pendente' UNION ALL
+                SELECT veiculo_id, 'manutencao' AS area FROM servicos_solicitados_manutencao WHERE status = 'pendente'
+            ) s
+        """)
+        candidatos = cursor.fetchall()
+        cursor.execute("SELECT id FROM funcionarios WHERE id > 0")
+        funcionarios = [r[0] for r in cursor.fetchall()]
+        cursor.execute("SELECT id FROM boxes WHERE id > 0 AND ocupado = FALSE")
+        boxes = [r[0] for r in cursor.fetchall()]
+    return candidatos, funcionarios, boxes
+
+
+def _worker(candidatos, funcionarios, boxes, tentativas, resultados, lock):
+    conn = get_script_connection()
+    try:
+        for _ in range(tentativas):
+            veiculo_id, area = random.choice(candidatos)
+            # Metade das tentativas disputa um box específico, a outra metade pede "qualquer box livre"
+            box_id = random.choice(boxes) if random.random() < 0.5 else None
+            inicio = time.perf_counter()
+            sucesso, resultado = alocar_servico(conn, veiculo_id, area, random.choice(funcionarios), 1000, box_id=box_id)
+            duracao = time.perf_counter() - inicio
+            with lock:
+                resultados.append((sucesso, resultado if not sucesso else resultado[0], duracao))
+    finally:
+        conn.close()
+
+
+def _desfazer(conn, execucao_ids):
+    with conn.cursor() as cursor:
+        for tabela in ("servicos_solicitados_borracharia", "servicos_solicitados_alinhamento", "servicos_solicitados_manutencao"):
+            cursor.execute(
+                f"UPDATE {tabela} SET status = 'pendente', box_id = NULL, funcionario_id = NULL, execucao_id = NULL WHERE execucao_id = ANY(%s)",
+                (execucao_ids,)
+            )
+        cursor.execute("DELETE FROM execucao_servico WHERE id = ANY(%s) RETURNING box_id", (execucao_ids,))
+        boxes = [r[0] for r in cursor.fetchall()]
+        cursor.execute("UPDATE boxes SET ocupado = FALSE WHERE id = ANY(%s)", (boxes,))
+    conn.commit()
+
+
+def run_stress(threads, tentativas, manter):
+    conn = _conexao_local()
+    if not conn:
+        return
+    try:
+        candidatos, funcionarios, boxes = _carregar_candidatos(conn)
+        if not (candidatos and funcionarios and boxes):
+            print("É preciso ter serviços pendentes, funcionários e boxes livres no banco local.")
+            return
+        print(f"{len(candidatos)} pares veículo/área pendentes, {len(boxes)} boxes livres, {threads} threads x {tentativas} tentativas.")
+
+        resultados, lock = [], threading.Lock()
+        workers = [threading.Thread(target=_worker, args=(candidatos, funcionarios, boxes, tentativas, resultados, lock))
+                   for _ in range(threads)]
+        inicio = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        total = time.perf_counter() - inicio
+
+        sucessos = [r for r in resultados if r[0]]
+        falhas = Counter(r[1] for r in resultados if not r[0])
+        duracoes = sorted(r[2] * 1000 for r in resultados)
+        print(f"\n{len(resultados)} tentativas em {total:.2f}s: {len(sucessos)} alocações, {sum(falhas.values())} recusadas")
+        print(f"Latência (ms): mediana {statistics.median(duracoes):.1f} | p95 {duracoes[int(len(duracoes) * 0.95) - 1]:.1f} | máx {duracoes[-1]:.1f}")
+        for motivo, qtd in falhas.most_common():
+            print(f"  - {qtd}x {motivo}")
+
+        print("\n--- VERIFICAÇÕES DE CONSISTÊNCIA ---")
+        ok = True
+        with conn.cursor() as cursor:
+            for nome, query in VERIFICACOES.items():
+                cursor.execute(query)
+                problemas = cursor.fetchall()
+                ok &= not problemas
+                print(f"  {'OK   ' if not problemas else 'FALHA'} {nome}" + (f": {problemas[:10]}" if problemas else ""))
+        conn.rollback()
+
+        if sucessos and not manter:
+            _desfazer(conn, [r[1] for r in sucessos])
+            print(f"\n{len(sucessos)} alocações de teste desfeitas.")
+        print("\nRESULTADO:", "nenhuma alocação conflitante." if ok else "ALOCAÇÕES CONFLITANTES ENCONTRADAS.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de estresse da alocação de boxes contra um Postgres local.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--tentativas", type=int, default=40, help="tentativas de alocação por thread")
+    parser.add_argument("--manter", action="store_true", help="não desfaz as alocações criadas")
+    args = parser.parse_args()
+    run_stress(args.threads, args.tentativas, args.manter)
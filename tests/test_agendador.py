@@ -0,0 +1,85 @@
+# tests/test_agendador.py
+#
+# Uso (na raiz do projeto): python -m pytest tests
+
+import pandas as pd
+
+from agendador import normalizar_area, propor_alocacao
+
+
+def _trabalhos(*linhas):
+    return pd.DataFrame(linhas, columns=['veiculo_id', 'area', 'chegada', 'duracao_prevista'])
+
+
+def _ordem(agenda):
+    return agenda.sort_values(['inicio', 'veiculo_id'])['veiculo_id'].tolist()
+
+
+def test_spt_atende_primeiro_o_trabalho_mais_curto():
+    trabalhos = _trabalhos((1, 'borracharia', 0, 90), (2, 'borracharia', 0, 10), (3, 'borracharia', 0, 30))
+    agenda = propor_alocacao(trabalhos, [{'id': 1, 'area': None, 'livre_em': 0}], [{'id': 7, 'livre_em': 0}])
+    assert _ordem(agenda) == [2, 3, 1]
+    assert agenda['espera'].sum() == 0 + 10 + 40
+
+
+def test_fifo_atende_por_ordem_de_chegada():
+    trabalhos = _trabalhos((1, 'borracharia', 0, 90), (2, 'borracharia', 1, 10), (3, 'borracharia', 2, 30))
+    agenda = propor_alocacao(trabalhos, [{'id': 1, 'area': None, 'livre_em': 0}], [{'id': 7, 'livre_em': 0}],
+                             criterio='fifo')
+    assert _ordem(agenda) == [1, 2, 3]
+
+
+def test_spt_so_escolhe_entre_os_que_ja_chegaram():
+    # O curto chega depois que o box foi ocupado pelo longo
+    trabalhos = _trabalhos((1, 'borracharia', 0, 60), (2, 'borracharia', 5, 10))
+    agenda = propor_alocacao(trabalhos, [{'id': 1, 'area': None, 'livre_em': 0}], [{'id': 7, 'livre_em': 0}])
+    assert _ordem(agenda) == [1, 2]
+    assert agenda.set_index('veiculo_id').loc[2, 'inicio'] == 60
+
+
+def test_box_de_outra_area_nao_e_usado():
+    trabalhos = _trabalhos((1, 'alinhamento', 0, 30))
+    boxes = [{'id': 1, 'area': 'borracharia', 'livre_em': 0}, {'id': 2, 'area': 'Alinhamento', 'livre_em': 20}]
+    agenda = propor_alocacao(trabalhos, boxes, [{'id': 7, 'livre_em': 0}])
+    linha = agenda.iloc[0]
+    assert linha['box_id'] == 2
+    assert linha['inicio'] == 20
+
+
+def test_box_da_area_tem_preferencia_sobre_o_geral():
+    trabalhos = _trabalhos((1, 'manutencao', 0, 30))
+    boxes = [{'id': 1, 'area': None, 'livre_em': 0}, {'id': 2, 'area': 'Manutenção Mecânica', 'livre_em': 0}]
+    agenda = propor_alocacao(trabalhos, boxes, [{'id': 7, 'livre_em': 0}])
+    assert agenda.iloc[0]['box_id'] == 2
+
+
+def test_trabalho_sem_box_compativel_fica_fora_da_agenda():
+    trabalhos = _trabalhos((1, 'alinhamento', 0, 30), (2, 'borracharia', 0, 30))
+    agenda = propor_alocacao(trabalhos, [{'id': 1, 'area': 'borracharia', 'livre_em': 0}],
+                             [{'id': 7, 'livre_em': 0}])
+    assert agenda['veiculo_id'].tolist() == [2]
+
+
+def test_veiculo_nao_fica_em_dois_boxes_ao_mesmo_tempo():
+    trabalhos = _trabalhos((1, 'borracharia', 0, 30), (1, 'alinhamento', 0, 20))
+    boxes = [{'id': 1, 'area': 'borracharia', 'livre_em': 0}, {'id': 2, 'area': 'alinhamento', 'livre_em': 0}]
+    funcionarios = [{'id': 7, 'livre_em': 0}, {'id': 8, 'livre_em': 0}]
+    agenda = propor_alocacao(trabalhos, boxes, funcionarios).sort_values('inicio')
+    primeiro, segundo = agenda.iloc[0], agenda.iloc[1]
+    assert segundo['inicio'] >= primeiro['fim']
+
+
+def test_veiculo_ocupado_espera_sair_do_box():
+    trabalhos = _trabalhos((1, 'borracharia', 0, 30))
+    agenda = propor_alocacao(trabalhos, [{'id': 1, 'area': None, 'livre_em': 0}], [{'id': 7, 'livre_em': 0}],
+                             veiculos_ocupados={1: 45})
+    assert agenda.iloc[0]['inicio'] == 45
+
+
+def test_normalizar_area():
+    assert normalizar_area('Manutenção Mecânica') == 'manutencao'
+    assert normalizar_area('ALINHAMENTO') == 'alinhamento'
+    assert normalizar_area('Pneus') == 'borracharia'
+    assert normalizar_area('geral') is None
+    assert normalizar_area(None) is None
+    assert normalizar_area(float('nan')) is None
@@ -0,0 +1,92 @@
+# tests/test_analise_pneus.py
+#
+# Uso (na raiz do projeto): python -m pytest tests
+
+import importlib
+import json
+
+import pytest
+import streamlit as st
+
+
+@pytest.fixture(scope="module")
+def analise_pneus():
+    # A página lê st.secrets no import; sem secrets.toml, os valores padrão bastam
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(st, "secrets", {})
+        return importlib.import_module("pages.analise_pneus")
+
+
+LAUDO = {
+    "resumo_geral": "Desgaste irregular no eixo dianteiro, com a borda interna",
+    "analise_detalhada_eixos": [
+        {"titulo": "Eixo 1", "achados_chave": ["borda interna", "serrilhado"]},
+        {"titulo": "Eixo 2", "achados_chave": []},
+    ],
+    "recomendacoes_finais": ["alinhar", "rodízio"],
+}
+TEXTO = json.dumps(LAUDO, ensure_ascii=False)
+
+
+def test_json_completo(analise_pneus):
+    assert analise_pneus._parse_json_parcial(TEXTO) == (LAUDO, True)
+
+
+def test_sem_objeto(analise_pneus):
+    assert analise_pneus._parse_json_parcial("") == ({}, False)
+    assert analise_pneus._parse_json_parcial("Aqui está o laudo") == ({}, False)
+
+
+def test_fecha_colchetes_e_chaves_abertos(analise_pneus):
+    corte = TEXTO.index('{"titulo": "Eixo 2"')
+    parcial, completo = analise_pneus._parse_json_parcial(TEXTO[:corte])
+    assert not completo
+    assert parcial == {"resumo_geral": LAUDO["resumo_geral"],
+                       "analise_detalhada_eixos": [LAUDO["analise_detalhada_eixos"][0]]}
+
+
+def test_virgula_dentro_de_string_nao_e_corte(analise_pneus):
+    # O texto para no meio do resumo, logo depois de uma vírgula da frase
+    corte = TEXTO.index("com a borda")
+    parcial, completo = analise_pneus._parse_json_parcial(TEXTO[:corte])
+    assert (parcial, completo) == ({}, False)
+
+
+def test_aspas_escapadas_nao_fecham_a_string(analise_pneus):
+    texto = '{"a": "diz \\"sim, claro\\"", "b": [1, 2'
+    assert analise_pneus._parse_json_parcial(texto) == ({"a": 'diz "sim, claro"', "b": [1]}, False)
+
+
+def test_texto_antes_do_json(analise_pneus):
+    parcial, completo = analise_pneus._parse_json_parcial('```json\n{"a": 1, "b": {"c": 2')
+    assert (parcial, completo) == ({"a": 1}, False)
+
+
+def test_todos_os_prefixos_dao_objeto_valido(analise_pneus):
+    chaves_vistas = []
+    for fim in range(len(TEXTO) + 1):
+        parcial, completo = analise_pneus._parse_json_parcial(TEXTO[:fim])
+        assert isinstance(parcial, dict)
+        assert completo == (fim == len(TEXTO))
+        chaves_vistas.append(len(parcial))
+    # As seções só aparecem, nunca somem, à medida que o texto chega
+    assert chaves_vistas == sorted(chaves_vistas)
+
+
+def test_secoes_prontas_descarta_a_ultima_em_andamento(analise_pneus):
+    # Só o primeiro eixo chegou: ele pode ainda estar incompleto, a seção espera
+    corte = TEXTO.index('{"titulo": "Eixo 2"') + 5
+    parcial, completo = analise_pneus._parse_json_parcial(TEXTO[:corte])
+    assert analise_pneus._secoes_prontas(parcial, completo) == {"resumo_geral": LAUDO["resumo_geral"]}
+
+    # O segundo eixo começou: o primeiro já está fechado
+    corte = TEXTO.index('"achados_chave": []')
+    parcial, completo = analise_pneus._parse_json_parcial(TEXTO[:corte])
+    assert analise_pneus._secoes_prontas(parcial, completo) == {
+        "resumo_geral": LAUDO["resumo_geral"],
+        "analise_detalhada_eixos": [LAUDO["analise_detalhada_eixos"][0]],
+    }
+
+
+def test_secoes_prontas_com_laudo_completo(analise_pneus):
+    assert analise_pneus._secoes_prontas(LAUDO, True) == LAUDO
@@ -0,0 +1,70 @@
+# tests/test_core_utils.py
+#
+# Uso (na raiz do projeto): python -m pytest tests
+
+import pandas as pd
+import pytest
+
+from core_utils import calcular_medias_km, visitas_validas_km
+
+
+def _historico(*visitas):
+    """visitas: (veiculo_id, 'AAAA-MM-DD', km), já na ordem das datas."""
+    df = pd.DataFrame(visitas, columns=['veiculo_id', 'fim_execucao', 'quilometragem'])
+    return df.assign(fim_execucao=pd.to_datetime(df['fim_execucao']))
+
+
+def _kms(df):
+    return df['quilometragem'].tolist()
+
+
+def test_km_crescente_fica_inteira():
+    df = _historico((1, '2025-01-01', 1000), (1, '2025-02-01', 2000), (1, '2025-03-01', 3000))
+    assert _kms(visitas_validas_km(df)) == [1000, 2000, 3000]
+
+
+def test_km_repetida_fica_so_a_ultima():
+    df = _historico((1, '2025-01-01', 1000), (1, '2025-02-01', 2000), (1, '2025-03-01', 2000))
+    validas = visitas_validas_km(df)
+    assert _kms(validas) == [1000, 2000]
+    assert validas['fim_execucao'].iloc[-1] == pd.Timestamp('2025-03-01')
+
+
+def test_km_menor_que_uma_anterior_e_descartada():
+    # 9000 foi digitada errado (sobra um zero): 3000 e 4000 não a superam
+    df = _historico((1, '2025-01-01', 1000), (1, '2025-02-01', 9000),
+                    (1, '2025-03-01', 3000), (1, '2025-04-01', 10000))
+    assert _kms(visitas_validas_km(df)) == [1000, 9000, 10000]
+
+
+def test_regra_vale_por_veiculo():
+    df = _historico((1, '2025-01-01', 5000), (2, '2025-01-02', 1000), (1, '2025-02-01', 6000),
+                    (2, '2025-02-02', 1500))
+    validas = visitas_validas_km(df)
+    assert sorted(_kms(validas)) == [1000, 1500, 5000, 6000]
+
+
+def test_media_usa_primeira_e_ultima_visitas_validas():
+    df = _historico((1, '2025-01-01', 1000), (1, '2025-01-11', 50000),   # digitação errada no meio
+                    (1, '2025-01-21', 3000), (1, '2025-01-31', 60000))
+    # A de 50000 é válida (supera 1000); a de 3000 não: média = (60000 - 1000) / 30
+    assert calcular_medias_km(df)[1] == pytest.approx(59000 / 30)
+
+
+def test_media_sem_duas_visitas_em_dias_diferentes_e_none():
+    df = _historico((1, '2025-01-01', 1000), (2, '2025-01-01', 1000), (2, '2025-01-01', 1200),
+                    (3, '2025-01-01', 1000), (3, '2025-03-01', 900))
+    medias = calcular_medias_km(df)
+    assert medias[1] is None
+    assert medias[2] is None     # duas leituras no mesmo dia
+    assert medias[3] is None     # a segunda leitura é menor
+    assert list(medias.index) == [1, 2, 3]
+
+
+def test_media_aceita_historico_fora_de_ordem():
+    df = _historico((1, '2025-03-02', 3000), (1, '2025-01-01', 1000))
+    assert calcular_medias_km(df)[1] == pytest.approx(2000 / 60)
+
+
+def test_media_de_historico_vazio():
+    assert calcular_medias_km(_historico()).empty
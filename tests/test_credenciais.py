@@ -0,0 +1,95 @@
+# tests/test_credenciais.py
+#
+# Uso (na raiz do projeto): python -m pytest tests
+
+import hashlib
+
+import pytest
+
+import credenciais
+from credenciais import (LIMITE_BYTES_BCRYPT, custo_do_hash, eh_hash_legado, gerar_hash,
+                         precisa_rehash, verificar_senha)
+
+# Custo mínimo do bcrypt: os testes não dependem do custo configurado
+CUSTO_TESTE = 4
+
+
+def _sha256(senha):
+    return hashlib.sha256(senha.encode("utf-8")).hexdigest()
+
+
+@pytest.fixture(scope="module")
+def hash_bcrypt():
+    return gerar_hash("senha-correta", custo=CUSTO_TESTE)
+
+
+def test_bcrypt_confere_senha_correta(hash_bcrypt):
+    assert custo_do_hash(hash_bcrypt) == CUSTO_TESTE
+    assert verificar_senha("senha-correta", hash_bcrypt)
+
+
+def test_bcrypt_recusa_senha_errada(hash_bcrypt):
+    assert not verificar_senha("senha-errada", hash_bcrypt)
+    assert not verificar_senha("", hash_bcrypt)
+    assert not verificar_senha(None, hash_bcrypt)
+
+
+def test_bcrypt_senha_com_acentos():
+    hash_salvo = gerar_hash("calibração", custo=CUSTO_TESTE)
+    assert verificar_senha("calibração", hash_salvo)
+    assert not verificar_senha("calibracao", hash_salvo)
+
+
+def test_sha256_legado():
+    hash_salvo = _sha256("senha-antiga")
+    assert eh_hash_legado(hash_salvo)
+    assert custo_do_hash(hash_salvo) is None
+    assert verificar_senha("senha-antiga", hash_salvo)
+    assert not verificar_senha("senha-errada", hash_salvo)
+
+
+def test_sha256_legado_so_em_minusculas():
+    # O hash_password antigo gravava hexdigest(), sempre em minúsculas
+    assert not eh_hash_legado(_sha256("senha-antiga").upper())
+
+
+@pytest.mark.parametrize("hash_salvo", ["", None, "texto-qualquer", "$2b$12$curto", "a" * 63])
+def test_formato_desconhecido_nunca_confere(hash_salvo):
+    assert not verificar_senha("texto-qualquer", hash_salvo)
+
+
+def test_precisa_rehash():
+    assert precisa_rehash(_sha256("senha-antiga"), custo=CUSTO_TESTE)
+    assert not precisa_rehash(gerar_hash("x", custo=CUSTO_TESTE), custo=CUSTO_TESTE)
+    assert precisa_rehash(gerar_hash("x", custo=CUSTO_TESTE), custo=CUSTO_TESTE + 1)
+    assert precisa_rehash("", custo=CUSTO_TESTE)
+    assert precisa_rehash(None, custo=CUSTO_TESTE)
+
+
+def test_precisa_rehash_usa_custo_atual_por_padrao():
+    assert not precisa_rehash(gerar_hash("x", custo=credenciais.CUSTO_BCRYPT))
+
+
+def test_truncamento_em_72_bytes():
+    base = "a" * LIMITE_BYTES_BCRYPT
+    hash_salvo = gerar_hash(base + "sufixo-ignorado", custo=CUSTO_TESTE)
+    assert verificar_senha(base, hash_salvo)
+    assert verificar_senha(base + "outro-sufixo", hash_salvo)
+    assert not verificar_senha(base[:-1], hash_salvo)
+
+
+def test_truncamento_conta_bytes_e_nao_caracteres():
+    # "ç" ocupa 2 bytes em UTF-8: 36 deles já somam os 72 bytes
+    base = "ç" * (LIMITE_BYTES_BCRYPT // 2)
+    hash_salvo = gerar_hash(base, custo=CUSTO_TESTE)
+    assert verificar_senha(base + "ç", hash_salvo)
+    assert not verificar_senha(base[:-1], hash_salvo)
+
+
+def test_truncamento_no_meio_de_um_caractere():
+    # 71 bytes ASCII + "ç" (2 bytes): o corte cai no meio do caractere, e a
+    # mesma senha precisa continuar conferindo
+    senha = "a" * (LIMITE_BYTES_BCRYPT - 1) + "ç"
+    hash_salvo = gerar_hash(senha, custo=CUSTO_TESTE)
+    assert verificar_senha(senha, hash_salvo)
+    assert verificar_senha("a" * (LIMITE_BYTES_BCRYPT - 1) + "è", hash_salvo)  # mesmo 1º byte (0xc3)
@@ -0,0 +1,149 @@
+# tests/test_previsao_eta.py
+#
+# Uso (na raiz do projeto): python -m pytest tests
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import previsao_eta
+from previsao_eta import FATOR_MAX, PESO_PRIOR, RESTANTE_MINIMO_MIN, ajustar_modelo, calcular_eta
+
+AGORA = datetime(2026, 3, 10, 8, 0)
+
+
+def _historico(execucoes):
+    """execucoes: (box_id, funcionario_id, duracao_minutos), todas de um serviço do tipo 'pneu'."""
+    return pd.DataFrame([
+        {'tipo': 'pneu', 'execucao_id': i, 'box_id': box, 'funcionario_id': mecanico,
+         'duracao_minutos': float(duracao), 'tipos_na_execucao': 1}
+        for i, (box, mecanico, duracao) in enumerate(execucoes, start=1)
+    ])
+
+
+@pytest.fixture
+def modelo(monkeypatch):
+    # Box 2 no tempo típico (60 min), box 3 sempre no dobro com muitas
+    # execuções, box 1 no dobro com uma execução só. Um mecânico por box.
+    execucoes = [(2, 20, 60)] * 50 + [(3, 30, 120)] * 20 + [(1, 10, 120)]
+    monkeypatch.setattr(previsao_eta, 'historico_execucoes', lambda conn: _historico(execucoes))
+    return ajustar_modelo(conn=None)
+
+
+def test_base_e_a_mediana_do_tipo(modelo):
+    assert modelo['base'] == {'pneu': 60.0}
+    assert modelo['execucoes'] == 71
+
+
+def test_fator_com_poucos_dados_fica_perto_de_1(modelo):
+    # Mesma razão real/previsto (2x), quantidades diferentes de execuções
+    assert modelo['box'][2] == pytest.approx(1.0)
+    assert modelo['box'][1] == pytest.approx(np.exp(np.log(2) / (1 + PESO_PRIOR)), abs=1e-3)
+    assert modelo['box'][3] == pytest.approx(np.exp(20 * np.log(2) / (20 + PESO_PRIOR)), abs=1e-3)
+    assert 1.0 < modelo['box'][1] < modelo['box'][3] < 2.0
+
+
+def test_mecanico_so_explica_o_que_o_box_nao_explicou(modelo):
+    # Tudo que o box 3 não absorveu (por causa do encolhimento) fica para o mecânico 30
+    residuo = np.log(2) - np.log(modelo['box'][3])
+    assert modelo['funcionario'][30] == pytest.approx(np.exp(20 * residuo / (20 + PESO_PRIOR)), abs=1e-2)
+    assert modelo['funcionario'][20] == pytest.approx(1.0)
+
+
+def test_fator_limitado(monkeypatch):
+    # Base 60 min; o box 2 leva dez vezes isso em muitas execuções
+    execucoes = [(1, 10, 60)] * 200 + [(2, 20, 600)] * 100
+    monkeypatch.setattr(previsao_eta, 'historico_execucoes', lambda conn: _historico(execucoes))
+    assert ajustar_modelo(conn=None)['box'] == {1: 1.0, 2: FATOR_MAX}
+
+
+def test_sem_historico(monkeypatch):
+    monkeypatch.setattr(previsao_eta, 'historico_execucoes', lambda conn: pd.DataFrame())
+    assert ajustar_modelo(conn=None) == {'base': {}, 'box': {}, 'funcionario': {}, 'execucoes': 0}
+
+
+# --- calcular_eta ---------------------------------------------------------
+
+MODELO_NEUTRO = {'base': {'pneu': 30.0, 'alinhar': 20.0}, 'box': {}, 'funcionario': {}}
+
+
+def _snapshot(boxes, servicos, funcionarios):
+    colunas_box = ['id', 'box_area', 'execucao_id', 'funcionario_id', 'veiculo_id', 'inicio_execucao']
+    colunas_servico = ['veiculo_id', 'area', 'tipo', 'status', 'execucao_id', 'data_solicitacao']
+    return {
+        'boxes': pd.DataFrame(boxes, columns=colunas_box).set_index('id'),
+        'servicos': pd.DataFrame(servicos, columns=colunas_servico),
+        'funcionarios': pd.DataFrame({'id': funcionarios}),
+    }
+
+
+def _livre(box_id, area=None):
+    return (box_id, area, np.nan, np.nan, np.nan, pd.NaT)
+
+
+def _pendente(veiculo_id, area, tipo, minutos_atras):
+    return (veiculo_id, area, tipo, 'pendente', np.nan, AGORA - timedelta(minutes=minutos_atras))
+
+
+def test_box_em_andamento_usa_fatores_do_box_e_do_mecanico():
+    snapshot = _snapshot(
+        [(1, None, 100, 7, 50, AGORA - timedelta(minutes=10))],
+        [(50, 'borracharia', 'pneu', 'em_andamento', 100, AGORA - timedelta(minutes=20))],
+        [7],
+    )
+    modelo = {**MODELO_NEUTRO, 'box': {1: 1.5}, 'funcionario': {7: 2.0}}
+    fim_boxes, eta = calcular_eta(snapshot, modelo, AGORA)
+    assert fim_boxes[1] == AGORA - timedelta(minutes=10) + timedelta(minutes=30 * 1.5 * 2.0)
+    assert eta.empty
+
+
+def test_execucao_atrasada_termina_em_breve():
+    snapshot = _snapshot(
+        [(1, None, 100, 7, 50, AGORA - timedelta(hours=3))],
+        [(50, 'borracharia', 'pneu', 'em_andamento', 100, AGORA - timedelta(hours=4))],
+        [7],
+    )
+    fim_boxes, _ = calcular_eta(snapshot, MODELO_NEUTRO, AGORA)
+    assert fim_boxes[1] == AGORA + timedelta(minutes=RESTANTE_MINIMO_MIN)
+
+
+def test_fila_por_ordem_de_chegada():
+    snapshot = _snapshot(
+        [_livre(1)],
+        [_pendente(60, 'borracharia', 'pneu', 5), _pendente(61, 'borracharia', 'pneu', 30)],
+        [7],
+    )
+    _, eta = calcular_eta(snapshot, MODELO_NEUTRO, AGORA)
+    eta = eta.set_index('veiculo_id')
+    assert eta.loc[61, 'inicio_previsto'] == AGORA
+    assert eta.loc[60, 'inicio_previsto'] == AGORA + timedelta(minutes=30)
+
+
+def test_fila_so_usa_box_compativel():
+    snapshot = _snapshot(
+        [_livre(1, 'borracharia'), _livre(2, 'alinhamento')],
+        [_pendente(60, 'borracharia', 'pneu', 30), _pendente(61, 'Alinhamento', 'alinhar', 5),
+         _pendente(62, 'manutencao', 'pneu', 1)],
+        [7, 8],
+    )
+    _, eta = calcular_eta(snapshot, MODELO_NEUTRO, AGORA)
+    eta = eta.set_index('veiculo_id')
+    # Cada área no seu box, ao mesmo tempo; manutenção não tem box: sem previsão
+    assert eta.loc[60, 'inicio_previsto'] == AGORA
+    assert eta.loc[61, 'inicio_previsto'] == AGORA
+    assert 62 not in eta.index
+
+
+def test_veiculo_com_duas_areas_comeca_no_primeiro_e_termina_no_ultimo():
+    snapshot = _snapshot(
+        [_livre(1, 'borracharia'), _livre(2, 'alinhamento')],
+        [_pendente(60, 'borracharia', 'pneu', 10), _pendente(60, 'alinhamento', 'alinhar', 10)],
+        [7, 8],
+    )
+    _, eta = calcular_eta(snapshot, MODELO_NEUTRO, AGORA)
+    linha = eta.set_index('veiculo_id').loc[60]
+    assert linha['inicio_previsto'] == AGORA
+    # Os dois trabalhos não correm em paralelo: o veículo só está em um box por vez
+    assert linha['fim_previsto'] == AGORA + timedelta(minutes=30 + 20)
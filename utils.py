@@ -2,14 +2,18 @@ import streamlit as st
 import pandas as pd
 from database import get_connection, release_connection
 import locale
-import hashlib
 import requests
 import re
 import psycopg2.extras
+from credenciais import gerar_hash
+from instrumentacao import trecho
+from core_utils import recalcular_media_veiculo  # visao_boxes importa daqui
+from historico import inicio_historico_patio
+from controle_versao import CHAVE_ARQUIVO, get_versao
 
 def hash_password(password):
     """Gera o hash de uma senha para armazenamento seguro."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    return gerar_hash(password)
 
 def enviar_notificacao_telegram(mensagem, chat_id_destino):
     """Envia uma mensagem para um chat_id específico do Telegram."""
@@ -20,7 +24,8 @@ def enviar_notificacao_telegram(mensagem, chat_id_destino):
             return False, "Credenciais do Telegram (Token ou Chat ID de destino) incompletas."
         url = f"https://api.telegram.org/bot{token}/sendMessage"
         params = {"chat_id": chat_id_destino, "text": mensagem, "parse_mode": "Markdown"}
-        response = requests.post(url, json=params)
+        with trecho("externo"):
+            response = requests.post(url, json=params)
         if response.status_code == 200:
             return True, "Notificação enviada com sucesso!"
         else:
@@ -34,6 +39,7 @@ except locale.Error:
     if 'streamlit' in st.__name__:
         st.warning("Não foi possível configurar a localidade para pt_BR.")
 
+@st.cache_data(ttl=600, show_spinner=False)
 def get_catalogo_servicos():
     conn = get_connection()
     if not conn: return {"borracharia": [], "alinhamento": [], "manutencao": []}
@@ -47,13 +53,39 @@ def get_catalogo_servicos():
         release_connection(conn)
     return catalogo
 
+@st.cache_data(max_entries=4, show_spinner=False)
+def _inicio_historico(versao):
+    """Cache por versão de CHAVE_ARQUIVO: a consulta só se repete depois de um arquivamento."""
+    conn = get_connection()
+    if not conn: return None
+    try:
+        return inicio_historico_patio(conn)
+    finally:
+        release_connection(conn)
+
+def get_inicio_historico():
+    """
+    Data mínima dos filtros de período que leem só as tabelas do pátio (ver
+    arquivar_historico.py), ou None se nada foi arquivado.
+    """
+    try:
+        return _inicio_historico(get_versao(CHAVE_ARQUIVO))
+    except ConnectionError:
+        return None
+
+def aviso_historico_arquivado(inicio):
+    if inicio:
+        st.caption(f"🗄️ Visitas encerradas antes de {inicio:%d/%m/%Y} estão no arquivo e não entram "
+                   "nesta tela; consulte-as no Histórico por Veículo.")
+
 def consultar_placa_comercial(placa: str):
     if not placa: return False, "A placa não pode estar em branco."
     token = st.secrets.get("PLACA_API_TOKEN")
     if not token: return False, "Token da API de Placas não encontrado nos Secrets."
     url = f"https://wdapi2.com.br/consulta/{placa}/{token}"
     try:
-        response = requests.get(url, timeout=15)
+        with trecho("externo"):
+            response = requests.get(url, timeout=15)
         if response.status_code == 200:
             data = response.json()
             modelo_veiculo = data.get('marcaModelo', data.get('MODELO', 'Não encontrado'))
@@ -81,55 +113,48 @@ def formatar_placa(placa: str) -> str:
         return f"{placa_limpa[:3]}-{placa_limpa[3:]}"
     return placa_limpa
 
-def recalcular_media_veiculo(conn, veiculo_id):
-    query = """
-        SELECT fim_execucao, quilometragem
-        FROM execucao_servico
-        WHERE veiculo_id = %s AND status = 'finalizado' AND quilometragem IS NOT NULL AND quilometragem > 0
-        ORDER BY fim_execucao;
+def normalizar_placa(placa: str) -> str:
     """
-    df_veiculo = pd.read_sql(query, conn, params=(veiculo_id,))
-    df_veiculo = df_veiculo.drop_duplicates(subset=['quilometragem'], keep='last')
-    
-    last_valid_km = -1
-    valid_indices = []
-    for index, row in df_veiculo.iterrows():
-        if row['quilometragem'] > last_valid_km:
-            valid_indices.append(index)
-            last_valid_km = row['quilometragem']
-    
-    valid_group = df_veiculo.loc[valid_indices]
-    media_km_diaria = None
-    if len(valid_group) >= 2:
-        primeira_visita = valid_group.iloc[0]
-        ultima_visita = valid_group.iloc[-1]
-        delta_km = int(ultima_visita['quilometragem']) - int(primeira_visita['quilometragem'])
-        delta_dias = (ultima_visita['fim_execucao'] - primeira_visita['fim_execucao']).days
-        if delta_dias > 0:
-            media_km_diaria = float(delta_km / delta_dias)
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("UPDATE veiculos SET media_km_diaria = %s WHERE id = %s", (media_km_diaria, veiculo_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao atualizar a média para o veículo {veiculo_id}: {e}")
-        return False
+    Chave de busca da placa: só letras e números, em maiúsculas
+    ('abc-1234', 'ABC 1234' -> 'ABC1234'). É a mesma regra da trigger que
+    mantém veiculos.placa_normalizada (migração 0004, migrar_banco.py).
+    """
+    if not placa: return ""
+    return re.sub(r'[^A-Z0-9]', '', placa.upper())
+
+QUERY_VEICULO_POR_PLACA = """
+    SELECT v.id, v.placa, v.empresa, v.modelo, v.ano_modelo, v.nome_motorista, v.contato_motorista,
+           v.cliente_id, c.nome_responsavel, c.contato_responsavel
+    FROM veiculos v LEFT JOIN clientes c ON v.cliente_id = c.id
+    WHERE v.placa_normalizada = %s
+"""
+
+def buscar_veiculo_por_placa(conn, placa):
+    """
+    Busca o veículo pela placa em qualquer formato, usando o índice de
+    placa_normalizada. Retorna o registro (DictRow) com os dados do
+    responsável do cliente, ou None.
+    """
+    chave = normalizar_placa(placa)
+    if not chave: return None
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+        cursor.execute(QUERY_VEICULO_POR_PLACA, (chave,))
+        return cursor.fetchone()
+
+QUERY_CLIENTES_SIMILARES = """
+    SELECT id, nome_empresa, nome_fantasia 
+    FROM clientes 
+    WHERE similarity(nome_empresa, %(termo)s) > 0.2 OR similarity(nome_fantasia, %(termo)s) > 0.2
+    ORDER BY GREATEST(similarity(nome_empresa, %(termo)s), similarity(nome_fantasia, %(termo)s)) DESC, nome_empresa
+    LIMIT 10;
+"""
 
 def buscar_clientes_por_similaridade(termo_busca):
     if not termo_busca or len(termo_busca) < 3: return []
     conn = get_connection()
     if not conn: return []
-    query = """
-        SELECT id, nome_empresa, nome_fantasia 
-        FROM clientes 
-        WHERE similarity(nome_empresa, %(termo)s) > 0.2 OR similarity(nome_fantasia, %(termo)s) > 0.2
-        ORDER BY GREATEST(similarity(nome_empresa, %(termo)s), similarity(nome_fantasia, %(termo)s)) DESC, nome_empresa
-        LIMIT 10;
-    """
     try:
-        df = pd.read_sql(query, conn, params={'termo': termo_busca})
+        df = pd.read_sql(QUERY_CLIENTES_SIMILARES, conn, params={'termo': termo_busca})
         return list(df.itertuples(index=False, name=None))
     finally:
         release_connection(conn)